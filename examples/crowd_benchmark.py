@@ -0,0 +1,56 @@
+""" measures the time of the pose update of a crowd for an increasing number of instances
+    and compares it with the evaluation of each joint of each instance using the skeleton
+"""
+import sys
+import time
+import numpy as np
+from anim_utils.animation_data import BVHReader, MotionVector, SkeletonBuilder
+from vis_utils.scene.scene_object import SceneObject
+from vis_utils.animation.crowd import CrowdComponent
+
+N_INSTANCES = [10, 100, 1000, 10000]
+N_STEPS = 10
+MAX_REFERENCE_INSTANCES = 100
+
+
+def load_clip(bvh_file):
+    bvh_reader = BVHReader(bvh_file)
+    animated_joints = [key for key in list(bvh_reader.node_names.keys()) if not key.endswith("EndSite")]
+    skeleton = SkeletonBuilder().load_from_bvh(bvh_reader, animated_joints)
+    mv = MotionVector()
+    mv.from_bvh_reader(bvh_reader, False)
+    mv.skeleton = skeleton
+    return skeleton, mv
+
+
+def evaluate_per_joint(skeleton, frames):
+    for frame in frames:
+        for j in skeleton.animated_joints:
+            skeleton.nodes[j].get_global_matrix(frame)
+
+
+def main(bvh_file):
+    skeleton, clip = load_clip(bvh_file)
+    print("joints", len(skeleton.animated_joints), "frames", clip.n_frames)
+    for n in N_INSTANCES:
+        crowd = CrowdComponent(SceneObject(), skeleton, [clip])
+        crowd.place_instances_on_grid(n)
+        start = time.perf_counter()
+        for i in range(N_STEPS):
+            crowd.update(clip.frame_time)
+        batched = (time.perf_counter() - start) / N_STEPS * 1000
+        line = "instances %6d batched %9.2fms" % (n, batched)
+        if n <= MAX_REFERENCE_INSTANCES:
+            frames = crowd._frames[crowd.get_frame_indices()]
+            start = time.perf_counter()
+            evaluate_per_joint(skeleton, frames)
+            reference = (time.perf_counter() - start) * 1000
+            line += " per joint %9.2fms" % reference
+        print(line)
+
+
+if __name__ == "__main__":
+    bvh_file = "example.bvh"
+    if len(sys.argv) > 1:
+        bvh_file = sys.argv[1]
+    main(bvh_file)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import math
+import numpy as np
+from vis_utils.benchmarks.synthetic import generate_mesh_desc
+from vis_utils.graphics.geometry.primitive_manager import PrimitiveManager
+from vis_utils.graphics.renderer.main_renderer import MainRenderer
+from vis_utils.scene.components.static_mesh import StaticMesh
+from vis_utils.scene.scene_object import SceneObject
+
+VIEWPORT_HEIGHT = 600
+
+
+def get_perspective_matrix(fov=45.0, near=0.1, far=1000.0):
+    """ row major projection matrix as uploaded to the shaders """
+    f = 1.0 / math.tan(math.radians(fov) / 2)
+    return np.array([[f, 0, 0, 0],
+                     [0, f, 0, 0],
+                     [0, 0, (far + near) / (near - far), -1],
+                     [0, 0, 2 * far * near / (near - far), 0]])
+
+
+def get_view_matrix(distance):
+    v = np.eye(4)
+    v[3, 2] = -distance
+    return v
+
+
+def create_lod_renderer():
+    """ the level selection does not need the shaders of the renderer """
+    renderer = MainRenderer.__new__(MainRenderer)
+    renderer.use_lod = True
+    renderer.viewport_height = VIEWPORT_HEIGHT
+    return renderer
+
+
+def test_static_mesh_changes_level_with_distance():
+    scene_object = SceneObject()
+    mesh_desc = generate_mesh_desc(40, 10.0)
+    del mesh_desc["material"]
+    static_mesh = StaticMesh(scene_object, [0, 0, 0], [mesh_desc])
+    mesh = static_mesh.meshes[0]
+    assert len(mesh.lods) > 0
+    renderer = create_lod_renderer()
+    p_m = get_perspective_matrix()
+    levels = [renderer.select_lod(mesh, scene_object.transformation, get_view_matrix(d), p_m)
+              for d in [5, 50, 200, 800]]
+    assert levels[0] is mesh
+    assert levels[-1] is not mesh
+    n_indices = [level.get_num_indices() if level is not mesh else len(mesh.vertex_list) for level in levels]
+    assert all(a >= b for a, b in zip(n_indices, n_indices[1:]))
+    assert n_indices[-1] < n_indices[0]
+
+
+def test_primitive_manager_spheres_have_levels():
+    manager = PrimitiveManager()
+    manager.clear_geometry_cache()
+    sphere = manager.get_geometry("sphere", 20, 20, 2.0)
+    assert len(sphere.lods) == manager.n_lods["sphere"]
+    renderer = create_lod_renderer()
+    p_m = get_perspective_matrix()
+    assert renderer.select_lod(sphere, np.eye(4), get_view_matrix(3), p_m) is sphere
+    assert renderer.select_lod(sphere, np.eye(4), get_view_matrix(500), p_m) is sphere.lods[-1][1]
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
+from vis_utils.graphics.geometry.mesh import Mesh, deduplicate_vertices
+
+CORNERS = np.array([[0, 0, 0, 0, 1, 0, 0, 0],
+                    [1, 0, 0, 0, 1, 0, 1, 0],
+                    [1, 0, 1, 0, 1, 0, 1, 1],
+                    [0, 0, 1, 0, 1, 0, 0, 1]], dtype=np.float32)
+# two triangles of a quad that repeat the corners on the shared edge
+TRIANGLE_CORNERS = [0, 1, 2, 0, 2, 3]
+
+
+def test_deduplicate_vertices_of_a_quad():
+    vertex_array = CORNERS[TRIANGLE_CORNERS]
+    vertices, indices = deduplicate_vertices(vertex_array)
+    assert len(vertices) == 4
+    assert np.array_equal(vertices, CORNERS)
+    assert indices.dtype == np.uint32
+    assert np.array_equal(vertices[indices], vertex_array)
+
+
+def test_build_from_desc_creates_an_indexed_quad():
+    desc = {"type": "triangles", "vertices": CORNERS[:, :3], "normals": CORNERS[:, 3:6],
+            "texture_coordinates": CORNERS[:, 6:], "shift_index": False,
+            "faces": np.repeat(np.array(TRIANGLE_CORNERS).reshape((2, 3, 1)), 3, axis=2)}
+    mesh = Mesh.build_from_desc(desc)
+    assert mesh.get_num_vertices() == 4
+    assert mesh.get_num_indices() == 6
+    vertices = np.asarray(mesh.vertex_list).reshape((4, -1))
+    indices = np.asarray(mesh.index_list).ravel()
+    assert np.allclose(vertices[indices], CORNERS[TRIANGLE_CORNERS])
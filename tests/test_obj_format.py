@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
+from vis_utils.io.obj_format import load_meshes2, MISSING_INDEX
+from vis_utils.graphics.geometry.mesh import combine_vertex_list_from_faces
+
+SQUARE = """v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vt 1 0
+vt 1 1
+vt 0 1
+vn 0 0 1
+"""
+
+
+def get_vertex_array(mesh_desc):
+    normals = mesh_desc["normals"] if len(mesh_desc["normals"]) > 0 else None
+    uvs = mesh_desc["texture_coordinates"] if len(mesh_desc["texture_coordinates"]) > 0 else None
+    return combine_vertex_list_from_faces(mesh_desc["faces"], mesh_desc["vertices"], normals, uvs,
+                                          mesh_desc["shift_index"])
+
+
+def test_vertex_texture_normal_faces():
+    meshes = load_meshes2(SQUARE + "f 1/1/1 2/2/1 3/3/1\nf 1/1/1 3/3/1 4/4/1\n", flip_normals=False)
+    assert len(meshes) == 1
+    assert meshes[0]["type"] == "triangles"
+    assert meshes[0]["faces"].tolist()[1] == [[1, 1, 1], [3, 1, 3], [4, 1, 4]]
+    vertices = get_vertex_array(meshes[0])
+    assert np.allclose(vertices[2], [1, 1, 0, 0, 0, 1, 1, 1])
+
+
+def test_vertex_normal_faces():
+    meshes = load_meshes2(SQUARE + "f 1//1 2//1 3//1 4//1\n", flip_normals=False)
+    assert meshes[0]["type"] == "quads"
+    assert meshes[0]["faces"].tolist() == [[[1, 1, MISSING_INDEX], [2, 1, MISSING_INDEX],
+                                            [3, 1, MISSING_INDEX], [4, 1, MISSING_INDEX]]]
+    assert len(meshes[0]["texture_coordinates"]) == 0
+    assert np.allclose(get_vertex_array(meshes[0])[:, 3:], [0, 0, 1])
+
+
+def test_negative_indices_refer_to_the_preceding_records():
+    absolute = load_meshes2(SQUARE + "f 1/1/1 2/2/1 3/3/1\n")
+    relative = load_meshes2(SQUARE + "f -4/-4/-1 -3/-3/-1 -2/-2/-1\n")
+    assert np.array_equal(absolute[0]["faces"], relative[0]["faces"])
+
+
+def test_pentagon_is_triangulated_as_fan():
+    text = SQUARE + "v 0.5 1.5 0\nf 1 2 3 5 4\n"
+    meshes = load_meshes2(text)
+    faces = meshes[0]["faces"][..., 0].tolist()
+    assert meshes[0]["type"] == "triangles"
+    assert faces == [[1, 2, 3], [1, 3, 5], [1, 5, 4]]
+
+
+def test_mixed_face_sizes_are_triangulated():
+    meshes = load_meshes2(SQUARE + "v 0.5 1.5 0\nf 1 2 3\nf 1 3 5 4\n")
+    assert meshes[0]["faces"][..., 0].tolist() == [[1, 2, 3], [1, 3, 5], [1, 5, 4]]
+
+
+def test_crlf_line_endings():
+    text = SQUARE + "f 1/1/1 2/2/1 3/3/1\n"
+    unix = load_meshes2(text)
+    windows = load_meshes2(text.replace("\n", "\r\n"))
+    assert np.array_equal(unix[0]["faces"], windows[0]["faces"])
+    assert np.allclose(unix[0]["vertices"], windows[0]["vertices"])
+    assert np.allclose(unix[0]["texture_coordinates"], windows[0]["texture_coordinates"])
+
+
+def test_groups_and_materials_split_the_meshes():
+    text = SQUARE + """g first
+usemtl red
+f 1 2 3
+usemtl blue
+f 1 3 4
+g second
+f 2 3 4
+"""
+    meshes = load_meshes2(text)
+    assert [(m["name"], m["material"]) for m in meshes] == [("first", "red"), ("first", "blue"),
+                                                             ("second", "blue")]
+    assert [m["faces"][..., 0].tolist() for m in meshes] == [[[1, 2, 3]], [[1, 3, 4]], [[2, 3, 4]]]
+    assert all(m["vertices"] is meshes[0]["vertices"] for m in meshes)
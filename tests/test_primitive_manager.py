@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
+from vis_utils.graphics.geometry.primitive_manager import PrimitiveManager
+
+
+def test_get_geometry_builds_plane_without_material():
+    manager = PrimitiveManager()
+    manager.clear_geometry_cache()
+    plane = manager.get_geometry("plane", 10, 10, 4, 1.0)
+    assert plane.material is None
+    assert plane.get_num_vertices() == 4 * 4 * 4
+
+
+def test_get_geometry_shares_plane_buffers():
+    manager = PrimitiveManager()
+    manager.clear_geometry_cache()
+    a = manager.get_geometry("plane", 10, 10, 4, 1.0)
+    b = manager.get_geometry("plane", 10, 10, 4, 1.0)
+    c = manager.get_geometry("plane", 5, 5, 4, 1.0)
+    assert a is not b
+    assert a.vertex_buffer is b.vertex_buffer
+    assert a.vertex_buffer is not c.vertex_buffer
+    a.transform[3, :3] = [1, 2, 3]
+    assert np.allclose(b.transform, np.eye(4))
+
+
+def test_scale_does_not_change_cached_lods():
+    manager = PrimitiveManager()
+    manager.clear_geometry_cache()
+    a = manager.get_geometry("sphere", 8, 8, 1.0)
+    b = manager.get_geometry("sphere", 8, 8, 1.0)
+    assert len(a.lods) > 0
+    lod_vertices = np.array(b.lods[0][1].vertex_list)
+    a.scale(2.0)
+    assert np.allclose(b.lods[0][1].vertex_list, lod_vertices)
+    c = manager.get_geometry("sphere", 8, 8, 1.0)
+    assert np.allclose(c.lods[0][1].vertex_list, lod_vertices)
+    assert np.allclose(np.array(a.lods[0][1].vertex_list)[:, :3], 2.0 * lod_vertices[:, :3])
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
+from vis_utils.graphics.renderer.primitive_shapes import generate_height_map_grid, generate_quads_for_height_map_with_normals
+
+
+def _signed_areas(positions, polygons):
+    """ twice the signed area of each polygon projected on the xz plane """
+    p = positions[polygons][:, :, [0, 2]]
+    q = np.roll(p, -1, axis=1)
+    return (p[:, :, 0] * q[:, :, 1] - q[:, :, 0] * p[:, :, 1]).sum(axis=1)
+
+
+def test_height_map_triangles_keep_quad_winding():
+    heights = np.zeros((4, 4), dtype=np.float32)
+    vertices, indices = generate_height_map_grid(2.0, 2.0, 3, 1.0, heights)
+    quads = generate_quads_for_height_map_with_normals(2.0, 2.0, 3, 1.0, heights, 1.0)
+    quad_areas = _signed_areas(quads[:, :3], np.arange(len(quads)).reshape(-1, 4))
+    triangle_areas = _signed_areas(vertices[:, :3], indices.reshape(-1, 3))
+    assert np.all(np.sign(triangle_areas) == np.sign(quad_areas[0]))
+    assert np.all(np.sign(quad_areas) == np.sign(quad_areas[0]))
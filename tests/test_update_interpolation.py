@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
+from transformations import quaternion_about_axis, quaternion_matrix
+from vis_utils.scene.scene import Scene
+from vis_utils.scene.scene_object import SceneObject
+from vis_utils.scene.utils import interpolate_transformation
+
+
+def get_transformation(angle, translation, scale=1.0):
+    m = quaternion_matrix(quaternion_about_axis(angle, [0, 1, 0]))
+    m[:3, :3] *= scale
+    m[3, :3] = translation
+    return m
+
+
+def test_interpolate_transformation_blends_rotation_translation_and_scale():
+    a = get_transformation(0.0, [0, 0, 0], 1.0)
+    b = get_transformation(np.pi / 2, [2, 0, 0], 3.0)
+    m = interpolate_transformation(a, b, 0.5)
+    assert np.allclose(m, get_transformation(np.pi / 4, [1, 0, 0], 2.0))
+    assert np.allclose(interpolate_transformation(a, b, 0.0), a)
+    assert np.allclose(interpolate_transformation(a, b, 1.0), b)
+
+
+def test_scene_interpolates_between_the_last_two_steps_and_restores():
+    scene = Scene(visualize=False)
+    moving = SceneObject()
+    static = SceneObject()
+    scene.addObject(moving)
+    scene.addObject(static)
+    scene.store_transformations()
+    moving.transformation = get_transformation(0.0, [4, 0, 0])
+    scene.store_transformations()
+    replaced = scene.interpolate_transformations(0.25)
+    assert [o for o, m in replaced] == [moving]
+    assert np.allclose(moving.transformation[3, :3], [1, 0, 0])
+    scene.restore_transformations(replaced)
+    assert np.allclose(moving.transformation[3, :3], [4, 0, 0])
+
+
+def test_transformation_changed_after_the_last_step_is_not_interpolated():
+    o = SceneObject()
+    o.store_transformation()
+    o.transformation = get_transformation(0.0, [4, 0, 0])
+    o.store_transformation()
+    o.transformation = get_transformation(0.0, [8, 0, 0])
+    assert o.get_interpolated_transformation(0.5) is None
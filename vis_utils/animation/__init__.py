@@ -29,9 +29,11 @@ from .point_cloud_animation_controller import PointCloudAnimationController
 from .skeleton_animation_controller import SkeletonAnimationController
 from .skeleton_visualization import SkeletonVisualization 
 from .motion_state_machine import MotionStateMachineController
+from .crowd import CrowdComponent
 from ..graphics import materials
 from ..io import  load_json_file
 from ..scene.components import AnimatedMeshComponent, StaticMesh
+from ..scene.components.animated_mesh import create_meshes_from_desc, get_inv_bind_poses
 from ..scene.scene_object_builder import SceneObjectBuilder, SceneObject
 from ..scene.utils import get_random_color
 from anim_utils.animation_data import BVHReader, MotionVector, SkeletonBuilder, parse_asf_file
@@ -213,6 +215,23 @@ def create_animated_mesh(builder, name, model_data, scale=1, visualize=True):
             builder.create_component("animated_mesh", scene_object, model_data, "animation_controller", scale)
     return scene_object
 
+def create_crowd(builder, name, skeleton, clips, model_data=None, n_instances=1, spacing=100.0, scale=1):
+    """ creates a scene object that draws n_instances of the mesh in model_data animated by the clips using instancing"""
+    scene_object = SceneObject()
+    scene_object.name = name
+    meshes = []
+    inv_bind_poses = None
+    if model_data is not None and len(model_data["mesh_list"]) > 0:
+        meshes = create_meshes_from_desc(model_data["mesh_list"])
+        inv_bind_poses = get_inv_bind_poses(model_data["skeleton"])
+    crowd = CrowdComponent(scene_object, skeleton, clips, meshes, inv_bind_poses)
+    if scale != 1:
+        crowd.scale_mesh(scale)
+    crowd.place_instances_on_grid(n_instances, spacing)
+    scene_object.add_component("crowd", crowd)
+    builder._scene.addObject(scene_object)
+    return scene_object
+
 def attach_static_mesh_component(builder, scene_object, model_data, scale=1):
     mesh_list = model_data["mesh_list"]
     position = [0,0,0]
@@ -320,20 +339,31 @@ def create_skeleton_animation_controller(builder, name, skeleton, motion_vector,
     return scene_object
 
 
-def load_bvh_file(builder, path, scale=1.0, draw_mode=2, offset=None, reference_frame=None, skeleton_model=None, use_clip=False, color=None,visualize=True):
+def load_bvh_data(path, scale=1.0, offset=None, reference_frame=None, skeleton_model=None, **kwargs):
+    """ returns the skeleton, the motion vector and the frame time without creating scene objects """
     bvh_reader = BVHReader(path)
     bvh_reader.scale(scale)
     animated_joints = [key for key in list(bvh_reader.node_names.keys()) if not key.endswith("EndSite")]
+    if bvh_reader.frames is None:
+        return None
+    skeleton = SkeletonBuilder().load_from_bvh(bvh_reader, animated_joints, reference_frame=reference_frame, skeleton_model=skeleton_model)
+    motion_vector = MotionVector()
+    motion_vector.from_bvh_reader(bvh_reader, False)
+    motion_vector.skeleton = skeleton
+    if offset is not None:
+        motion_vector.translate_root(offset)
+    return skeleton, motion_vector, bvh_reader.frame_time
+
+def create_bvh_object(builder, data, path, draw_mode=2, color=None, visualize=True, **kwargs):
+    skeleton, motion_vector, frame_time = data
+    name = path.split("/")[-1]
+    return builder.create_object("animation_controller", name, skeleton, motion_vector, frame_time, draw_mode, visualize, color)
+
+def load_bvh_file(builder, path, scale=1.0, draw_mode=2, offset=None, reference_frame=None, skeleton_model=None, use_clip=False, color=None,visualize=True):
+    data = load_bvh_data(path, scale, offset, reference_frame, skeleton_model)
     o = None
-    if bvh_reader.frames is not None:
-        skeleton = SkeletonBuilder().load_from_bvh(bvh_reader, animated_joints, reference_frame=reference_frame, skeleton_model=skeleton_model)
-        motion_vector = MotionVector()
-        motion_vector.from_bvh_reader(bvh_reader, False)
-        motion_vector.skeleton = skeleton
-        if offset is not None:
-            motion_vector.translate_root(offset)
-        name = path.split("/")[-1]
-        o = builder.create_object("animation_controller", name, skeleton, motion_vector, bvh_reader.frame_time, draw_mode, visualize, color)
+    if data is not None:
+        o = create_bvh_object(builder, data, path, draw_mode, color, visualize)
     return o
 
 def load_asf_file(builder, filename):
@@ -429,18 +459,25 @@ def load_point_cloud_animation_collection(builder, file_path):
 def load_coordinate_error_format(builder, filename):
     ConstraintsFormatReader(builder._scene).loadCoordinateErrorFormat(filename)
 
-def load_fbx_file(builder, file_path, scale=1.0, visualize=True,  load_skeleton=True):
+def load_fbx_data(file_path, **kwargs):
     print('load', file_path)
-    skeleton, motion_vectors = load_skeleton_and_animations_from_fbx(str(file_path))
+    return load_skeleton_and_animations_from_fbx(str(file_path))
+
+def create_fbx_object(builder, data, file_path, visualize=True, **kwargs):
+    skeleton, motion_vectors = data
     first_key = list(motion_vectors.keys())[0]
     name = file_path.split("/")[-1]
     frame_time = 1/60
     scene_object = builder.create_object("animation_controller", name, skeleton, motion_vectors[first_key], frame_time, 2, visualize)
     return scene_object
 
+def load_fbx_file(builder, file_path, scale=1.0, visualize=True,  load_skeleton=True):
+    return create_fbx_object(builder, load_fbx_data(file_path), file_path, visualize)
+
 SceneObjectBuilder.register_object("skeleton", create_skeleton_object)
 SceneObjectBuilder.register_object("fbx_skeleton_controller", create_animation_controller_from_fbx)
 SceneObjectBuilder.register_object("animated_mesh", create_animated_mesh)
+SceneObjectBuilder.register_object("crowd", create_crowd)
 SceneObjectBuilder.register_object("static_mesh", create_static_mesh)
 SceneObjectBuilder.register_object("animation_controller", create_skeleton_animation_controller)
 SceneObjectBuilder.register_component("animation_editor", attach_animation_editor)
@@ -460,6 +497,8 @@ SceneObjectBuilder.register_file_handler("panim_collection", load_point_cloud_an
 SceneObjectBuilder.register_file_handler("cee", load_coordinate_error_format)
 SceneObjectBuilder.register_file_handler("asf",load_asf_file)
 SceneObjectBuilder.register_file_handler("fbx", load_fbx_file)
+SceneObjectBuilder.register_async_file_handler("bvh", load_bvh_data, create_bvh_object)
+SceneObjectBuilder.register_async_file_handler("fbx", load_fbx_data, create_fbx_object)
 
 
 
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
+
+EPS = np.finfo(float).eps * 4.0
+
+
+def quaternions_to_matrices(q):
+    """ converts an array of quaternions (..., 4) in w, x, y, z order into rotation matrices (..., 3, 3)
+        equivalent to transformations.quaternion_matrix including the identity for zero quaternions
+    """
+    q = np.asarray(q, dtype=np.float64)
+    n = np.sum(q * q, axis=-1, keepdims=True)
+    valid = n > EPS
+    q = np.where(valid, q * np.sqrt(2.0 / np.where(valid, n, 1.0)), 0.0)
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    m = np.empty(q.shape[:-1] + (3, 3))
+    m[..., 0, 0] = 1.0 - y * y - z * z
+    m[..., 0, 1] = x * y - z * w
+    m[..., 0, 2] = x * z + y * w
+    m[..., 1, 0] = x * y + z * w
+    m[..., 1, 1] = 1.0 - x * x - z * z
+    m[..., 1, 2] = y * z - x * w
+    m[..., 2, 0] = x * z - y * w
+    m[..., 2, 1] = y * z + x * w
+    m[..., 2, 2] = 1.0 - x * x - y * y
+    return m
+
+
+class BatchForwardKinematics(object):
+    """ Evaluates the global matrices of joints of a skeleton for many frames at once.
+        The nodes are grouped by their depth in the hierarchy so that each level requires
+        a single batched matrix product over all frames instead of one call per joint and frame.
+        The frames have the reduced quaternion format of the skeleton: root translation followed
+        by one quaternion per animated joint.
+    """
+    def __init__(self, skeleton, joints=None):
+        if joints is None:
+            joints = skeleton.animated_joints
+        self.joints = list(joints)
+        animated_joints = list(skeleton.animated_joints)
+        required = set()
+        for name in self.joints:
+            node = skeleton.nodes[name]
+            while node is not None and node.node_name not in required:
+                required.add(node.node_name)
+                node = node.parent
+
+        # breadth first order guarantees that parents are evaluated before their children
+        self.nodes = []
+        depths = []
+        queue = [(skeleton.root, 0)]
+        while len(queue) > 0:
+            name, depth = queue.pop(0)
+            if name not in required:
+                continue
+            self.nodes.append(name)
+            depths.append(depth)
+            for c in skeleton.nodes[name].children:
+                queue.append((c.node_name, depth + 1))
+        node_indices = {name: idx for idx, name in enumerate(self.nodes)}
+        n_nodes = len(self.nodes)
+
+        self.offsets = np.zeros((n_nodes, 3))
+        self.fixed_rotations = np.zeros((n_nodes, 3, 3))
+        parents = -np.ones(n_nodes, dtype=int)
+        animated_node_indices = []
+        quaternion_indices = []
+        for idx, name in enumerate(self.nodes):
+            node = skeleton.nodes[name]
+            self.offsets[idx] = node.offset
+            rotation = getattr(node, "rotation", None)
+            if rotation is None:
+                rotation = [1, 0, 0, 0]
+            self.fixed_rotations[idx] = quaternions_to_matrices(rotation)
+            if node.parent is not None:
+                parents[idx] = node_indices[node.parent.node_name]
+            if name in animated_joints:
+                offset = 3 + animated_joints.index(name) * 4
+                animated_node_indices.append(idx)
+                quaternion_indices.append(list(range(offset, offset + 4)))
+        self.parents = parents
+        self.root_idx = node_indices[skeleton.root]
+        self.animated_node_indices = np.array(animated_node_indices, dtype=int)
+        self.quaternion_indices = np.array(quaternion_indices, dtype=int).reshape((-1, 4))
+        self.output_indices = np.array([node_indices[name] for name in self.joints], dtype=int)
+
+        depths = np.array(depths)
+        self.levels = []
+        for depth in range(int(depths.max()) + 1):
+            level = np.where(depths == depth)[0]
+            self.levels.append((level, parents[level]))
+
+    def get_local_matrices(self, frames):
+        """ returns the local matrices of the nodes with shape (n_nodes, n_frames, 4, 4).
+            The node axis comes first so that each node and level is a contiguous block.
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        n_frames = len(frames)
+        local = np.zeros((len(self.nodes), n_frames, 4, 4))
+        local[..., :3, :3] = self.fixed_rotations[:, None]
+        if len(self.animated_node_indices) > 0:
+            q = frames[:, self.quaternion_indices.T]
+            local[self.animated_node_indices, :, :3, :3] = quaternions_to_matrices(np.transpose(q, (2, 0, 1)))
+        local[..., :3, 3] = self.offsets[:, None]
+        local[self.root_idx, :, :3, 3] += frames[:, :3]
+        local[..., 3, 3] = 1.0
+        return local
+
+    def compute(self, frames):
+        """ returns the global matrices of the joints with shape (n_frames, n_joints, 4, 4)"""
+        local = self.get_local_matrices(frames)
+        global_matrices = np.empty_like(local)
+        for level, parents in self.levels:
+            if parents[0] < 0:
+                global_matrices[level] = local[level]
+            else:
+                global_matrices[level] = np.matmul(global_matrices[parents], local[level])
+        return np.ascontiguousarray(np.swapaxes(global_matrices[self.output_indices], 0, 1))
+
+
+def bake_skinning_matrices(skeleton, frames, inv_bind_poses=None, global_transformation=None):
+    """ returns the skinning matrices of all frames with shape (n_frames, n_joints, 4, 4)
+        for the animated joints of the skeleton to be stored in an animation texture
+    """
+    global_matrices = BatchForwardKinematics(skeleton).compute(frames)
+    if global_transformation is not None:
+        global_matrices = np.matmul(global_transformation, global_matrices)
+    if inv_bind_poses is not None:
+        n_bones = min(global_matrices.shape[1], len(inv_bind_poses))
+        global_matrices[:, :n_bones] = np.matmul(global_matrices[:, :n_bones], inv_bind_poses[None, :n_bones])
+    return global_matrices
+
+
+def save_baked_animation(filename, matrices, frame_time):
+    """ stores baked skinning matrices so that the baking can be done offline"""
+    np.savez_compressed(filename, matrices=matrices, frame_time=frame_time)
+
+
+def load_baked_animation(filename):
+    data = np.load(filename)
+    return data["matrices"], float(data["frame_time"])
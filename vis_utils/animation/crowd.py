@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
+from ..scene.components import ComponentBase
+from ..graphics.bone_palette import BonePalette
+from .batch_fk import BatchForwardKinematics
+
+
+class CrowdComponent(ComponentBase):
+    """ Animates and draws many instances of one skeleton and mesh.
+        Each instance plays one of the shared clips with its own time offset and root transformation.
+        The poses of all instances are evaluated together by BatchForwardKinematics and the skinning
+        matrices are stored in a single bone palette, so each mesh is drawn with one instanced draw call.
+    """
+    def __init__(self, scene_object, skeleton, clips, meshes=None, inv_bind_poses=None):
+        ComponentBase.__init__(self, scene_object)
+        self.skeleton = skeleton
+        self.fk = BatchForwardKinematics(skeleton)
+        self.meshes = meshes if meshes is not None else []
+        n_joints = len(self.fk.joints)
+        if inv_bind_poses is None:
+            inv_bind_poses = np.tile(np.eye(4), (n_joints, 1, 1))
+        self.inv_bind_poses = np.array(inv_bind_poses, dtype=np.float64).reshape((-1, 4, 4))[:n_joints]
+        self.time = 0.0
+        self.speed = 1.0
+        self.play = True
+        self.clip_ids = np.zeros(0, dtype=int)
+        self.time_offsets = np.zeros(0)
+        self.root_transforms = np.zeros((0, 4, 4))
+        self.matrices = np.zeros((0, n_joints, 4, 4))
+        self.bone_palette = None
+        self._palette_is_dirty = True
+        self.set_clips(clips)
+
+    @property
+    def n_instances(self):
+        return len(self.clip_ids)
+
+    def set_clips(self, clips):
+        """ clips: list of motion vectors that provide frames and frame_time"""
+        frames = [np.asarray(c.frames, dtype=np.float64) for c in clips]
+        self._frames = np.concatenate(frames, axis=0)
+        lengths = [len(f) for f in frames]
+        self._clip_lengths = np.array(lengths, dtype=int)
+        self._clip_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(int)
+        self._clip_frame_times = np.array([c.frame_time for c in clips], dtype=np.float64)
+
+    def add_instance(self, clip_id=0, time_offset=0.0, root_transform=None):
+        if root_transform is None:
+            root_transform = np.eye(4)
+        self.clip_ids = np.append(self.clip_ids, clip_id)
+        self.time_offsets = np.append(self.time_offsets, time_offset)
+        self.root_transforms = np.concatenate([self.root_transforms, [root_transform]], axis=0)
+        self.update_poses()
+        return self.n_instances - 1
+
+    def set_instances(self, clip_ids, time_offsets, root_transforms):
+        self.clip_ids = np.asarray(clip_ids, dtype=int)
+        self.time_offsets = np.asarray(time_offsets, dtype=np.float64)
+        self.root_transforms = np.asarray(root_transforms, dtype=np.float64).reshape((-1, 4, 4))
+        self.update_poses()
+
+    def remove_instance(self, idx):
+        self.clip_ids = np.delete(self.clip_ids, idx)
+        self.time_offsets = np.delete(self.time_offsets, idx)
+        self.root_transforms = np.delete(self.root_transforms, idx, axis=0)
+        self.update_poses()
+
+    def place_instances_on_grid(self, n_instances, spacing=100.0, random_offsets=True):
+        """ creates n_instances on a square grid in the xz plane with random clips and time offsets"""
+        n_columns = int(np.ceil(np.sqrt(n_instances)))
+        indices = np.arange(n_instances)
+        root_transforms = np.tile(np.eye(4), (n_instances, 1, 1))
+        root_transforms[:, 0, 3] = (indices % n_columns) * spacing
+        root_transforms[:, 2, 3] = (indices // n_columns) * spacing
+        n_clips = len(self._clip_lengths)
+        if random_offsets:
+            clip_ids = np.random.randint(0, n_clips, n_instances)
+            max_times = self._clip_lengths[clip_ids] * self._clip_frame_times[clip_ids]
+            time_offsets = np.random.rand(n_instances) * max_times
+        else:
+            clip_ids = indices % n_clips
+            time_offsets = np.zeros(n_instances)
+        self.set_instances(clip_ids, time_offsets, root_transforms)
+
+    def update(self, dt):
+        if self.play:
+            self.time += dt * self.speed
+            self.update_poses()
+
+    def get_frame_indices(self):
+        """ returns the index of the current frame of each instance into the concatenated clips"""
+        c = self.clip_ids
+        t = self.time + self.time_offsets
+        local_indices = np.floor(t / self._clip_frame_times[c]).astype(int) % self._clip_lengths[c]
+        return self._clip_starts[c] + local_indices
+
+    def update_poses(self):
+        if self.n_instances == 0:
+            self.matrices = np.zeros((0, len(self.fk.joints), 4, 4))
+        else:
+            frames = self._frames[self.get_frame_indices()]
+            global_matrices = self.fk.compute(frames)
+            self.matrices = np.matmul(self.root_transforms[:, None], global_matrices)
+        self._palette_is_dirty = True
+
+    def get_bone_matrices(self):
+        """ returns the skinning matrices of all instances with shape (n_instances, n_joints, 4, 4)"""
+        return np.matmul(self.matrices, self.inv_bind_poses[None])
+
+    def get_bone_palette(self):
+        if self.bone_palette is None:
+            self.bone_palette = BonePalette()
+        if self._palette_is_dirty:
+            matrices = self.get_bone_matrices()
+            self.bone_palette.upload(matrices.reshape((-1, 4, 4)), self.n_instances)
+            self._palette_is_dirty = False
+        return self.bone_palette
+
+    def scale_mesh(self, scale_factor):
+        for m in self.meshes:
+            m.scale(scale_factor)
+        self.inv_bind_poses[:, :3, 3] *= scale_factor
+        self._palette_is_dirty = True
+
+    def get_joint_positions(self):
+        """ returns the global joint positions of all instances with shape (n_instances, n_joints, 3)"""
+        return self.matrices[..., :3, 3]
+
+    def cleanup(self):
+        if self.bone_palette is not None:
+            self.bone_palette.cleanup()
+            self.bone_palette = None
@@ -21,9 +21,10 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
 import numpy as np
-from transformations import quaternion_matrix, quaternion_multiply
+from transformations import quaternion_matrix, quaternion_multiply, quaternion_inverse
 from .state_machine_controller import StateMachineController
 from .utils import normalize, av_to_quaternion, calc_velocity
+from .batch_fk import bake_skinning_matrices
 from PySignal import Signal
 
 
@@ -70,6 +71,29 @@ class MotionLoopState(object):
         # print(self.global_pos, self.global_rot)
         return self.current_pose
 
+    def get_baking_frames(self):
+        """ returns the poses with the root at the origin of the ground plane and the height of the first frame
+            like update_pose. The accumulated root motion is applied by get_root_transform.
+        """
+        frames = np.array(self.poses, dtype=np.float64)
+        frames[:, 0] = 0
+        frames[:, 1] = self.poses[0][1]
+        frames[:, 2] = 0
+        return frames
+
+    def get_root_transform(self, root_offset=None):
+        """ returns the transformation that moves the baked pose of the current frame to the accumulated root position and orientation"""
+        frame_idx = int(self.time / self.frame_time) % self.n_frames
+        q = quaternion_multiply(self.global_rot, quaternion_inverse(self.poses[frame_idx][3:7]))
+        m = quaternion_matrix(q)
+        baked_root_pos = np.array([0, self.poses[0][1], 0], dtype=np.float64)
+        root_pos = np.array(self.global_pos, dtype=np.float64)
+        if root_offset is not None:
+            baked_root_pos += root_offset
+            root_pos += root_offset
+        m[:3, 3] = root_pos - np.dot(m[:3, :3], baked_root_pos)
+        return m
+
     def reset(self):
         self.time = 0
         self.max_time = self.frame_time * self.n_frames
@@ -87,13 +111,32 @@ class MotionStateMachineController(StateMachineController):
         self.state = MotionLoopState(motion_vector.frames, motion_vector.frame_time)
         self.vis = None
         self.play = False
+        self.use_baked_animation = False
 
     def update(self, dt):
         if self.play:
             self.state.update_pose(dt)
-            if self.vis is not None and self.visible:
+            if self.vis is not None and self.visible and (not self.use_baked_animation or self.vis.is_visible()):
                 self.vis.updateTransformation(self.state.current_pose, self.scene_object.scale_matrix)
 
+    def uses_baked_animation(self):
+        return self.use_baked_animation
+
+    def bake_global_matrices(self):
+        """ returns the global matrices of the animated joints for all frames with shape (n_frames, n_joints, 4, 4)"""
+        frames = self.state.get_baking_frames()
+        return bake_skinning_matrices(self.skeleton, frames, global_transformation=self.scene_object.scale_matrix)
+
+    def get_baked_animation_state(self):
+        """ returns the fractional frame index and the root transformation of the baked animation"""
+        m = self.scene_object.scale_matrix
+        root_offset = self.skeleton.nodes[self.skeleton.root].offset
+        root_matrix = np.dot(np.dot(m, self.state.get_root_transform(root_offset)), np.linalg.inv(m))
+        return self.state.time / self.state.frame_time, root_matrix
+
+    def get_frame_time(self):
+        return self.state.frame_time
+
     def get_pose(self, frame_idx=None):
         return self.state.current_pose
 
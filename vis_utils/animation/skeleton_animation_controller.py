@@ -35,6 +35,7 @@ from anim_utils.retargeting import retarget_from_src_to_target, retarget_from_po
 from anim_utils.animation_data.fbx import export_motion_vector_to_fbx_file
 from anim_utils.animation_data.motion_state import MotionState
 from .skeleton_mirror_component import SkeletonMirrorComponent
+from .batch_fk import bake_skinning_matrices
 
 
 class SkeletonAnimationControllerBase(ComponentBase):
@@ -133,6 +134,22 @@ class SkeletonAnimationController(SkeletonAnimationControllerBase):
         self.loopAnimation = False
         self.activate_emit = True
         self.visualize = True
+        self.use_baked_animation = False
+
+    @property
+    def activate_emit(self):
+        return self._activate_emit
+
+    @activate_emit.setter
+    def activate_emit(self, activate_emit):
+        self._activate_emit = activate_emit
+        # the scene decides again whether the update can run on a worker thread
+        self.scene_object._invalidate_scene_registries()
+
+    @property
+    def parallel_update(self):
+        """ without GUI signals the update only runs the forward kinematics of the own skeleton """
+        return not self.activate_emit and isinstance(self._motion, MotionState)
 
     def set_skeleton(self, skeleton, visualize=True):
         self.visualize = visualize
@@ -169,7 +186,8 @@ class SkeletonAnimationController(SkeletonAnimationControllerBase):
         if not self._motion.play:
             return
         reset = self._motion.update(dt*self.animationSpeed)
-        self.updateTransformation()
+        if not self.uses_baked_animation() or self.skeleton_is_visible():
+            self.updateTransformation()
         if reset:
             self._motion.play = self.loopAnimation
         if self.activate_emit:
@@ -524,6 +542,24 @@ class SkeletonAnimationController(SkeletonAnimationControllerBase):
     def get_bone_matrices(self):
         return self._visualization.matrices
 
+    def skeleton_is_visible(self):
+        return self.visible and self._visualization is not None and self._visualization.is_visible()
+
+    def uses_baked_animation(self):
+        """ the skinning is done from an animation texture only while the clip is looped"""
+        return self.use_baked_animation and self.loopAnimation
+
+    def bake_global_matrices(self):
+        """ returns the global matrices of the animated joints for all frames with shape (n_frames, n_joints, 4, 4)"""
+        return bake_skinning_matrices(self.skeleton, self.get_frames(), global_transformation=self.scene_object.scale_matrix)
+
+    def get_baked_animation_state(self):
+        """ returns the fractional frame index and the root transformation of the baked animation"""
+        t = getattr(self._motion, "time", None)
+        if t is None:
+            return float(self.get_current_frame_idx()), np.eye(4)
+        return t / self.get_frame_time(), np.eye(4)
+
     def set_color_annotation_from_labels(self, labels, colors):
         self._motion.set_color_annotation_from_labels(labels, colors)
 
@@ -580,7 +616,7 @@ class SkeletonAnimationController(SkeletonAnimationControllerBase):
 
     def add_skeleton_mirror(self, snapshot_interval=10):
         skeleton_mirror = SkeletonMirrorComponent(self.scene_object, self._visualization, snapshot_interval)
-        self.scene_object._components["skeleton_mirror"] = skeleton_mirror
+        self.scene_object.add_component("skeleton_mirror", skeleton_mirror)
         return skeleton_mirror
 
     def set_ticker(self, tick):
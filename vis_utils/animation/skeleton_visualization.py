@@ -23,7 +23,8 @@
 from copy import copy
 import numpy as np
 from ..graphics.geometry.mesh import Mesh
-from ..graphics.renderer.debug_skeleton import DebugSkeletonRenderer
+from ..graphics.geometry.lod import get_bounding_sphere
+from ..graphics.renderer.debug_skeleton import SharedDebugSkeleton
 from ..graphics.renderer.lines import CoordinateSystemRenderer
 from ..graphics import materials
 from ..scene.components import ComponentBase
@@ -35,6 +36,10 @@ SKELETON_DRAW_MODE_BOXES = 2
 SKELETON_DRAW_MODE_CS = 3
 DEFAULT_BOX_SIZE = 1.0
 DEFAULT_WIDTH_FACTOR = 32.0
+# below this projected size in pixels only bones longer than a fraction of the skeleton height are drawn
+SKELETON_LOD_MAJOR_BONES_SIZE = 100.0
+SKELETON_LOD_MAJOR_BONE_FRACTION = 0.04
+SKELETON_LOD_CULL_SIZE = 2.0
 ZERO_VECTOR = np.zeros((3))
 
 
@@ -56,6 +61,10 @@ class SkeletonVisualization(ComponentBase):
         self.box_scale = 1.0
         self.line_renderer = None
         self.line_color = [0,0,1]
+        self._lod_joints = [[], []]
+
+    def is_visible(self):
+        return self.visualize and self.draw_mode != SKELETON_DRAW_MODE_NONE
 
     def set_skeleton(self, skeleton, visualize=True, width_scale=None):
         if width_scale is None:
@@ -78,7 +87,7 @@ class SkeletonVisualization(ComponentBase):
         self._has_shapes = False
         if visualize:
             self._create_shapes(width_scale)
-            self.debug_skeleton = DebugSkeletonRenderer(skeleton, self._joints, self.color)
+            self.debug_skeleton = SharedDebugSkeleton(skeleton, self._joints, self.color)
             
 
     def _create_shapes(self, width_scale=1.0):
@@ -87,14 +96,24 @@ class SkeletonVisualization(ComponentBase):
         self._material = copy(materials.standard)
         self._material.diffuse_color = self.color
         self._material.ambient_color = np.array(self.color)*0.3
+        min_p, max_p = self.skeleton.get_bounding_box()
+        min_bone_length = (max_p[1] - min_p[1]) * SKELETON_LOD_MAJOR_BONE_FRACTION
+        self._lod_joints = [[], []]
         for idx, j in enumerate(self._joints):
             self.shapes[j] = []
+            max_bone_length = 0.0
             for c in self.skeleton.nodes[j].children:
                 v = np.array(c.offset)
-                if np.linalg.norm(v) > 0.0:
+                bone_length = np.linalg.norm(v)
+                if bone_length > 0.0:
                     bone = Mesh.build_bone_shape(v, width_scale, self._material)
                     #bone = BoneRenderer(vector, size, self._material)
                     self.shapes[j].append(bone)
+                    max_bone_length = max(bone_length, max_bone_length)
+            if len(self.shapes[j]) > 0:
+                self._lod_joints[0].append((idx, j))
+                if max_bone_length >= min_bone_length:
+                    self._lod_joints[1].append((idx, j))
         self._has_shapes = True
         self.cs = CoordinateSystemRenderer(3.0)
 
@@ -118,6 +137,19 @@ class SkeletonVisualization(ComponentBase):
         if self.line_renderer is not None:
             self.line_renderer.draw(modelMatrix, viewMatrix, projectionMatrix)
 
+    def get_bounding_sphere(self):
+        """ returns the bounding sphere of the joint positions in world space """
+        positions = [m[:3, 3] for m in self.matrices if m is not None]
+        return get_bounding_sphere(positions)
+
+    def get_lod_joints(self, screen_size):
+        """ returns the indices and names of the joints with bone shapes that are drawn at the projected size """
+        if screen_size < SKELETON_LOD_CULL_SIZE:
+            return []
+        elif screen_size < SKELETON_LOD_MAJOR_BONES_SIZE:
+            return self._lod_joints[1]
+        return self._lod_joints[0]
+
     def drawCoordinateSystems(self, viewMatrix, projectionMatrix):
         for idx, j in enumerate(self._joints):
             self.drawCoordinateSystem(viewMatrix, projectionMatrix, idx)
@@ -161,7 +193,9 @@ class SkeletonVisualization(ComponentBase):
 
     def set_scale(self, scale_factor):
         self.skeleton.scale(scale_factor)
-        self.debug_skeleton = DebugSkeletonRenderer(self.skeleton, self._joints, self.color)
+        if self.debug_skeleton is not None:
+            self.debug_skeleton.cleanup()
+        self.debug_skeleton = SharedDebugSkeleton(self.skeleton, self._joints, self.color)
         self._create_shapes(scale_factor)
         return self.skeleton
 
@@ -26,6 +26,7 @@ import math
 import queue
 import threading
 from . import constants
+from .profiling import PhaseTimings, PhaseTimer, Profiler
 try:
     import physics_utils
 except:
@@ -38,6 +39,7 @@ DEFAULT_CLEAR_COLOR = [0,0,0]
 
 DEFAULT_SIM_DT = 1/200
 DEFAULT_FPS = 60
+DEFAULT_MAX_UPDATE_STEPS = 5
 
 
 class AppBase:
@@ -53,7 +55,20 @@ class AppBase:
         self.activate_simulation=kwargs.get("activate_simulation",constants.activate_simulation)
         self.visualize = kwargs.get("visualize",True)
         self.interval = 1.0/self.maxfps
-        self.fixed_dt = False
+        # throttle=False runs updates back to back with a fixed dt e.g. for batch processing
+        self.throttle = kwargs.get("throttle", True)
+        self.fixed_dt = not self.throttle
+        # decouple_updates=True runs update_scene with a fixed time step on a worker thread without a GL context,
+        # so scene tasks and the update phases of components must not make GL calls. The transformations of
+        # the scene objects are interpolated between the last two steps while rendering.
+        self.decouple_updates = kwargs.get("decouple_updates", False)
+        self.interpolate_updates = kwargs.get("interpolate_updates", True)
+        update_rate = kwargs.get("update_rate", self.maxfps)
+        self.update_dt = 1.0/update_rate
+        self.max_update_steps = kwargs.get("max_update_steps", DEFAULT_MAX_UPDATE_STEPS)
+        self.update_alpha = 0.0
+        self.update_thread = None
+        self.stop_updates_event = threading.Event()
         self.event_queue = queue.Queue()
         self.mutex = threading.Lock()
         self.synchronize_updates = kwargs.get("synchronize_updates",True)
@@ -65,6 +80,9 @@ class AppBase:
         self.last_time = time.perf_counter()
         self.next_time = self.last_time+self.interval
         self.scene.global_vars["fps"] = self.maxfps
+        self.timings = PhaseTimings()
+        self.scene.global_vars["timings"] = self.timings
+        self.scene.internal_vars["update_alpha"] = self.update_alpha
         self.is_running = False
         self.synchronize_simulation = sync_sim and self.activate_simulation
 
@@ -99,26 +117,98 @@ class AppBase:
             #    dt = self.interval
         self.last_time = t
         fps= 1.0/dt
-        if self.synchronize_updates:
+        if self.decouple_updates:
+            if self.update_thread is None:
+                self.start_update_thread()
+        elif self.synchronize_updates:
             self.update_scene(dt)
         if self.visualize:
-            self.render(dt)
+            self.render_timed(dt)
         self.next_time = self.last_time + self.interval
         self.scene.global_vars["fps"] = fps
+        Profiler.next_frame()
+
+    def render_timed(self, dt):
+        with PhaseTimer(self.timings, "render"):
+            if self.decouple_updates:
+                # the scene state must not change while it is drawn
+                with self.mutex:
+                    self.scene.internal_vars["update_alpha"] = self.update_alpha
+                    replaced = []
+                    if self.interpolate_updates:
+                        replaced = self.scene.interpolate_transformations(self.update_alpha)
+                    try:
+                        self.render(dt)
+                    finally:
+                        self.scene.restore_transformations(replaced)
+            else:
+                self.render(dt)
 
     def update_scene(self, dt):
-        self.mutex.acquire()
-        self.scene.before_update(dt)
-        if self.synchronize_simulation:
-            # from locotest
-            sim_seconds = dt
-            n_steps = int(math.ceil(sim_seconds / self.sim_dt))
-            for i in range(0, n_steps):
-                self.scene.sim_update(self.sim_dt)
-                #self.scene.global_vars["step"] += 1
-        self.scene.update(dt)
-        self.scene.after_update(dt)
-        self.mutex.release()
+        with self.mutex:
+            with PhaseTimer(self.timings, "before_update"):
+                self.scene.before_update(dt)
+            if self.synchronize_simulation:
+                # from locotest
+                with PhaseTimer(self.timings, "sim"):
+                    sim_seconds = dt
+                    n_steps = int(math.ceil(sim_seconds / self.sim_dt))
+                    for i in range(0, n_steps):
+                        self.scene.sim_update(self.sim_dt)
+                        #self.scene.global_vars["step"] += 1
+            with PhaseTimer(self.timings, "update"):
+                self.scene.update(dt)
+            with PhaseTimer(self.timings, "after_update"):
+                self.scene.after_update(dt)
+            if self.decouple_updates and self.interpolate_updates:
+                self.scene.store_transformations()
+
+    def run_update_loop(self):
+        """ calls update_scene with the fixed time step update_dt until stop_update_thread is called.
+            Missed steps are caught up to max_update_steps per iteration. The remaining fraction of a step
+            is stored in update_alpha, which render_timed uses to interpolate the transformations of the
+            scene objects between the last two steps. The updates run without a GL context.
+            Without throttle the steps are executed back to back independent of the wall clock.
+        """
+        self.stop_updates_event.clear()
+        last_time = time.perf_counter()
+        accumulator = 0.0
+        while not self.stop_updates_event.is_set():
+            t = time.perf_counter()
+            if self.throttle:
+                accumulator += t - last_time
+            else:
+                accumulator = self.update_dt
+            last_time = t
+            n_steps = 0
+            while accumulator >= self.update_dt and n_steps < self.max_update_steps:
+                self.update_scene(self.update_dt)
+                accumulator -= self.update_dt
+                n_steps += 1
+            if accumulator >= self.update_dt:
+                # drop the steps that could not be caught up to avoid a spiral of death
+                accumulator = accumulator % self.update_dt
+            self.update_alpha = accumulator / self.update_dt
+            if self.throttle:
+                self.stop_updates_event.wait(self.update_dt - accumulator)
+
+    def start_update_thread(self):
+        if self.update_thread is not None:
+            return
+        self.update_thread = threading.Thread(target=self.run_update_loop)
+        self.update_thread.daemon = True
+        self.update_thread.start()
+
+    def stop_update_thread(self):
+        self.stop_updates_event.set()
+        if self.update_thread is not None and self.update_thread is not threading.current_thread():
+            self.update_thread.join()
+        self.update_thread = None
+
+    def stop(self):
+        """ stops the update thread before the graphics context is destroyed """
+        self.is_running = False
+        self.stop_update_thread()
 
     def step_sim(self, n_steps=1):
         step_idx = 0
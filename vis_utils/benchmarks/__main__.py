@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+""" python -m vis_utils.benchmarks [--suite io animation scene render] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import os
+import sys
+
+DEFAULT_SUITES = ["io", "animation", "scene"]
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(prog="python -m vis_utils.benchmarks",
+                                     description="Times the hot paths of vis_utils on synthetic data.")
+    parser.add_argument("--suite", nargs="+", default=DEFAULT_SUITES,
+                        help="suites to run out of io, animation, scene and render. render needs an OpenGL driver")
+    parser.add_argument("--filter", default=None, help="regular expression for the names of the benchmarks")
+    parser.add_argument("--repeat", type=int, default=None, help="number of timed samples per benchmark")
+    parser.add_argument("--min-time", type=float, default=None, help="minimum duration of a sample in seconds")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--compare", default=None, help="JSON file of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="ratio of the median durations above which a benchmark counts as a regression")
+    parser.add_argument("--list", action="store_true", help="print the names of the benchmarks and exit")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the benchmarked code")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(sys.argv[1:] if args is None else args)
+    if "render" in args.suite:
+        # the platform of PyOpenGL is chosen when OpenGL is imported for the first time
+        os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    from . import runner
+    if args.list:
+        benchmarks, errors = runner.load_suites(args.suite)
+        for suite, error in errors.items():
+            print("suite %s skipped: %s" % (suite, error))
+        for benchmark in benchmarks:
+            print("%-40s %-10s %s" % (benchmark.name, benchmark.suite, benchmark.params))
+        return 0
+    repeat = args.repeat if args.repeat is not None else runner.DEFAULT_REPEAT
+    min_time = args.min_time if args.min_time is not None else runner.DEFAULT_MIN_TIME
+    results = runner.run_benchmarks(args.suite, args.filter, repeat, min_time, args.verbose)
+    if args.output is not None:
+        runner.save_results(results, args.output)
+    if args.compare is None:
+        return 0
+    threshold = args.threshold if args.threshold is not None else runner.DEFAULT_REGRESSION_THRESHOLD
+    comparison = runner.compare_results(runner.load_results(args.compare), results, threshold)
+    n_regressions = 0
+    for name, baseline_ms, current_ms, ratio, is_regression in comparison:
+        print("%-40s %12.4fms %12.4fms %6.2fx%s" % (name, baseline_ms, current_ms, ratio,
+                                                   " regression" if is_regression else ""))
+        n_regressions += int(is_regression)
+    return 1 if n_regressions > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
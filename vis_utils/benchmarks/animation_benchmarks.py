@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+""" skeleton loading and forward kinematics """
+import numpy as np
+from anim_utils.animation_data import BVHReader, MotionVector, SkeletonBuilder
+from ..scene.scene_object import SceneObject
+from ..animation.skeleton_visualization import SkeletonVisualization
+from ..animation.crowd import CrowdComponent
+from .runner import register_benchmark
+from .synthetic import generate_bvh_string, write_temp_file
+
+
+def load_synthetic_clip(n_joints, n_frames):
+    bvh_reader = BVHReader(write_temp_file(generate_bvh_string(n_joints, n_frames), ".bvh"))
+    animated_joints = [key for key in list(bvh_reader.node_names.keys()) if not key.endswith("EndSite")]
+    skeleton = SkeletonBuilder().load_from_bvh(bvh_reader, animated_joints)
+    mv = MotionVector()
+    mv.from_bvh_reader(bvh_reader, False)
+    mv.skeleton = skeleton
+    return skeleton, mv
+
+
+class FrameCycle(object):
+    def __init__(self, n_frames):
+        self.n_frames = n_frames
+        self.idx = 0
+
+    def next(self):
+        self.idx = (self.idx + 1) % self.n_frames
+        return self.idx
+
+
+@register_benchmark("bvh_parse", "animation", n_joints=50, n_frames=1000)
+def setup_bvh_parse(n_joints, n_frames):
+    filename = write_temp_file(generate_bvh_string(n_joints, n_frames), ".bvh")
+    return lambda: BVHReader(filename)
+
+
+@register_benchmark("skeleton_build_from_bvh", "animation", n_joints=50, n_frames=10)
+def setup_skeleton_build(n_joints, n_frames):
+    bvh_reader = BVHReader(write_temp_file(generate_bvh_string(n_joints, n_frames), ".bvh"))
+    animated_joints = [key for key in list(bvh_reader.node_names.keys()) if not key.endswith("EndSite")]
+    return lambda: SkeletonBuilder().load_from_bvh(bvh_reader, animated_joints)
+
+
+@register_benchmark("skeleton_vis_update_transformation_large", "animation", n_joints=200, n_frames=300)
+@register_benchmark("skeleton_vis_update_transformation", "animation", n_joints=50, n_frames=300)
+def setup_update_transformation(n_joints, n_frames):
+    skeleton, mv = load_synthetic_clip(n_joints, n_frames)
+    skeleton_vis = SkeletonVisualization(SceneObject(), [0, 0, 1])
+    skeleton_vis.set_skeleton(skeleton, visualize=False, width_scale=1.0)
+    frames = FrameCycle(mv.n_frames)
+    global_transformation = np.eye(4)
+    return lambda: skeleton_vis.updateTransformation(mv.frames[frames.next()], global_transformation)
+
+
+@register_benchmark("crowd_update", "animation", n_joints=50, n_frames=300, n_instances=1000)
+def setup_crowd_update(n_joints, n_frames, n_instances):
+    skeleton, mv = load_synthetic_clip(n_joints, n_frames)
+    crowd = CrowdComponent(SceneObject(), skeleton, [mv])
+    crowd.place_instances_on_grid(n_instances)
+    return lambda: crowd.update(mv.frame_time)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+""" creates an OpenGL context without a window. PYOPENGL_PLATFORM has to be set to egl before OpenGL is imported
+to use EGL, otherwise a hidden pygame window is created.
+"""
+import os
+import ctypes
+
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+GL_MAJOR_VERSION = 3
+GL_MINOR_VERSION = 3
+_context = None
+
+
+def _initialize_egl_display(EGL, display):
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    try:
+        return bool(EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)))
+    except EGL.EGLError:
+        return False
+
+
+def _create_egl_context():
+    from OpenGL import EGL
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not _initialize_egl_display(EGL, display):
+        # drivers without a default display like Mesa on a machine without a GPU
+        display = EGL.eglGetPlatformDisplay(EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None)
+        if not _initialize_egl_display(EGL, display):
+            raise RuntimeError("could not initialize an EGL display")
+    attributes = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8,
+                  EGL.EGL_BLUE_SIZE, 8, EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE]
+    attributes = (EGL.EGLint * len(attributes))(*attributes)
+    config = EGL.EGLConfig()
+    n_configs = EGL.EGLint()
+    if not EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(n_configs)) \
+            or n_configs.value == 0:
+        raise RuntimeError("no EGL config supports OpenGL")
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context_attributes = [EGL.EGL_CONTEXT_MAJOR_VERSION, GL_MAJOR_VERSION,
+                          EGL.EGL_CONTEXT_MINOR_VERSION, GL_MINOR_VERSION,
+                          EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_COMPATIBILITY_PROFILE_BIT,
+                          EGL.EGL_NONE]
+    context_attributes = (EGL.EGLint * len(context_attributes))(*context_attributes)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, context_attributes)
+    if not context:
+        raise RuntimeError("could not create an EGL context")
+    # the benchmarks render into their own framebuffer, so no surface is needed
+    if not EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, context):
+        raise RuntimeError("could not make the EGL context current")
+    return context
+
+
+def _create_pygame_context(width, height):
+    import pygame
+    pygame.display.init()
+    return pygame.display.set_mode((width, height), pygame.OPENGL | pygame.DOUBLEBUF | pygame.HIDDEN)
+
+
+def create_headless_context(width=640, height=480):
+    """ creates the context on the first call and returns it on the following calls """
+    global _context
+    if _context is None:
+        if os.environ.get("PYOPENGL_PLATFORM") == "egl":
+            _context = _create_egl_context()
+        else:
+            _context = _create_pygame_context(width, height)
+    return _context
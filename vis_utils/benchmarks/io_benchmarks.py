@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+""" loaders and mesh preparation on the CPU """
+from ..io import obj_format, gltf
+from ..graphics.geometry.mesh import combine_vertex_list_from_faces, deduplicate_vertices
+from .runner import register_benchmark
+from .synthetic import generate_obj_string, generate_gltf, generate_mesh_desc
+
+
+@register_benchmark("obj_load_meshes2", "io", n_segments=200)
+def setup_obj_load_meshes2(n_segments):
+    text = generate_obj_string(n_segments)
+    return lambda: obj_format.load_meshes2(text)
+
+
+@register_benchmark("gltf_extract_values", "io", n_segments=200)
+def setup_gltf_extract_values(n_segments):
+    data = generate_gltf(n_segments)
+    return lambda: gltf.extract_values(data, 0)
+
+
+@register_benchmark("gltf_extract_mesh", "io", n_segments=200)
+def setup_gltf_extract_mesh(n_segments):
+    data = generate_gltf(n_segments)
+    primitive = data.meshes[0].primitives[0]
+    return lambda: gltf.extract_mesh(data, primitive)
+
+
+@register_benchmark("mesh_combine_vertices", "io", n_segments=200)
+def setup_mesh_combine_vertices(n_segments):
+    """ the part of Mesh.build_from_desc that runs before the upload """
+    desc = generate_mesh_desc(n_segments)
+
+    def run():
+        vertex_list = combine_vertex_list_from_faces(desc["faces"], desc["vertices"], desc["normals"],
+                                                     desc["texture_coordinates"], desc["shift_index"])
+        return deduplicate_vertices(vertex_list)
+    return run
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+""" render passes and buffer uploads in a headless context. The duration includes glFinish, so it covers the work
+of the driver and the GPU.
+"""
+import numpy as np
+from OpenGL.GL import glFinish, glViewport
+from .gl_context import create_headless_context
+from .runner import register_benchmark
+from .synthetic import generate_mesh_desc, generate_point_cloud_stream
+
+WIDTH = 640
+HEIGHT = 480
+create_headless_context(WIDTH, HEIGHT)
+
+from ..graphics import materials
+from ..graphics.camera3d import OrbitingCamera
+from ..graphics.geometry.mesh import Mesh
+from ..graphics.light.point_light import PointLight
+from ..graphics.sceen_frame_buffer import ScreenFramebuffer
+from ..graphics.renderer.main_renderer import MainRenderer
+from ..graphics.renderer.color_picking_renderer import ColorPickingRenderer
+from ..graphics.utils import get_translation_matrix
+from ..scene.scene_object import SceneObject
+from ..scene.components import StaticMesh
+from ..scene.legacy.debug_visualization import PointCloudObject
+
+GRID_SPACING = 20.0
+
+
+def create_camera(distance):
+    camera = OrbitingCamera()
+    camera.set_projection_matrix(45, WIDTH / HEIGHT, 1.0, distance * 4)
+    camera.position = np.zeros(3)
+    camera.zoom = -distance
+    camera.updateRotationMatrix(45, 30)
+    return camera
+
+
+def create_mesh_objects(n_objects, slices=20):
+    sphere = Mesh.build_sphere(slices, slices, GRID_SPACING / 2, materials.standard)
+    n_columns = int(np.ceil(np.sqrt(n_objects)))
+    objects = []
+    for idx in range(n_objects):
+        scene_object = SceneObject("sphere%d" % idx)
+        offset = np.array([idx % n_columns - n_columns / 2, 0, idx // n_columns - n_columns / 2]) * GRID_SPACING
+        scene_object.transformation = get_translation_matrix(offset)
+        scene_object.add_component("static_mesh", StaticMesh.from_meshes(scene_object, [sphere]))
+        objects.append(scene_object)
+    return objects, n_columns * GRID_SPACING
+
+
+def create_light():
+    light = PointLight()
+    light.position = [0.0, 100.0, 100.0, 0.0]
+    light.intensities = [1.0, 1.0, 1.0]
+    return light
+
+
+def render_pass(frame_buffer, func):
+    frame_buffer.prepare_buffer()
+    glViewport(0, 0, frame_buffer.width, frame_buffer.height)
+    func()
+    glFinish()
+
+
+@register_benchmark("render_main_pass", "render", n_objects=400)
+def setup_render_main_pass(n_objects):
+    frame_buffer = ScreenFramebuffer(WIDTH, HEIGHT)
+    objects, extent = create_mesh_objects(n_objects)
+    camera = create_camera(extent)
+    renderer = MainRenderer(use_shadow=False)
+    p_m = camera.get_projection_matrix()
+    v_m = camera.get_view_matrix()
+    return lambda: render_pass(frame_buffer, lambda: renderer.render_scene(objects, p_m, v_m, []))
+
+
+@register_benchmark("render_color_picking", "render", n_objects=400)
+def setup_render_color_picking(n_objects):
+    frame_buffer = ScreenFramebuffer(WIDTH, HEIGHT)
+    objects, extent = create_mesh_objects(n_objects)
+    camera = create_camera(extent)
+    renderer = ColorPickingRenderer()
+    p_m = camera.get_projection_matrix()
+    v_m = camera.get_view_matrix()
+    return lambda: render_pass(frame_buffer, lambda: renderer.render_scene(objects, p_m, v_m))
+
+
+@register_benchmark("render_point_cloud", "render", n_points=50, n_frames=200)
+def setup_render_point_cloud(n_points, n_frames):
+    """ draws a point cloud that grows by one frame of a stream per call """
+    frame_buffer = ScreenFramebuffer(WIDTH, HEIGHT)
+    stream = generate_point_cloud_stream(n_points, n_frames)
+    point_cloud = PointCloudObject(radius=1.0)
+    lights = [create_light()]
+    camera = create_camera(200.0)
+    p_m = camera.get_projection_matrix()
+    v_m = camera.get_view_matrix()
+    frame = [0]
+
+    def draw():
+        if frame[0] == 0:
+            point_cloud.clear()
+        for point in stream[frame[0]]:
+            point_cloud.addPoint(point)
+        frame[0] = (frame[0] + 1) % n_frames
+        point_cloud.draw(v_m, p_m, lights)
+    return lambda: render_pass(frame_buffer, draw)
+
+
+@register_benchmark("mesh_build_from_desc", "render", n_segments=200)
+def setup_mesh_build_from_desc(n_segments):
+    desc = generate_mesh_desc(n_segments)
+
+    def build():
+        Mesh.build_from_desc(desc)
+        glFinish()
+    return build
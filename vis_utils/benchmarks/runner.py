@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+""" registry and timing of the benchmarks. The results are written as JSON with sorted keys so files of different
+commits can be compared with compare_results or a plain diff.
+"""
+import collections
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import numpy as np
+
+RESULT_FORMAT_VERSION = 1
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.1  # seconds per sample, the number of calls per sample is doubled until it is reached
+MAX_NUMBER = 1 << 20
+DEFAULT_REGRESSION_THRESHOLD = 1.25
+SUITES = collections.OrderedDict([("io", ".io_benchmarks"),
+                                  ("animation", ".animation_benchmarks"),
+                                  ("scene", ".scene_benchmarks"),
+                                  ("render", ".render_benchmarks")])
+BENCHMARKS = collections.OrderedDict()  # name -> Benchmark
+
+
+class Benchmark(object):
+    """ setup is called once with the parameters and returns the function that is timed """
+    def __init__(self, name, suite, setup, params):
+        self.name = name
+        self.suite = suite
+        self.setup = setup
+        self.params = params
+
+
+def register_benchmark(name, suite, **params):
+    def decorator(setup):
+        BENCHMARKS[name] = Benchmark(name, suite, setup, params)
+        return setup
+    return decorator
+
+
+def load_suites(suites=None):
+    """ returns the benchmarks of the suites and a dict with the errors of the suites that are not available,
+        e.g. because a dependency is missing or no OpenGL context can be created
+    """
+    if suites is None:
+        suites = list(SUITES.keys())
+    errors = collections.OrderedDict()
+    for suite in suites:
+        if suite not in SUITES:
+            raise ValueError("unknown benchmark suite %s" % suite)
+        try:
+            importlib.import_module(SUITES[suite], __package__)
+        except (ImportError, RuntimeError) as e:
+            errors[suite] = "%s: %s" % (type(e).__name__, e)
+    benchmarks = [b for b in BENCHMARKS.values() if b.suite in suites and b.suite not in errors]
+    return benchmarks, errors
+
+
+def _time_calls(func, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - start
+
+
+def time_benchmark(benchmark, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME):
+    """ returns the statistics of the duration of one call in milliseconds """
+    func = benchmark.setup(**benchmark.params)
+    number = 1
+    duration = _time_calls(func, number)
+    while duration < min_time and number < MAX_NUMBER:
+        number *= 2
+        duration = _time_calls(func, number)
+    samples = np.array([_time_calls(func, number) / number for _ in range(repeat)]) * 1000
+    return {"suite": benchmark.suite, "params": benchmark.params, "number": number, "repeat": repeat,
+            "mean_ms": float(np.mean(samples)), "median_ms": float(np.median(samples)),
+            "min_ms": float(np.min(samples)), "max_ms": float(np.max(samples)), "std_ms": float(np.std(samples))}
+
+
+def get_git_commit():
+    try:
+        output = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(__file__),
+                                         stderr=subprocess.DEVNULL)
+        return output.decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "machine": platform.machine(), "processor": platform.processor(), "commit": get_git_commit()}
+
+
+def run_benchmarks(suites=None, pattern=None, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME, verbose=False,
+                   log=sys.stderr):
+    """ runs the benchmarks of the suites whose name matches the regular expression.
+        The output of the benchmarked code is discarded unless verbose is True.
+        A benchmark that fails, e.g. because an optional dependency is missing, is reported with its error.
+    """
+    results = collections.OrderedDict()
+    benchmarks, errors = load_suites(suites)
+    for suite, error in errors.items():
+        log.write("suite %s skipped: %s\n" % (suite, error))
+    for benchmark in benchmarks:
+        if pattern is not None and re.search(pattern, benchmark.name) is None:
+            continue
+        output = sys.stdout if verbose else io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                result = time_benchmark(benchmark, repeat, min_time)
+            log.write("%-40s %12.4fms\n" % (benchmark.name, result["median_ms"]))
+        except Exception as e:
+            result = {"suite": benchmark.suite, "params": benchmark.params, "error": "%s: %s" % (type(e).__name__, e)}
+            log.write("%-40s failed: %s\n" % (benchmark.name, result["error"]))
+        results[benchmark.name] = result
+    return {"version": RESULT_FORMAT_VERSION, "environment": get_environment(), "results": results,
+            "skipped_suites": errors}
+
+
+def save_results(results, filename):
+    with open(filename, "w") as out_file:
+        json.dump(results, out_file, indent=2, sort_keys=True)
+
+
+def load_results(filename):
+    with open(filename, "r") as in_file:
+        return json.load(in_file)
+
+
+def compare_results(baseline, current, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """ returns a list of (name, baseline ms, current ms, ratio, is_regression) for the benchmarks in both results """
+    comparison = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or "median_ms" not in base or "median_ms" not in result:
+            continue
+        if base["params"] != result["params"]:
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] > 0 else np.inf
+        comparison.append((name, base["median_ms"], result["median_ms"], ratio, ratio > threshold))
+    return comparison
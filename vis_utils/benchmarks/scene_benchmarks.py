@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+""" dispatch of the update phases, scene recording and point cloud streams """
+import numpy as np
+from ..scene.scene import Scene
+from ..scene.scene_object import SceneObject
+from ..scene.components import ComponentBase
+from ..scene.scene_recorder import SceneRecorder
+from ..scene.legacy.debug_visualization import DecimatedList
+from .runner import register_benchmark
+from .synthetic import generate_point_cloud_stream, write_temp_file
+
+FRAME_TIME = 1.0 / 60
+
+
+class SyntheticMotionComponent(ComponentBase):
+    """ moves the object on a circle and updates joint matrices like an animation controller """
+    parallel_update = True
+
+    def __init__(self, scene_object, n_joints, phase):
+        ComponentBase.__init__(self, scene_object)
+        self.time = phase
+        self.matrices = np.tile(np.eye(4), (n_joints, 1, 1))
+        self.offsets = np.linspace(0, 1, n_joints)
+
+    def update(self, dt):
+        self.time += dt
+        self.scene_object.transformation[3, 0] = np.cos(self.time) * 100
+        self.scene_object.transformation[3, 2] = np.sin(self.time) * 100
+        self.matrices[:, 1, 3] = np.sin(self.time + self.offsets)
+
+
+def create_synthetic_scene(n_objects, n_joints):
+    scene = Scene(visualize=False)
+    for idx in range(n_objects):
+        scene_object = SceneObject("object%d" % idx)
+        scene_object.add_component("motion", SyntheticMotionComponent(scene_object, n_joints, idx))
+        scene.addObject(scene_object)
+    return scene
+
+
+def update_scene(scene, dt):
+    scene.before_update(dt)
+    scene.update(dt)
+    scene.after_update(dt)
+
+
+@register_benchmark("scene_update_parallel", "scene", n_objects=500, n_joints=50, parallel=True)
+@register_benchmark("scene_update", "scene", n_objects=500, n_joints=50, parallel=False)
+def setup_scene_update(n_objects, n_joints, parallel):
+    scene = create_synthetic_scene(n_objects, n_joints)
+    scene.set_parallel_update(parallel)
+    return lambda: update_scene(scene, FRAME_TIME)
+
+
+@register_benchmark("scene_record_frame", "scene", n_objects=500, n_joints=50)
+def setup_scene_record_frame(n_objects, n_joints):
+    scene = create_synthetic_scene(n_objects, n_joints)
+    recorder = SceneRecorder(scene, write_temp_file("", ".rec"))
+    recorder.start()
+    return lambda: update_scene(scene, FRAME_TIME)
+
+
+@register_benchmark("point_cloud_stream", "scene", n_points=50, n_frames=1000, max_points=10000)
+def setup_point_cloud_stream(n_points, n_frames, max_points):
+    """ appends the markers of one frame of a stream to a decimated point list """
+    stream = generate_point_cloud_stream(n_points, n_frames)
+    points = DecimatedList(max_points)
+    frame = [0]
+
+    def run():
+        for point in stream[frame[0]]:
+            points.add(point)
+        frame[0] = (frame[0] + 1) % n_frames
+    return run
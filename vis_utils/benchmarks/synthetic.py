@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+""" deterministic generators for the inputs of the benchmarks """
+import atexit
+import os
+import tempfile
+import numpy as np
+
+DEFAULT_SEED = 0
+BVH_CHANNELS = ["Zrotation", "Xrotation", "Yrotation"]
+BVH_ROOT_CHANNELS = ["Xposition", "Yposition", "Zposition"] + BVH_CHANNELS
+
+
+def generate_joint_tree(n_joints, branching=3, bone_length=10.0, seed=DEFAULT_SEED):
+    """ returns a list of (name, parent index, offset). Every joint has at most branching children. """
+    rng = np.random.RandomState(seed)
+    joints = [("root", None, np.zeros(3))]
+    n_children = [0]
+    for idx in range(1, n_joints):
+        candidates = [p for p in range(max(0, idx - branching * 2), idx) if n_children[p] < branching]
+        parent = candidates[rng.randint(len(candidates))] if len(candidates) > 0 else idx - 1
+        direction = rng.randn(3)
+        direction /= np.linalg.norm(direction)
+        joints.append(("joint%d" % idx, parent, direction * bone_length))
+        n_children[parent] += 1
+        n_children.append(0)
+    return joints
+
+
+def generate_motion(n_joints, n_frames, frame_time=1.0/30, seed=DEFAULT_SEED):
+    """ returns euler frames in degrees with a root translation that are smooth over time """
+    rng = np.random.RandomState(seed)
+    t = np.arange(n_frames)[:, None] * frame_time
+    frequencies = rng.uniform(0.2, 2.0, (1, 3 + 3 * n_joints))
+    phases = rng.uniform(0, 2 * np.pi, (1, 3 + 3 * n_joints))
+    amplitudes = np.full((1, 3 + 3 * n_joints), 30.0)
+    amplitudes[0, :3] = 10.0
+    return amplitudes * np.sin(2 * np.pi * frequencies * t + phases)
+
+
+def generate_bvh_string(n_joints=50, n_frames=300, frame_time=1.0/30, seed=DEFAULT_SEED):
+    joints = generate_joint_tree(n_joints, seed=seed)
+    children = [[] for _ in joints]
+    for idx, (_, parent, _) in enumerate(joints):
+        if parent is not None:
+            children[parent].append(idx)
+    lines = ["HIERARCHY"]
+
+    def write_joint(idx, depth):
+        name, parent, offset = joints[idx]
+        indent = "  " * depth
+        channels = BVH_ROOT_CHANNELS if parent is None else BVH_CHANNELS
+        lines.append(indent + ("ROOT " if parent is None else "JOINT ") + name)
+        lines.append(indent + "{")
+        lines.append(indent + "  OFFSET %f %f %f" % tuple(offset))
+        lines.append(indent + "  CHANNELS %d %s" % (len(channels), " ".join(channels)))
+        for c in children[idx]:
+            write_joint(c, depth + 1)
+        if len(children[idx]) == 0:
+            lines.append(indent + "  End Site")
+            lines.append(indent + "  {")
+            lines.append(indent + "    OFFSET 0.000000 5.000000 0.000000")
+            lines.append(indent + "  }")
+        lines.append(indent + "}")
+
+    write_joint(0, 0)
+    frames = generate_motion(n_joints, n_frames, frame_time, seed)
+    lines.append("MOTION")
+    lines.append("Frames: %d" % n_frames)
+    lines.append("Frame Time: %f" % frame_time)
+    for frame in frames:
+        lines.append(" ".join("%f" % v for v in frame))
+    return "\n".join(lines) + "\n"
+
+
+def generate_grid_mesh(n_segments=100, size=100.0):
+    """ returns vertices, normals, uvs and triangle faces with the columns vertex, normal and uv index """
+    x = np.linspace(-size / 2, size / 2, n_segments + 1)
+    gx, gz = np.meshgrid(x, x)
+    gy = np.sin(gx * 0.1) * np.cos(gz * 0.1) * size * 0.05
+    vertices = np.column_stack([gx.ravel(), gy.ravel(), gz.ravel()])
+    normals = np.tile([0.0, 1.0, 0.0], (len(vertices), 1))
+    uvs = np.column_stack([(gx.ravel() / size) + 0.5, (gz.ravel() / size) + 0.5])
+    row = np.arange(n_segments)
+    a = (row[:, None] * (n_segments + 1) + row[None, :]).ravel()
+    b = a + 1
+    c = a + n_segments + 1
+    d = c + 1
+    triangles = np.concatenate([np.column_stack([a, c, b]), np.column_stack([b, c, d])])
+    faces = np.repeat(triangles[:, :, None], 3, axis=2)
+    return vertices, normals, uvs, faces
+
+
+def generate_mesh_desc(n_segments=100, size=100.0):
+    """ returns a mesh description in the format of obj_format.load_meshes2 """
+    vertices, normals, uvs, faces = generate_grid_mesh(n_segments, size)
+    return {"name": "grid", "faces": faces, "vertices": vertices, "normals": normals,
+            "texture_coordinates": uvs, "face_groups": [], "shift_index": False,
+            "type": "triangles", "material": "", "has_material": False}
+
+
+def generate_obj_string(n_segments=100, size=100.0, n_groups=4):
+    vertices, normals, uvs, faces = generate_grid_mesh(n_segments, size)
+    lines = ["# synthetic grid"]
+    lines += ["v %f %f %f" % tuple(v) for v in vertices]
+    lines += ["vt %f %f" % tuple(t) for t in uvs]
+    lines += ["vn %f %f %f" % tuple(n) for n in normals]
+    group_size = int(np.ceil(len(faces) / n_groups))
+    for idx, face in enumerate(faces + 1):
+        if idx % group_size == 0:
+            lines.append("g group%d" % (idx // group_size))
+            lines.append("usemtl material%d" % (idx // group_size))
+        lines.append("f " + " ".join("%d/%d/%d" % (v, t, n) for v, n, t in face))
+    return "\n".join(lines) + "\n"
+
+
+def generate_gltf(n_segments=100, size=100.0):
+    """ returns a pygltflib.GLTF2 with one indexed mesh stored in its binary blob.
+        The indices are unsigned shorts, so n_segments has to be below 255.
+    """
+    import pygltflib
+    vertices, normals, uvs, faces = generate_grid_mesh(n_segments, size)
+    arrays = [(vertices.astype(np.float32), "VEC3", pygltflib.FLOAT, pygltflib.ARRAY_BUFFER),
+              (normals.astype(np.float32), "VEC3", pygltflib.FLOAT, pygltflib.ARRAY_BUFFER),
+              (uvs.astype(np.float32), "VEC2", pygltflib.FLOAT, pygltflib.ARRAY_BUFFER),
+              (faces[:, :, 0].astype(np.uint16).ravel(), "SCALAR", pygltflib.UNSIGNED_SHORT,
+               pygltflib.ELEMENT_ARRAY_BUFFER)]
+    blob = b""
+    buffer_views = []
+    accessors = []
+    for idx, (array, a_type, component_type, target) in enumerate(arrays):
+        data = array.tobytes()
+        buffer_views.append(pygltflib.BufferView(buffer=0, byteOffset=len(blob), byteLength=len(data), target=target))
+        accessor = pygltflib.Accessor(bufferView=idx, byteOffset=0, componentType=component_type,
+                                      count=len(array), type=a_type)
+        if idx == 0:
+            accessor.min = array.min(axis=0).tolist()
+            accessor.max = array.max(axis=0).tolist()
+        accessors.append(accessor)
+        blob += data + b"\x00" * (-len(data) % 4)
+    attributes = pygltflib.Attributes(POSITION=0, NORMAL=1, TEXCOORD_0=2)
+    mesh = pygltflib.Mesh(primitives=[pygltflib.Primitive(attributes=attributes, indices=3)])
+    data = pygltflib.GLTF2(scene=0, scenes=[pygltflib.Scene(nodes=[0])], nodes=[pygltflib.Node(mesh=0)],
+                           meshes=[mesh], accessors=accessors, bufferViews=buffer_views,
+                           buffers=[pygltflib.Buffer(byteLength=len(blob))])
+    data.set_binary_blob(blob)
+    return data
+
+
+def generate_point_cloud_stream(n_points=50, n_frames=300, seed=DEFAULT_SEED):
+    """ returns an array with shape (n_frames, n_points, 3) of markers moving on smooth paths """
+    rng = np.random.RandomState(seed)
+    t = np.arange(n_frames)[:, None, None] / 30.0
+    centers = rng.uniform(-50, 50, (1, n_points, 3))
+    frequencies = rng.uniform(0.1, 1.0, (1, n_points, 3))
+    return centers + 10.0 * np.sin(2 * np.pi * frequencies * t)
+
+
+def write_temp_file(text, suffix):
+    """ writes the text to a file that is removed when the interpreter exits """
+    handle, filename = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(handle, "w") as out_file:
+        out_file.write(text)
+    atexit.register(os.remove, filename)
+    return filename
@@ -28,7 +28,13 @@ class ConsoleApp(AppBase):
         super(ConsoleApp, self).__init__(**kwargs)
 
     def run(self):
+        """ runs the update loop in the calling thread. Pass throttle=False to the constructor
+            to execute the updates as fast as possible with a fixed dt.
+        """
         print("run")
         self.is_running = True
-        while self.is_running:
-            self.update()
\ No newline at end of file
+        if self.decouple_updates:
+            self.run_update_loop()
+        else:
+            while self.is_running:
+                self.update()
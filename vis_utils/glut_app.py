@@ -147,7 +147,13 @@ class GLUTApp(AppBase):
     def run(self):
         # Run the GLUT main loop until the user closes the window.
         print("run")
-        glutMainLoop()
+        self.is_running = True
+        glutSetOption(GLUT_ACTION_ON_WINDOW_CLOSE, GLUT_ACTION_GLUTMAINLOOP_RETURNS)
+        glutCloseFunc(self.stop)
+        try:
+            glutMainLoop()
+        finally:
+            self.stop()
 
     def keyboard(self, key, x, y):
         for t in self.keyboard_handler.values():
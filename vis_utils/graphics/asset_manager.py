@@ -1,5 +1,4 @@
 from  ..graphics.geometry.mesh import Mesh
-from ..graphics import materials
 from ..graphics.material_manager import MaterialManager
 
 
@@ -22,10 +21,9 @@ class AssetManager():
             texture_name = m_desc["texture"]
             if texture_name is not None and texture_name.endswith(b'Hair_texture_big.png'):
                 return None
-            material = self.material_manager.get(m_desc["texture"])
-            if material is None:
-                material = materials.TextureMaterial.from_image(m_desc["material"])
-                self.material_manager.set(m_desc["texture"], material)
+            material = self.material_manager.get_texture_material(m_desc["material"]["Kd"])
+        elif "material" in m_desc and "albedo_texture" in m_desc["material"]:
+            material = self.material_manager.get_texture_material(m_desc["material"]["albedo_texture"])
         return material
     
     def create_mesh_from_desc(self, m_desc):
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+""" https://www.khronos.org/opengl/wiki/Buffer_Texture
+"""
+import numpy as np
+from OpenGL.GL import *
+
+BONE_PALETTE_TEXTURE_UNIT = 1
+
+
+class BonePalette(object):
+    """ Stores skinning matrices in a buffer texture that can be shared by all render passes.
+        Each matrix occupies four RGBA32F texels containing its columns, so the number of bones
+        is only limited by GL_MAX_TEXTURE_BUFFER_SIZE instead of the uniform storage of the shader.
+    """
+    def __init__(self):
+        self.buffer_id = glGenBuffers(1)
+        self.texture_id = glGenTextures(1)
+        self.capacity = 0
+        self.n_bones = 0
+        self.n_instances = 1
+
+    def upload(self, matrices, n_instances=1):
+        """ matrices: array of row major 4x4 matrices with shape (n_bones, 4, 4)
+            For instanced skinning the matrices of all instances are stored consecutively
+            and the shader offsets the bone ids by gl_InstanceID * n_bones.
+        """
+        data = np.ascontiguousarray(np.transpose(matrices, (0, 2, 1)), dtype=np.float32).reshape((-1, 4, 4))
+        n_matrices = len(data)
+        glBindBuffer(GL_TEXTURE_BUFFER, self.buffer_id)
+        if n_matrices > self.capacity:
+            glBufferData(GL_TEXTURE_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+            self.capacity = n_matrices
+            glBindTexture(GL_TEXTURE_BUFFER, self.texture_id)
+            glTexBuffer(GL_TEXTURE_BUFFER, GL_RGBA32F, self.buffer_id)
+            glBindTexture(GL_TEXTURE_BUFFER, 0)
+        elif n_matrices > 0:
+            glBufferSubData(GL_TEXTURE_BUFFER, 0, data.nbytes, data)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+        self.n_instances = max(n_instances, 1)
+        self.n_bones = n_matrices // self.n_instances
+
+    def bind(self, texture_unit=BONE_PALETTE_TEXTURE_UNIT):
+        glActiveTexture(GL_TEXTURE0 + texture_unit)
+        glBindTexture(GL_TEXTURE_BUFFER, self.texture_id)
+        glActiveTexture(GL_TEXTURE0)
+
+    def cleanup(self):
+        glDeleteTextures([self.texture_id])
+        glDeleteBuffers(1, [self.buffer_id])
+        self.capacity = 0
+        self.n_bones = 0
+
+
+class AnimationTexture(BonePalette):
+    """ Stores the baked skinning matrices of all frames of a looping clip in a buffer texture.
+        The frames are stored consecutively, so the shader finds bone id of frame f at f * n_bones + id
+        and interpolates between two frames. Only the current frame has to be set per draw call.
+    """
+    def __init__(self):
+        BonePalette.__init__(self)
+        self.n_frames = 0
+        self.frame_time = 1.0
+
+    def upload_frames(self, palettes, frame_time):
+        """ palettes: array of row major 4x4 matrices with shape (n_frames, n_bones, 4, 4)"""
+        palettes = np.asarray(palettes)
+        self.upload(palettes.reshape((-1, 4, 4)), len(palettes))
+        self.n_frames = len(palettes)
+        self.frame_time = frame_time
+
+    def get_frame(self, time):
+        """ returns the fractional frame index for the time in seconds"""
+        if self.n_frames == 0:
+            return 0.0
+        return (time / self.frame_time) % self.n_frames
@@ -23,6 +23,10 @@
 import numpy as np
 import imgui
 from .renderer.text_renderer import TextRenderer
+from ..profiling import Profiler
+
+PROFILER_OVERLAY_WIDTH = 420
+PROFILER_OVERLAY_MAX_ROWS = 20
 
 class Console(object):
     def __init__(self, top_left, scale=1.0, z=-10, alpha=255, max_line_length=1000):
@@ -86,3 +90,32 @@ class IMGUIConsole(object):
 
     def add_line(self, line):
         self.lines.append(line)
+
+
+
+class IMGUIProfilerOverlay(object):
+    """ shows the rolling percentiles collected by the Profiler """
+    def __init__(self, top_left, max_rows=PROFILER_OVERLAY_MAX_ROWS):
+        self.top_left = top_left
+        self.max_rows = max_rows
+        self.title = "profiler"
+        self.trace_filename = "trace.json"
+
+    def render(self):
+        imgui.set_next_window_position(self.top_left[0], self.top_left[1])
+        imgui.set_next_window_size(PROFILER_OVERLAY_WIDTH, 0)
+        imgui.begin(self.title, True)
+        if not Profiler.active:
+            imgui.text("disabled")
+            imgui.end()
+            return
+        imgui.text("frame " + str(Profiler.frame_idx))
+        for key, values in Profiler.get_counter_report():
+            imgui.text("%s: %d (p95 %d)" % (key, values[0], values[1]))
+        imgui.separator()
+        imgui.text("ms          p50     p95     p99")
+        for key, values in Profiler.get_timing_report()[:self.max_rows]:
+            imgui.text("%-28s %6.2f %6.2f %6.2f" % (key[-28:], values[0], values[1], values[2]))
+        if Profiler.record_trace and imgui.button("export trace"):
+            Profiler.export_chrome_trace(self.trace_filename)
+        imgui.end()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+""" Level of detail helpers: simplification of meshes by vertex clustering and the projected size of bounding spheres.
+"""
+import numpy as np
+
+# the simplified levels are used when the projected diameter is smaller than the number of grid cells
+# or sphere slices times these factors
+LOD_PIXELS_PER_CELL = 4.0
+LOD_PIXELS_PER_SEGMENT = 3.0
+
+
+def get_bounding_sphere(positions):
+    """ returns the center of the bounding box and the largest distance of a position to it """
+    positions = np.asarray(positions, dtype=np.float64)
+    if len(positions) == 0:
+        return np.zeros(3), 0.0
+    center = (positions.min(axis=0) + positions.max(axis=0)) / 2
+    radius = float(np.max(np.linalg.norm(positions - center, axis=1)))
+    return center, radius
+
+
+def get_projected_size(center, radius, view_matrix, projection_matrix, viewport_height):
+    """ returns the approximate diameter of a bounding sphere on the screen in pixels.
+        center is in world space, the matrices are row major as uploaded to the shaders.
+    """
+    view_position = np.dot(np.append(center, 1.0), view_matrix)
+    w = np.dot(view_position, projection_matrix[:, 3])
+    if w <= 1e-6:
+        # the sphere reaches behind the camera
+        return np.inf
+    return radius * projection_matrix[1, 1] * viewport_height / w
+
+
+def get_triangle_indices(index_list, n_vertices, array_type_is_quads):
+    if index_list is None:
+        index_list = np.arange(n_vertices, dtype=np.uint32)
+    indices = np.asarray(index_list, dtype=np.int64).ravel()
+    if array_type_is_quads:
+        quads = indices[:len(indices) // 4 * 4].reshape((-1, 4))
+        return np.vstack([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+    return indices[:len(indices) // 3 * 3].reshape((-1, 3))
+
+
+def cluster_vertices(vertices, triangles, cell_size):
+    """ simplifies a triangle mesh by merging all vertices in a cell of a uniform grid.
+        Each cell is represented by the vertex closest to the mean position of the cell, so that all attributes
+        including uvs and bone ids stay valid. Triangles that collapse are removed.
+        vertices: interleaved vertex array that starts with the position
+        triangles: array with shape (n, 3)
+        returns the vertices of the simplified mesh and its triangle indices
+    """
+    vertices = np.asarray(vertices, dtype=np.float32)
+    positions = vertices[:, :3].astype(np.float64)
+    cells = np.floor((positions - positions.min(axis=0)) / cell_size).astype(np.int64)
+    _, cluster, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    cluster = cluster.ravel()
+    means = np.zeros((len(counts), 3))
+    np.add.at(means, cluster, positions)
+    means /= counts[:, None]
+    distances = np.linalg.norm(positions - means[cluster], axis=1)
+    order = np.lexsort((distances, cluster))
+    representatives = order[np.r_[0, np.flatnonzero(np.diff(cluster[order])) + 1]]
+
+    triangles = cluster[triangles]
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+    triangles = triangles[keep]
+    if len(triangles) == 0:
+        return vertices[:0], np.zeros(0, dtype=np.uint32)
+    # remove duplicates by rotating each triangle to start with its smallest index, which keeps the winding
+    shift = np.argmin(triangles, axis=1)
+    rows = np.arange(len(triangles))[:, None]
+    triangles = triangles[rows, (shift[:, None] + np.arange(3)) % 3]
+    triangles = np.unique(triangles, axis=0)
+    used, triangles = np.unique(triangles, return_inverse=True)
+    return vertices[representatives[used]], triangles.reshape(-1).astype(np.uint32)
@@ -26,10 +26,14 @@ from OpenGL.arrays import vbo
 from transformations import quaternion_matrix, quaternion_about_axis, quaternion_multiply, quaternion_from_euler
 from .procedural_primitives import *
 from ..materials import standard
-from ..renderer.primitive_shapes import generate_quads_for_height_map_with_normals, generate_quads_with_normals
+from ..renderer.primitive_shapes import generate_quads_with_normals, generate_height_map_grid, height_map_to_array
+from ...profiling import Profiler
+from .lod import get_bounding_sphere, get_triangle_indices, cluster_vertices, LOD_PIXELS_PER_CELL, LOD_PIXELS_PER_SEGMENT
 
 
 def combine_vertex_list_from_faces(faces, vertices, normals, uvs, shift_index = False):
+    if isinstance(faces, np.ndarray):
+        return combine_vertex_array_from_faces(faces, vertices, normals, uvs, shift_index)
     vertex_list = []
     for face in faces:
          for face_vertex in face:
@@ -45,15 +49,40 @@ def combine_vertex_list_from_faces(faces, vertices, normals, uvs, shift_index =
                 if shift_index:
                     t_idx -= 1
 
-            point = vertices[v_idx]
+            point = list(vertices[v_idx])
             if normals is not None:
-                point += normals[n_idx]
+                point += list(normals[n_idx])
             if uvs is not None:
-                point += uvs[t_idx]
+                point += list(uvs[t_idx])
             vertex_list.append(point)
     return vertex_list
 
 
+def combine_vertex_array_from_faces(faces, vertices, normals, uvs, shift_index=False):
+    """ gathers the vertex attributes of face vertices given as an array with the columns vertex, normal and uv index.
+        Negative normal and uv indices mark missing entries, which are filled with zeros.
+    """
+    indices = faces.reshape((-1, faces.shape[-1]))
+    missing = indices < 0
+    if shift_index:
+        indices = indices - 1
+    columns = [np.asarray(vertices)[indices[:, 0], :3]]
+    if normals is not None:
+        columns.append(_gather_rows(normals, indices[:, 1], missing[:, 1]))
+    if uvs is not None:
+        columns.append(_gather_rows(uvs, indices[:, 2], missing[:, 2]))
+    return np.hstack(columns)
+
+
+def _gather_rows(values, indices, missing):
+    values = np.asarray(values)
+    if not np.any(missing):
+        return values[indices]
+    rows = values[np.where(missing, 0, indices)]
+    rows[missing] = 0
+    return rows
+
+
 def combine_vertex_list_from_indices(index_list, vertices, normals, colors, uvs, weights, shift_index=False):
     vertex_list = []
     for idx in index_list:
@@ -73,6 +102,39 @@ def combine_vertex_list_from_indices(index_list, vertices, normals, colors, uvs,
     return vertex_list
 
 
+def combine_vertex_array_from_indices(vertices, normals, colors, uvs, weights):
+    """ interleaves the attributes into an array with one row per vertex"""
+    columns = [np.asarray(vertices, dtype=np.float64)[:, :3]]
+    if normals is not None:
+        columns.append(np.asarray(normals, dtype=np.float64))
+    if colors is not None:
+        columns.append(np.asarray(colors, dtype=np.float64))
+    if uvs is not None:
+        columns.append(np.asarray(uvs, dtype=np.float64)[:, :2])
+    if weights is not None and len(weights) > 0:
+        columns.append(np.array([w[0] for w in weights], dtype=np.float64))
+        columns.append(np.array([w[1] for w in weights], dtype=np.float64))
+    return np.hstack(columns)
+
+
+def deduplicate_vertices(vertex_array):
+    """ merges identical rows of an interleaved vertex array into a table of unique vertices.
+        Returns the unique vertices in the order of their first use and the index of each
+        input row into the table, so the index list reproduces the original vertex stream.
+    """
+    vertex_array = np.ascontiguousarray(vertex_array, dtype=np.float32)
+    if len(vertex_array) == 0:
+        return vertex_array, np.zeros(0, dtype=np.uint32)
+    # compare the rows by their bytes as they are uploaded to the vertex buffer
+    row_type = np.dtype((np.void, vertex_array.dtype.itemsize * vertex_array.shape[1]))
+    rows = vertex_array.view(row_type).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    remap = np.empty(len(order), dtype=np.uint32)
+    remap[order] = np.arange(len(order), dtype=np.uint32)
+    return vertex_array[first[order]], remap[inverse.ravel()]
+
+
 def quaternion_from_vector_to_vector(a, b):
     """src: http://stackoverflow.com/questions/1171849/finding-quaternion-representing-the-rotation-from-one-vector-to-another"""
     if np.all(a == b):
@@ -103,16 +165,25 @@ class Mesh(object):
         self.bone_id_pos = bone_id_pos
         self.material = material
         self.transform = np.eye(4)
+        self.lods = []  # (max_screen_size, mesh) in the order of decreasing detail
+        self.bounding_sphere = None
 
     def bind(self):
         self.vertex_buffer.bind()
         if self.index_buffer is not None:
             self.index_buffer.bind()
+        if Profiler.active:
+            Profiler.count("buffer_binds", 1 if self.index_buffer is None else 2)
     def unbind(self):
         self.vertex_buffer.unbind()
         if self.index_buffer is not None:
             self.index_buffer.unbind()
 
+    def upload(self):
+        """ creates the buffers on the GPU ahead of the first draw call """
+        self.bind()
+        self.unbind()
+
     def get_vertex_pointer(self):
         return self.vertex_buffer
 
@@ -144,6 +215,9 @@ class Mesh(object):
         self.vertex_list = np.array(self.vertex_list)
         self.vertex_list[:, :3] *= scale_factor
         self.vertex_buffer = vbo.VBO(np.array(self.vertex_list, dtype='f'))
+        self.bounding_sphere = None
+        for max_screen_size, lod in self.lods:
+            lod.scale(scale_factor)
 
     def has_uv(self):
         return self.uv_pos > 0
@@ -157,8 +231,54 @@ class Mesh(object):
     def has_weights(self):
         return self.weight_pos > 0
 
+    def get_bounding_sphere(self):
+        if self.bounding_sphere is None:
+            positions = np.asarray(self.vertex_list, dtype=np.float32).reshape((self.get_num_vertices(), -1))[:, :3]
+            self.bounding_sphere = get_bounding_sphere(positions)
+        return self.bounding_sphere
+
+    def add_lod(self, mesh, max_screen_size):
+        """ the mesh is drawn instead of this mesh if the projected diameter is below max_screen_size pixels """
+        mesh.bounding_sphere = self.get_bounding_sphere()
+        self.lods.append((max_screen_size, mesh))
+        self.lods.sort(key=lambda lod: -lod[0])
+
+    def select_lod(self, screen_size):
+        mesh = self
+        for max_screen_size, lod in self.lods:
+            if screen_size >= max_screen_size:
+                break
+            mesh = lod
+        return mesh
+
+    def generate_lods(self, n_levels=3, resolution=16):
+        """ adds simplified levels created by vertex clustering on grids with halved resolutions.
+            resolution: number of grid cells along the diameter of the bounding sphere for the first level
+        """
+        if self.array_type not in [GL_TRIANGLES, GL_QUADS]:
+            return
+        vertices = np.asarray(self.vertex_list, dtype=np.float32).reshape((self.get_num_vertices(), -1))
+        triangles = get_triangle_indices(self.index_list, len(vertices), self.array_type == GL_QUADS)
+        radius = self.get_bounding_sphere()[1]
+        n_triangles = len(triangles)
+        for level in range(n_levels):
+            n_cells = resolution // 2**level
+            if n_cells < 2 or radius == 0:
+                break
+            lod_vertices, lod_indices = cluster_vertices(vertices, triangles, 2 * radius / n_cells)
+            if len(lod_indices) == 0 or len(lod_indices) // 3 >= n_triangles:
+                continue
+            n_triangles = len(lod_indices) // 3
+            lod = Mesh(lod_vertices, GL_TRIANGLES, normal_pos=self.normal_pos, color_pos=self.color_pos,
+                       uv_pos=self.uv_pos, weight_pos=self.weight_pos, bone_id_pos=self.bone_id_pos,
+                       stride=self.stride, index_list=lod_indices, material=self.material)
+            self.add_lod(lod, n_cells * LOD_PIXELS_PER_CELL)
+
     @classmethod
-    def build_from_desc(cls, desc, material=None):
+    def build_from_desc(cls, desc, material=None, deduplicate=True):
+        """ creates a mesh from a description with faces or indices into per vertex attributes.
+            If deduplicate is True, identical vertices are stored once and the mesh is drawn with an index buffer.
+        """
         if material is None:
             material = standard
         if desc["type"] == "triangles":
@@ -182,7 +302,7 @@ class Mesh(object):
         uv_pos = -1
         weight_pos = -1
         bone_id_pos = -1
-        if "normals" in desc:
+        if "normals" in desc and len(desc["normals"]) > 0:
             normals = desc["normals"]
             normal_pos = offset
             offset += 12
@@ -190,7 +310,7 @@ class Mesh(object):
             colors = desc["colors"]
             color_pos = offset
             offset += 12
-        if "texture_coordinates" in desc:
+        if "texture_coordinates" in desc and len(desc["texture_coordinates"]) > 0:
             uvs = desc["texture_coordinates"]
             uv_pos = offset
             offset += 8
@@ -208,14 +328,20 @@ class Mesh(object):
         if "faces" in desc:
             faces = desc["faces"]
             vertex_list = combine_vertex_list_from_faces(faces, vertices, normals, uvs, shift)
-        elif "indices" in desc:
-            index_list = desc["indices"]
-            vertex_list = combine_vertex_list_from_indices(index_list, vertices, normals, colors, uvs, weights, shift)
-            index_list = None
+            if deduplicate:
+                vertex_list, index_list = deduplicate_vertices(vertex_list)
         else:
-            index_list = list(range(len(vertices)))
-            vertex_list = combine_vertex_list_from_indices(index_list, vertices, normals, colors, uvs, weights, shift)
-            index_list = None
+            vertex_list = combine_vertex_array_from_indices(vertices, normals, colors, uvs, weights)
+            if "indices" in desc:
+                index_list = np.asarray(desc["indices"], dtype=np.uint32).ravel()
+            else:
+                index_list = np.arange(len(vertex_list), dtype=np.uint32)
+            if deduplicate:
+                vertex_list, remap = deduplicate_vertices(vertex_list)
+                index_list = remap[index_list]
+            else:
+                vertex_list = vertex_list[index_list]
+                index_list = None
         print("offset",offset, desc.keys())
         return Mesh(vertex_list, array_type, normal_pos=normal_pos, color_pos=color_pos,
                     uv_pos=uv_pos, weight_pos=weight_pos,
@@ -223,7 +349,8 @@ class Mesh(object):
                     index_list=index_list, material=material)
 
     @classmethod
-    def build_sphere(cls, slices, stacks, diameter, material=None):
+    def build_sphere(cls, slices, stacks, diameter, material=None, n_lods=0):
+        """ n_lods: number of additional levels with halved slices and stacks """
         array_type = GL_TRIANGLES
         uv_pos = -1
         normal_pos = 12
@@ -233,10 +360,15 @@ class Mesh(object):
         offset = 24
         vertex_list, index_list = construct_triangle_sphere(slices, stacks, diameter)
         index_list = np.ravel(index_list)
-        return Mesh(vertex_list, array_type, normal_pos=normal_pos, color_pos=color_pos,
+        mesh = Mesh(vertex_list, array_type, normal_pos=normal_pos, color_pos=color_pos,
                     uv_pos=uv_pos, weight_pos=weight_pos,
                     bone_id_pos=bone_id_pos, stride=offset,
                     index_list=index_list, material=material)
+        for level in range(1, n_lods + 1):
+            lod_slices = max(slices >> level, 4)
+            lod_stacks = max(stacks >> level, 4)
+            mesh.add_lod(cls.build_sphere(lod_slices, lod_stacks, diameter, material), lod_slices * LOD_PIXELS_PER_SEGMENT)
+        return mesh
 
     @classmethod
     def build_box(cls, width, height, depth, material=None):
@@ -255,7 +387,8 @@ class Mesh(object):
                     index_list=index_list, material=material)
 
     @classmethod
-    def build_capsule(cls, slices, stacks, diameter, length, direction, material=None, pos_offset=None):
+    def build_capsule(cls, slices, stacks, diameter, length, direction, material=None, pos_offset=None, n_lods=0):
+        """ n_lods: number of additional levels with halved slices and stacks """
         array_type = GL_TRIANGLES
         uv_pos = -1
         normal_pos = 12
@@ -269,10 +402,16 @@ class Mesh(object):
             for idx in range(n_vertices):
                 vertex_list[idx][:3] += pos_offset
         index_list = np.ravel(index_list)
-        return Mesh(vertex_list, array_type, normal_pos=normal_pos, color_pos=color_pos,
+        mesh = Mesh(vertex_list, array_type, normal_pos=normal_pos, color_pos=color_pos,
                     uv_pos=uv_pos, weight_pos=weight_pos,
                     bone_id_pos=bone_id_pos, stride=offset,
                     index_list=index_list, material=material)
+        for level in range(1, n_lods + 1):
+            lod_slices = max(slices >> level, 4)
+            lod_stacks = max(stacks >> level, 4)
+            lod = cls.build_capsule(lod_slices, lod_stacks, diameter, length, direction, material, pos_offset)
+            mesh.add_lod(lod, lod_slices * LOD_PIXELS_PER_SEGMENT)
+        return mesh
 
 
     @classmethod
@@ -344,24 +483,22 @@ class Mesh(object):
 
     @classmethod
     def build_terrain(cls, width, depth, steps, uv_scale, material):
-        array_type = GL_QUADS
+        array_type = GL_TRIANGLES
         normal_pos = 12
         uv_pos = 24
         weight_pos = -1
         color_pos = -1
         bone_id_pos = -1
         offset = 32
-        vertex_list = generate_quads_for_height_map_with_normals(width, depth, steps, uv_scale,
-                                                                   material.height_map_texture.image,
-                                                                   material.height_map_scale)
-        index_list = None
+        heights = height_map_to_array(material.height_map_texture.image, material.height_map_scale)
+        vertex_list, index_list = generate_height_map_grid(width, depth, steps, uv_scale, heights)
         return Mesh(vertex_list, array_type, normal_pos=normal_pos, color_pos=color_pos,
                     uv_pos=uv_pos, weight_pos=weight_pos,
                     bone_id_pos=bone_id_pos, stride=offset,
                     index_list=index_list, material=material)
 
     @classmethod
-    def build_plane(cls, width, depth, steps, uv_scale, material):
+    def build_plane(cls, width, depth, steps, uv_scale, material=None):
         array_type = GL_QUADS
         normal_pos = 12
         uv_pos = 24
@@ -20,8 +20,27 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
+from copy import copy
 from ..renderer.lines import *
 from ..renderer.primitive_shapes import *
+from .mesh import Mesh
+
+
+def _to_cache_key(params):
+    key = []
+    for p in params:
+        if isinstance(p, (list, tuple, np.ndarray)):
+            p = tuple(np.ravel(p).tolist())
+        key.append(p)
+    return tuple(key)
+
+
+def _copy_mesh(mesh):
+    """ shares the buffers but not the lod list, so scale does not change the cached mesh """
+    mesh = copy(mesh)
+    mesh.transform = np.array(mesh.transform)
+    mesh.lods = [(max_screen_size, _copy_mesh(lod)) for max_screen_size, lod in mesh.lods]
+    return mesh
 
 
 class PrimitiveManager(object):
@@ -31,6 +50,14 @@ class PrimitiveManager(object):
     unitBox = None
     unitSphere = None
     cs = None
+    geometry_builders = {"sphere": Mesh.build_sphere,
+                         "box": Mesh.build_box,
+                         "capsule": Mesh.build_capsule,
+                         "plane": Mesh.build_plane}
+    # number of additional detail levels of the shapes whose builders accept n_lods
+    n_lods = {"sphere": 2, "capsule": 2}
+    geometry_cache = dict()
+
     def init(self):
         """creates an instance of each standard shape and sets is as class attribute
         """
@@ -55,3 +82,22 @@ class PrimitiveManager(object):
 
     def getCoordinateSystem(self):
         return self.cs
+
+    def get_geometry(self, shape, *params, material=None):
+        """returns a mesh that shares the vertex and index buffer with all meshes of the same shape and parameters
+           shape: key of geometry_builders
+           params: parameters of the builder function without the material
+        """
+        key = (shape,) + _to_cache_key(params)
+        if key not in self.geometry_cache:
+            if shape in self.n_lods:
+                geometry = self.geometry_builders[shape](*params, n_lods=self.n_lods[shape])
+            else:
+                geometry = self.geometry_builders[shape](*params)
+            self.__class__.geometry_cache[key] = geometry
+        mesh = _copy_mesh(self.geometry_cache[key])
+        mesh.material = material
+        return mesh
+
+    def clear_geometry_cache(self):
+        self.__class__.geometry_cache = dict()
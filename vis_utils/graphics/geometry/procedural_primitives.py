@@ -26,65 +26,37 @@ import numpy as np
 
 
 def merge_vertices_and_normals(vertices, normals):
-    data = []
-    for i in range(len(vertices)):
-        data.append(vertices[i] + normals[i])
-    return data
+    return np.hstack([np.asarray(vertices, dtype=np.float64).reshape(-1, 3),
+                      np.asarray(normals, dtype=np.float64).reshape(-1, 3)])
 
 
 def construct_triangle_sphere(slices, stacks, diameter):
     """ src: http://jacksondunstan.com/articles/1904 
+        returns a (n_vertices, 6) array of positions and normals and a (n_triangles, 3) array of indices
     """
-    stepTheta = (2.0 * math.pi) / slices
-    stepPhi = math.pi / stacks
-    verticesPerStack = slices + 1
-
-    positions = []
-    normals = []
-    triangles = []
-
-    # Pre-compute half the sin/cos of thetas
-    halfCosThetas = []
-    halfSinThetas = []
-    curTheta = 0
-    for slice in range(verticesPerStack):
-        halfCosThetas.append(math.cos(curTheta) * 0.5)
-        halfSinThetas.append(math.sin(curTheta) * 0.5)
-        curTheta += stepTheta
-
-    # Generate positions
-    curPhi = math.pi
-    for stack in range(stacks + 1):
-        curY = math.cos(curPhi) * 0.5 * diameter
-        sinCurPhi = math.sin(curPhi)
-        for slice in range(verticesPerStack):
-            point = [halfCosThetas[slice] * sinCurPhi * diameter, curY, halfSinThetas[slice] * sinCurPhi * diameter]
-            positions.append(point)
-            normals.append([point[0], point[1], point[2]])
-        curPhi -= stepPhi
-
-    # Generate triangles
-    lastStackFirstVertexIndex = 0
-    curStackFirstVertexIndex = verticesPerStack
-
-    for stack in range(stacks):
-        for slice in range(slices):
-            # Bottom tri of the quad
-            a = lastStackFirstVertexIndex + slice + 1
-            b = curStackFirstVertexIndex + slice
-            c = lastStackFirstVertexIndex + slice
-            triangles.append([a, b, c])
-
-            # Top tri of the quad
-            a = lastStackFirstVertexIndex + slice + 1
-            b = curStackFirstVertexIndex + slice + 1
-            c = curStackFirstVertexIndex + slice
-            triangles.append([a, b, c])
-        lastStackFirstVertexIndex += verticesPerStack
-        curStackFirstVertexIndex += verticesPerStack
-
-    data = merge_vertices_and_normals(positions, normals)
-    return data, triangles
+    step_theta = (2.0 * math.pi) / slices
+    step_phi = math.pi / stacks
+    vertices_per_stack = slices + 1
+
+    # rows are stacks from the bottom to the top, columns are slices
+    thetas = np.arange(vertices_per_stack) * step_theta
+    phis = math.pi - np.arange(stacks + 1) * step_phi
+    sin_phis = np.sin(phis)[:, None]
+    positions = np.empty((stacks + 1, vertices_per_stack, 3))
+    positions[:, :, 0] = np.cos(thetas)[None, :] * 0.5 * sin_phis * diameter
+    positions[:, :, 1] = (np.cos(phis) * 0.5 * diameter)[:, None]
+    positions[:, :, 2] = np.sin(thetas)[None, :] * 0.5 * sin_phis * diameter
+    positions = positions.reshape(-1, 3)
+
+    # bottom and top triangle of each quad between two stacks
+    last = (np.arange(stacks)[:, None] * vertices_per_stack + np.arange(slices)[None, :]).reshape(-1)
+    cur = last + vertices_per_stack
+    triangles = np.empty((len(last), 2, 3), dtype=np.uint32)
+    triangles[:, 0] = np.stack([last + 1, cur, last], axis=1)
+    triangles[:, 1] = np.stack([last + 1, cur + 1, cur], axis=1)
+
+    data = merge_vertices_and_normals(positions, positions)
+    return data, triangles.reshape(-1, 3)
 
 
 def construct_quad_box(width, height, depth):
@@ -166,61 +138,46 @@ def construct_quad_box_based_on_height(width, height, depth):
 def construct_triangle_cylinder(slices, radius, length):
     """ http://monsterden.net/software/ragdoll-pyode-tutorial
     http://wiki.unity3d.com/index.php/ProceduralPrimitives
+    returns a (n_vertices, 6) array of positions and normals and a (n_triangles, 3) array of indices
     """
     half_length = length / 2.0
-    vertices = []
-    normals = []
-    triangles = []
-    v_idx = 0
+    angles = np.arange(slices + 1) / float(slices) * 2.0 * np.pi
+    ring = np.stack([radius * np.cos(angles), radius * np.sin(angles), np.zeros(slices + 1)], axis=1)
+    side_normals = np.stack([np.cos(angles), np.sin(angles), np.zeros(slices + 1)], axis=1)
+    fan = np.arange(slices)
+
     #bottom
-    vertices.append([0, 0, half_length])
-    normals.append([0, 0, -1])
-    for i in range(0, slices+1):
-        angle = i / float(slices) * 2.0 * np.pi
-        ca = np.cos(angle)
-        sa = np.sin(angle)
-        vertices.append([radius * ca, radius * sa, half_length])
-        normals.append([0, 0, 1])
-
-    for idx in range(0, slices):
-        triangles.append([0, v_idx+1, v_idx+2])
-        v_idx += 1
+    bottom = np.zeros((slices + 2, 6))
+    bottom[1:, :3] = ring
+    bottom[:, 2] = half_length
+    bottom[:, 5] = 1
+    bottom_triangles = np.stack([np.zeros(slices, dtype=int), fan + 1, fan + 2], axis=1)
 
     #sides
-    for i in range(0, slices+1):
-        angle = i / float(slices) * 2.0 * np.pi
-        ca = np.cos(angle)
-        sa = np.sin(angle)
-        vertices.append([radius * ca, radius * sa, half_length])
-        vertices.append([radius * ca, radius * sa, -half_length])
-        normals.append([ca, sa, 0])
-        normals.append([ca, sa, 0])
-
-    for idx in range(0, slices*2):
-        triangles.append([v_idx, v_idx + 1, v_idx + 2])
-        v_idx += 1
+    start = len(bottom)
+    sides = np.zeros((slices + 1, 2, 6))
+    sides[:, :, :3] = ring[:, None, :]
+    sides[:, 0, 2] = half_length
+    sides[:, 1, 2] = -half_length
+    sides[:, :, 3:] = side_normals[:, None, :]
+    sides = sides.reshape(-1, 6)
+    strip = start + np.arange(slices * 2)
+    side_triangles = np.stack([strip, strip + 1, strip + 2], axis=1)
 
     #top
-    start = len(vertices)
-    vertices.append([0, 0, -half_length])
-    normals.append([0, 0, -1])
-    for i in range(0, slices+1):
-        angle = i / float(slices) * 2.0 * np.pi
-        ca = np.cos(angle)
-        sa = np.sin(angle)
-        vertices.append([radius * ca, radius * sa, -half_length])
-        normals.append([0, 0, -1])
-
-    for idx in range(0, slices):
-        triangles.append([start, v_idx+1, v_idx + 2])
-        v_idx += 1
-
-    return merge_vertices_and_normals(vertices, normals), triangles
+    start += len(sides)
+    top = bottom.copy()
+    top[:, 2] = -half_length
+    top[:, 5] = -1
+    top_triangles = bottom_triangles + start
+
+    data = np.vstack([bottom, sides, top])
+    triangles = np.vstack([bottom_triangles, side_triangles, top_triangles]).astype(np.uint32)
+    return data, triangles
 
 
 def construct_triangle_capsule(slices, stacks, diameter, length, direction="z"):
     data, triangles = construct_triangle_sphere(slices, stacks, diameter)
-    data = np.array(data)
     half_idx = int(len(data)/2.0)
     half_len = length/2
     data[:half_idx, 1] -= half_len
@@ -239,10 +196,9 @@ def construct_triangle_capsule(slices, stacks, diameter, length, direction="z"):
 
 
 def transform_vertex_data(data, m):
-    transformed_data = []
-    for v in data:
-        t_v = np.zeros(6)
-        t_v[:3] = np.dot(m, v[:3])[:3]
-        t_v[3:] = np.dot(m, v[3:])[:3]
-        transformed_data.append(t_v)
+    """ applies the 3x3 matrix m to the positions and normals of a (n_vertices, 6) array"""
+    data = np.asarray(data, dtype=np.float64)
+    transformed_data = np.empty((len(data), 6))
+    transformed_data[:, :3] = np.dot(data[:, :3], np.transpose(m))
+    transformed_data[:, 3:] = np.dot(data[:, 3:6], np.transpose(m))
     return transformed_data
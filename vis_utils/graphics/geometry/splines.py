@@ -67,6 +67,11 @@ class BSplineWrapper(object):
             point.append(si.splev(u, self.spline_def[d]))
         return np.array(point)
 
+    def queryPoints(self, u):
+        """ evaluates the spline for an array of parameters at once
+        """
+        return np.array([si.splev(u, self.spline_def[d]) for d in range(self.dimensions)]).T
+
     def get_last_control_point(self):
         return self.points[-1]
 
@@ -302,31 +307,16 @@ class CatmullRomSpline():
         creates a table that maps from parameter space of query point to relative arc length based on the given granularity in the constructor of the catmull rom spline
         http://pages.cpsc.ucalgary.ca/~jungle/587/pdf/5-interpolation.pdf
         '''
-        self.fullArcLength = 0
-        granularity = self.granularity
-        u = np.arange(granularity+1) / float(granularity)
-        lastPoint = None
-        numberOfEvalulations = 0
-        self.arcLengthMap = []
-        for i in u:
-            point = self.queryPoint(i)
-            if lastPoint is not None:
-                delta = []
-                d = 0
-                while d < self.dimensions:
-                    delta.append(math.sqrt((point[d]-lastPoint[d])**2))
-                    d += 1
-                self.fullArcLength += np.sum(delta)#(point-lastPoint).length()
-                #print self.fullArcLength
-            self.arcLengthMap.append([i,self.fullArcLength])
-            numberOfEvalulations+=1
-            lastPoint= point
-
-        # self.fullArcLength = arcLength
+        u = np.arange(self.granularity+1) / float(self.granularity)
+        points = self.queryPoints(u)
+        # sum of the per dimension distances between consecutive samples
+        deltas = np.sum(np.abs(np.diff(points, axis=0)), axis=1)
+        arc_lengths = np.concatenate([[0.0], np.cumsum(deltas)])
+        self.fullArcLength = float(arc_lengths[-1])
         #normalize values
-        if self.fullArcLength > 0 :
-            for i in range(numberOfEvalulations):
-                self.arcLengthMap[i][1] /= self.fullArcLength
+        if self.fullArcLength > 0:
+            arc_lengths /= self.fullArcLength
+        self.arcLengthMap = np.column_stack([u, arc_lengths]).tolist()
 
 
     def getFullArcLength(self, granularity = 100):
@@ -464,6 +454,19 @@ class CatmullRomSpline():
             d += 1
         return np.array(point)
 
+    def queryPoints(self, t):
+        """ vectorized version of queryPoint that evaluates an array of parameters at once
+        """
+        t = np.asarray(t, dtype=float)
+        n = self.numberOfSegments
+        segments = np.minimum(np.floor(n * t), n).astype(int) + 1
+        localT = n * t - np.floor(n * t)
+        weights = np.column_stack([localT**3, localT**2, localT, np.ones(len(t))])
+        controlPoints = np.array([p[:self.dimensions] for p in self.controlPoints], dtype=float)
+        controlPointVectors = np.stack([controlPoints[segments-1], controlPoints[segments],
+                                        controlPoints[segments+1], controlPoints[segments+2]], axis=1)
+        return 0.5 * np.einsum("ka,ab,kbd->kd", weights, self.catmullRomBaseMatrix, controlPointVectors)
+
     def queryValue(self, weightVector, controllPointVector):
         v = np.dot(self.catmullRomBaseMatrix, controllPointVector)
         v = np.dot(weightVector, v)
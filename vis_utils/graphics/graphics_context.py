@@ -30,16 +30,18 @@ from ..graphics.geometry.primitive_manager import PrimitiveManager
 from ..graphics.shaders import ShaderManager
 from ..scene.legacy import CoordinateSystemObject
 from ..graphics.sceen_frame_buffer import ScreenFramebuffer
-from ..graphics.multi_resolution_sceen_frame_buffer import MultiResolutionScreenFramebuffer
+from ..graphics.multi_resolution_sceen_frame_buffer import MultiResolutionScreenFramebuffer, DEFAULT_TARGET_FPS
 from ..graphics.renderer.color_picking_renderer import ColorPickingRenderer
 from ..graphics.renderer.main_renderer import MainRenderer
 from ..graphics.renderer.shadow_map_renderer import ShadowMapRenderer
 from ..graphics.renderer.selection_renderer import SelectionRenderer
 from ..graphics.selection_frame_buffer import SelectionFrameBuffer
+from ..graphics.pixel_readback import PixelReadback
 from ..graphics.plot_manager import PlotManager
 from ..graphics.camera3d import OrbitingCamera
-from ..graphics.console import IMGUIConsole
+from ..graphics.console import IMGUIConsole, IMGUIProfilerOverlay, PROFILER_OVERLAY_WIDTH
 from ..graphics.renderer.label_renderer import LabelRenderer
+from ..profiling import Profiler
 
 DEFAULT_SKY_COLOR = [0,0,0]
 DEFAULT_SKY_COLOR = [0.5,0.5,0.5]
@@ -76,12 +78,20 @@ class GraphicsContext(object):
         self.frame_buffer = None
         if self.use_frame_buffer:
             self.frame_buffer = MultiResolutionScreenFramebuffer(w,h, 4)
+            if kwargs.get("dynamic_resolution", False):
+                self.frame_buffer.enable_dynamic_resolution(kwargs.get("target_fps", DEFAULT_TARGET_FPS))
             #self.frame_buffer = ScreenFramebuffer(800, 600)
             self.color_buffer = ScreenFramebuffer(w,h)
             self.selection_buffer = SelectionFrameBuffer(w, h)
 
             self.color_picking_renderer = ColorPickingRenderer()
             self.selection_renderer = SelectionRenderer()
+            self.id_readback = PixelReadback(GL_RGBA, 4)
+            self.depth_readback = PixelReadback(GL_DEPTH_COMPONENT, 1)
+        self._id_request = None
+        self._position_request = None
+        self.queued_id = None
+        self.queued_position = None
         if self.use_shadows:
             self.shadow_renderer = ShadowMapRenderer()
         
@@ -99,6 +109,10 @@ class GraphicsContext(object):
         else:
             self.plot_manager = None
         self.console = IMGUIConsole([0, 0], alpha=20)
+        self.profiler_overlay = IMGUIProfilerOverlay([w - PROFILER_OVERLAY_WIDTH, 0])
+        self.show_profiler = kwargs.get("show_profiler", False)
+        if self.show_profiler:
+            Profiler.enable()
         self.label_renderer = LabelRenderer()
         self.show_console = False
 
@@ -115,6 +129,7 @@ class GraphicsContext(object):
         self.width = w
         self.height = h
         self.io.display_size = (w, h)
+        self.profiler_overlay.top_left = [w - PROFILER_OVERLAY_WIDTH, 0]
         glViewport(0, 0, w, h)
         self.aspect = float(w)/float(h)
         self.camera.set_projection_matrix(45.0, self.aspect, 0.1, 10000.0)
@@ -149,22 +164,28 @@ class GraphicsContext(object):
             glViewport(0, 0, self.width, self.height)
             scene.lightSources[0].shadow_buffer.draw_buffer_to_screen()
         else:
-            
+            if self.use_frame_buffer:
+                self.resolve_readbacks()
+                self.frame_buffer.begin_frame()
             if self.use_shadows:
-                self.shadow_renderer.render_scene(object_list, self.camera, light_sources)
+                with Profiler.scope("shadow_map_renderer"):
+                    self.shadow_renderer.render_scene(object_list, self.camera, light_sources)
                 glViewport(0, 0, self.width, self.height)
             
             if self.use_frame_buffer:
-                self.selection_buffer.prepare_buffer()
-                self.selection_renderer.render_scene(scene, self.camera)
+                with Profiler.scope("selection_renderer"):
+                    self.selection_buffer.prepare_buffer()
+                    self.selection_renderer.render_scene(scene, self.camera)
                 self.frame_buffer.prepare_buffer()#
             glClearColor(self.sky_color[0]*255, self.sky_color[1]*255, self.sky_color[1]*255, 255)
             glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
            
-            self.main_renderer.render_scene(object_list, p_m, v_m, light_sources)
+            with Profiler.scope("main_renderer"):
+                self.main_renderer.render_scene(object_list, p_m, v_m, light_sources)
             #draw local coordinate system of orbiting camera
             self.cs.draw(self.camera.get_pivot_matrix(), p_m, light_sources)
-            self.render_legacy(scene, v_m, p_m, draw_debug)
+            with Profiler.scope("legacy"):
+                self.render_legacy(scene, v_m, p_m, draw_debug)
 
             if self.use_frame_buffer:
                 self.frame_buffer.bind()
@@ -173,12 +194,21 @@ class GraphicsContext(object):
                 #if self.draw_plot:
                 #    self.plot_manager.draw(self.camera.get_orthographic_matrix())
                 if self.draw_labels:
-                    self.label_renderer.render_scene(object_list, v_m, p_m, o_m, self)
-
-                self.color_buffer.prepare_buffer()
-                self.color_picking_renderer.render_scene(object_list,  p_m, v_m, scene.scene_edit_widget)
+                    with Profiler.scope("label_renderer"):
+                        self.label_renderer.render_scene(object_list, v_m, p_m, o_m, self)
+
+                with Profiler.scope("color_picking_renderer"):
+                    # the main pass may have rendered into a scaled region of the frame buffer
+                    glViewport(0, 0, self.width, self.height)
+                    self.color_buffer.prepare_buffer()
+                    self.color_picking_renderer.render_scene(object_list,  p_m, v_m, scene.scene_edit_widget)
+                    self._request_id_readback()
                 self.frame_buffer.draw_buffer_to_screen()
-            self.draw_imgui()
+                self._request_depth_readback(v_m, p_m)
+            with Profiler.scope("imgui"):
+                self.draw_imgui()
+            if self.use_frame_buffer:
+                self.frame_buffer.end_frame()
 
     def render_edit_widget(self, edit_widget, v_m, p_m, light_sources):
         if edit_widget is not None and edit_widget.visible:
@@ -208,6 +238,64 @@ class GraphicsContext(object):
         object_id = getIfromRGB(color)
         return object_id
 
+    def queue_id_from_color_buffer(self, x, y):
+        """ reads the id at the window position after the next color picking pass without waiting for the GPU.
+            The result is available from get_queued_id about one frame later.
+        """
+        self._id_request = (x, y)
+
+    def queue_position_from_click(self, x, y):
+        """ reads the depth at the window position after the next frame without waiting for the GPU.
+            The result is available from get_queued_position about one frame later.
+            Without a frame buffer the position is read synchronously.
+        """
+        if not self.use_frame_buffer:
+            self.queued_position = (x, y, self.get_position_from_click(x, y))
+            return
+        self._position_request = (x, y)
+
+    def get_queued_id(self):
+        """ returns (x, y, node id) of the newest finished request or None """
+        self.resolve_readbacks()
+        return self.queued_id
+
+    def get_queued_position(self):
+        """ returns (x, y, position) of the newest finished request or None """
+        self.resolve_readbacks()
+        return self.queued_position
+
+    def _request_id_readback(self):
+        if self._id_request is None:
+            return
+        x, y = self._id_request
+        self.id_readback.request(self.color_buffer.fbo, x, self.height - y, (x, y))
+        self._id_request = None
+
+    def _request_depth_readback(self, v_m, p_m):
+        if self._position_request is None:
+            return
+        x, y = self._position_request
+        wx, wy = x, self.height - y
+        rx, ry = self.frame_buffer.get_render_coordinates(wx, wy)
+        view = np.array(v_m, dtype=np.double)
+        proj = np.array(p_m, dtype=np.double)
+        viewport = np.array([0, 0, self.width, self.height], dtype=np.int32)
+        self.depth_readback.request(self.frame_buffer.intermediate_fbo, rx, ry, (x, y, wx, wy, view, proj, viewport))
+        self._position_request = None
+
+    def resolve_readbacks(self):
+        """ stores the results of the queued reads the GPU has finished """
+        if not self.use_frame_buffer:
+            return
+        result = self.id_readback.poll()
+        if result is not None:
+            (x, y), color = result
+            self.queued_id = (x, y, getIfromRGB(color))
+        result = self.depth_readback.poll()
+        if result is not None:
+            (x, y, wx, wy, view, proj, viewport), depth = result
+            self.queued_position = (x, y, gluUnProject(wx, wy, depth[0], view, proj, viewport))
+
     def get_position_from_click(self, x, y):
         """https://stackoverflow.com/questions/8739311/opengl-select-sphere-with-mouse?utm_medium=organic&utm_source=google_rich_qa&utm_campaign=google_rich_qa
            https://learnopengl.com/Advanced-OpenGL/Framebuffers
@@ -215,11 +303,13 @@ class GraphicsContext(object):
         viewport = glGetIntegerv(GL_VIEWPORT)
         wx = x
         wy = self.height - y
+        rx, ry = wx, wy
         if self.use_frame_buffer:
             self.frame_buffer.bind_intermediate()
+            rx, ry = self.frame_buffer.get_render_coordinates(wx, wy)
         #self.frame_buffer.bind()
 
-        wz = glReadPixels(wx, wy, 1, 1, GL_DEPTH_COMPONENT, GL_FLOAT)[0]
+        wz = glReadPixels(rx, ry, 1, 1, GL_DEPTH_COMPONENT, GL_FLOAT)[0]
         if self.use_frame_buffer:
             self.frame_buffer.unbind()
         view = np.array(self.camera.get_view_matrix(), dtype=np.double)
@@ -286,12 +376,19 @@ class GraphicsContext(object):
             self.plot_manager.render_imgui()
         if self.show_console:
             self.console.render_lines()
+        if self.show_profiler:
+            self.profiler_overlay.render()
 
         imgui.render()
         data = imgui.get_draw_data()
         self.imgui_renderer.render(data)
         imgui.end_frame()
 
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        if self.show_profiler != Profiler.active:
+            Profiler.toggle()
+
     def save_screenshot(self, filename):
         if  self.frame_buffer is None:
             return
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+""" https://www.khronos.org/opengl/wiki/Vertex_Specification#Instanced_arrays
+"""
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from ..profiling import Profiler
+
+INSTANCE_ATTRIBUTE_NAMES = ["instanceOffset", "instanceColor"]
+INSTANCE_STRIDE = 32
+
+
+class InstanceBuffer(object):
+    """ Stores per-instance vertex attributes that are advanced once per instance using glVertexAttribDivisor.
+        Each instance occupies two vec4 attributes: a translation with a uniform scale in w that is applied
+        to the shared mesh and an RGBA color.
+    """
+    def __init__(self):
+        self.buffer_id = glGenBuffers(1)
+        self.capacity = 0
+        self.n_instances = 0
+
+    def upload(self, offsets, colors):
+        """ offsets: array with shape (n_instances, 4) containing the translation and scale
+            colors: array with shape (n_instances, 4)
+        """
+        data = np.ascontiguousarray(np.hstack([offsets, colors]), dtype=np.float32)
+        n_instances = len(data)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer_id)
+        if n_instances > self.capacity:
+            glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+            self.capacity = n_instances
+        elif n_instances > 0:
+            glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.n_instances = n_instances
+
+    def append(self, offsets, colors):
+        """ writes the instances behind the existing ones. The buffer grows by doubling its capacity and the
+            existing instances are copied on the GPU, so only the new instances are transferred.
+        """
+        data = np.ascontiguousarray(np.hstack([offsets, colors]), dtype=np.float32)
+        n_instances = self.n_instances + len(data)
+        if n_instances > self.capacity:
+            self.reserve(max(n_instances, 2 * self.capacity))
+        if len(data) > 0:
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer_id)
+            glBufferSubData(GL_ARRAY_BUFFER, self.n_instances * INSTANCE_STRIDE, data.nbytes, data)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.n_instances = n_instances
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        buffer_id = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, buffer_id)
+        glBufferData(GL_ARRAY_BUFFER, capacity * INSTANCE_STRIDE, None, GL_DYNAMIC_DRAW)
+        if self.n_instances > 0:
+            glBindBuffer(GL_COPY_READ_BUFFER, self.buffer_id)
+            glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_ARRAY_BUFFER, 0, 0, self.n_instances * INSTANCE_STRIDE)
+            glBindBuffer(GL_COPY_READ_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDeleteBuffers(1, [self.buffer_id])
+        self.buffer_id = buffer_id
+        self.capacity = capacity
+
+    def bind_attributes(self, locations, first_instance=0):
+        """ locations: attribute locations in the order of INSTANCE_ATTRIBUTE_NAMES. -1 skips an attribute """
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer_id)
+        if Profiler.active:
+            Profiler.count("buffer_binds")
+        for idx, location in enumerate(locations):
+            if location in (None, -1):
+                continue
+            offset = first_instance * INSTANCE_STRIDE + idx * 16
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, 4, GL_FLOAT, False, INSTANCE_STRIDE, ctypes.c_void_p(offset))
+            glVertexAttribDivisor(location, 1)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def unbind_attributes(self, locations):
+        for location in locations:
+            if location in (None, -1):
+                continue
+            glVertexAttribDivisor(location, 0)
+            glDisableVertexAttribArray(location)
+
+    def cleanup(self):
+        glDeleteBuffers(1, [self.buffer_id])
+        self.capacity = 0
+        self.n_instances = 0
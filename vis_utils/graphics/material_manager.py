@@ -21,12 +21,166 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+import os
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+from .materials import TextureMaterial
+from .texture import Texture
+
+DEFAULT_GPU_BUDGET = 512 * 1024 * 1024
+
+
+def image_to_pixels(image):
+    """ returns the RGBA pixels of a PIL image starting with the bottom row as expected by glTexImage2D """
+    return np.ascontiguousarray(np.asarray(image.convert("RGBA"), dtype=np.uint8)[::-1])
+
+
+def get_pixel_hash(pixels):
+    pixel_hash = hashlib.sha1(str(pixels.shape).encode())
+    pixel_hash.update(np.ascontiguousarray(pixels).data)
+    return pixel_hash.hexdigest()
+
+
+def get_file_key(image):
+    """ identifies the file of an image opened from a path by its absolute path, size and modification time """
+    file_path = getattr(image, "filename", None)
+    if not file_path or not os.path.isfile(file_path):
+        return None
+    stat = os.stat(file_path)
+    return "%s:%d:%d" % (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
 
 class MaterialManager(object):
+    """ Stores named materials and a texture cache that is shared by all loaders.
+        Textures are identified by a hash of their pixels, so identical images are uploaded only once and their
+        mipmaps are generated once. If a cache directory is set, the decoded pixels of image files are stored there
+        to skip the decoding when the file is loaded again.
+        Textures that exceed the GPU memory budget are evicted in least recently used order and uploaded again
+        from their image when they are bound.
+    """
     _materials = dict()
+    _textures = OrderedDict()  # pixel hash -> texture in the order of use
+    _texture_materials = dict()  # pixel hash -> material
+    _file_hashes = dict()  # file key -> pixel hash
+    gpu_budget = DEFAULT_GPU_BUDGET
+    gpu_memory = 0
+    cache_dir = None
+    compress_cache = False
+
     def set(self, name, t):
         self._materials[name] = t
 
     def get(self, name):
         if name in self._materials:
             return self._materials[name]
+
+    @classmethod
+    def set_cache_dir(cls, cache_dir, compress=False):
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        cls.cache_dir = cache_dir
+        cls.compress_cache = compress
+
+    @classmethod
+    def set_gpu_budget(cls, gpu_budget):
+        cls.gpu_budget = gpu_budget
+        cls._evict_textures()
+
+    def get_texture_material(self, image):
+        """ returns a texture material that is shared by all images with the same pixels """
+        texture = self.get_texture(image)
+        if texture.cache_key not in self._texture_materials:
+            self._texture_materials[texture.cache_key] = TextureMaterial(texture)
+        return self._texture_materials[texture.cache_key]
+
+    def get_texture(self, image):
+        file_key = get_file_key(image)
+        pixel_hash = self._file_hashes.get(file_key)
+        if pixel_hash in self._textures:
+            return self._use_texture(pixel_hash)
+        pixels = self._load_cached_pixels(file_key)
+        if pixels is None:
+            pixels = image_to_pixels(image)
+            self._save_cached_pixels(file_key, pixels)
+        else:
+            image = Image.fromarray(pixels[::-1], "RGBA")
+        pixel_hash = get_pixel_hash(pixels)
+        if file_key is not None:
+            self._file_hashes[file_key] = pixel_hash
+        if pixel_hash in self._textures:
+            return self._use_texture(pixel_hash)
+        texture = Texture.from_pixels(pixels, image)
+        texture.cache = self
+        texture.cache_key = pixel_hash
+        self._textures[pixel_hash] = texture
+        MaterialManager.gpu_memory += texture.gpu_size
+        self._evict_textures(texture)
+        return texture
+
+    def _use_texture(self, pixel_hash):
+        texture = self._textures[pixel_hash]
+        self.touch_texture(texture)
+        return texture
+
+    def touch_texture(self, texture):
+        """ marks the texture as recently used and uploads it again if it was evicted """
+        if texture.cache_key not in self._textures:
+            return
+        self._textures.move_to_end(texture.cache_key)
+        if texture.texture_id == -1:
+            texture.upload_image()
+            MaterialManager.gpu_memory += texture.gpu_size
+            self._evict_textures(texture)
+
+    @classmethod
+    def _evict_textures(cls, keep=None):
+        for texture in list(cls._textures.values()):
+            if cls.gpu_memory <= cls.gpu_budget:
+                break
+            if texture is keep or texture.texture_id == -1:
+                continue
+            cls.gpu_memory -= texture.gpu_size
+            texture.delete()
+
+    @classmethod
+    def clear_textures(cls):
+        for texture in cls._textures.values():
+            texture.delete()
+            texture.cache = None
+        cls._textures.clear()
+        cls._texture_materials.clear()
+        cls._file_hashes.clear()
+        cls.gpu_memory = 0
+
+    def _get_cache_path(self, file_key):
+        if file_key is None or self.cache_dir is None:
+            return None
+        suffix = ".npz" if self.compress_cache else ".npy"
+        return self.cache_dir + os.sep + hashlib.sha1(file_key.encode()).hexdigest() + suffix
+
+    def _load_cached_pixels(self, file_key):
+        cache_path = self._get_cache_path(file_key)
+        if cache_path is None or not os.path.isfile(cache_path):
+            return None
+        try:
+            if self.compress_cache:
+                with np.load(cache_path) as data:
+                    return data["pixels"]
+            return np.load(cache_path)
+        except Exception as e:
+            print("Warning: could not read texture cache", cache_path, e)
+            return None
+
+    def _save_cached_pixels(self, file_key, pixels):
+        cache_path = self._get_cache_path(file_key)
+        if cache_path is None:
+            return
+        try:
+            if self.compress_cache:
+                np.savez_compressed(cache_path, pixels=pixels)
+            else:
+                np.save(cache_path, pixels)
+        except Exception as e:
+            print("Warning: could not write texture cache", cache_path, e)
@@ -24,13 +24,23 @@
 https://learnopengl.com/code_viewer_gh.php?code=src/4.advanced_opengl/11.anti_aliasing_offscreen/anti_aliasing_offscreen.cpp
 
 """
+import time
 from OpenGL.GL import *
 from OpenGL.arrays import vbo
 import numpy as np
 from .shaders import ShaderManager
 from .texture import Texture
+from ..profiling import RingBuffer
 from PIL import Image, ImageOps
 
+DEFAULT_TARGET_FPS = 60
+DEFAULT_MIN_SCALE = 0.5
+DEFAULT_SCALE_STEP = 0.1
+DEFAULT_MIN_SAMPLES = 1
+DEFAULT_FRAME_WINDOW = 15
+DEFAULT_HEADROOM = 0.75
+N_GPU_TIMER_QUERIES = 4
+
 quadVertices = np.array([
         [-1.0,  1.0,  0.0, 1.0],
         [-1.0, -1.0,  0.0, 0.0],
@@ -42,11 +52,121 @@ quadVertices = np.array([
 )
 
 
+class GPUTimer(object):
+    """ measures the GPU time of a frame with GL_TIME_ELAPSED queries. The results are read a few frames later
+        from a ring of queries so that the CPU does not wait for the GPU.
+    """
+    def __init__(self, n_queries=N_GPU_TIMER_QUERIES):
+        self.queries = []
+        try:
+            self.queries = [int(q) for q in np.atleast_1d(glGenQueries(n_queries))]
+        except Exception as e:
+            print("Warning: timer queries are not supported", e)
+        self._pending = []
+        self._idx = 0
+        self._active = False
+
+    def begin(self):
+        if len(self.queries) == 0 or len(self._pending) == len(self.queries):
+            return
+        query = self.queries[self._idx]
+        self._idx = (self._idx + 1) % len(self.queries)
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        self._pending.append(query)
+        self._active = True
+
+    def end(self):
+        if self._active:
+            glEndQuery(GL_TIME_ELAPSED)
+            self._active = False
+
+    def get_time(self):
+        """ returns the seconds of the oldest finished frame or None if no result is available yet """
+        result = None
+        while len(self._pending) > 0 and not (self._active and len(self._pending) == 1):
+            query = self._pending[0]
+            if not glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+                break
+            # nanoseconds, the 32 bit result is sufficient for frame times
+            result = glGetQueryObjectuiv(query, GL_QUERY_RESULT) / 1e9
+            self._pending.pop(0)
+        return result
+
+
+class DynamicResolutionController(object):
+    """ chooses a quality level from the frame times to hold a target frame rate.
+        The levels go from full resolution with max_samples to min_scale without multisampling.
+        Multisampling is reduced first, then the resolution scale in steps of scale_step.
+        Quality is only reduced when the GPU is the bottleneck, because rendering fewer pixels does not help
+        when the CPU time alone exceeds the frame budget.
+    """
+    def __init__(self, max_samples=4, target_fps=DEFAULT_TARGET_FPS, min_scale=DEFAULT_MIN_SCALE,
+                 min_samples=DEFAULT_MIN_SAMPLES, scale_step=DEFAULT_SCALE_STEP, window=DEFAULT_FRAME_WINDOW,
+                 headroom=DEFAULT_HEADROOM):
+        self.target_fps = target_fps
+        self.headroom = headroom
+        self.window = window
+        self.levels = []
+        samples = min_samples
+        while samples < max_samples:
+            self.levels.append((1.0, samples))
+            samples *= 2
+        self.levels.append((1.0, max_samples))
+        scale = 1.0 - scale_step
+        while scale >= min_scale - 1e-6:
+            self.levels.insert(0, (round(scale, 4), min_samples))
+            scale -= scale_step
+        self.level = len(self.levels) - 1
+        self.cpu_times = RingBuffer(window)
+        self.gpu_times = RingBuffer(window)
+
+    @property
+    def frame_budget(self):
+        return 1.0 / self.target_fps
+
+    def get_quality(self):
+        return self.levels[self.level]
+
+    def add_frame_time(self, cpu_time, gpu_time=None):
+        """ returns True if the quality level was changed """
+        self.cpu_times.append(cpu_time)
+        if gpu_time is not None:
+            self.gpu_times.append(gpu_time)
+        if len(self.cpu_times) < self.window:
+            return False
+        cpu_time = np.mean(self.cpu_times.get_values())
+        gpu_time = np.mean(self.gpu_times.get_values()) if len(self.gpu_times) > 0 else cpu_time
+        frame_time = max(cpu_time, gpu_time)
+        level = self.level
+        if frame_time > self.frame_budget and gpu_time > self.frame_budget * self.headroom:
+            level = max(self.level - 1, 0)
+        elif frame_time < self.frame_budget * self.headroom:
+            level = min(self.level + 1, len(self.levels) - 1)
+        if level == self.level:
+            return False
+        self.level = level
+        # wait for a full window of frames with the new level
+        self.cpu_times = RingBuffer(self.window)
+        self.gpu_times = RingBuffer(self.window)
+        return True
+
+
 class MultiResolutionScreenFramebuffer(object):
+    """ multisampled framebuffer that is resolved and drawn to the screen as a textured quad.
+        The scene can be rendered into a scaled region of the buffer, which is upscaled when it is drawn to the screen.
+        With dynamic resolution the scale and the number of samples are chosen from the measured frame times.
+    """
     def __init__(self, w, h, samples=4):
         self.width = w
         self.height = h
         self.samples = samples
+        self.max_samples = samples
+        self.scale = 1.0
+        self.render_width = w
+        self.render_height = h
+        self.resolution_controller = None
+        self.gpu_timer = None
+        self._frame_start = None
         self.screen_shader = ShaderManager().getShader("screen")
 
         self.fbo = glGenFramebuffers(1)
@@ -89,6 +209,61 @@ class MultiResolutionScreenFramebuffer(object):
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
         self.vbo = vbo.VBO(np.array(quadVertices, 'f'))
 
+    def enable_dynamic_resolution(self, target_fps=DEFAULT_TARGET_FPS, min_scale=DEFAULT_MIN_SCALE,
+                                  min_samples=DEFAULT_MIN_SAMPLES, scale_step=DEFAULT_SCALE_STEP):
+        self.resolution_controller = DynamicResolutionController(self.max_samples, target_fps, min_scale,
+                                                                 min_samples, scale_step)
+        if self.gpu_timer is None:
+            self.gpu_timer = GPUTimer()
+
+    def disable_dynamic_resolution(self):
+        self.resolution_controller = None
+        self.set_quality(1.0, self.max_samples)
+
+    def set_quality(self, scale, samples):
+        """ sets the fraction of the width and height that is rendered and the number of samples """
+        if samples != self.samples:
+            self.samples = samples
+            self._allocate_multisample_storage(self.width, self.height)
+        self.scale = scale
+        self.render_width = max(1, int(self.width * scale))
+        self.render_height = max(1, int(self.height * scale))
+        u = self.render_width / float(self.width)
+        v = self.render_height / float(self.height)
+        vertices = np.array(quadVertices, 'f')
+        vertices[:, 2:] *= [u, v]
+        self.vbo.set_array(vertices)
+
+    def _allocate_multisample_storage(self, w, h):
+        glBindTexture(GL_TEXTURE_2D_MULTISAMPLE, self.color_texture_multi_sampled)
+        glTexImage2DMultisample(GL_TEXTURE_2D_MULTISAMPLE, self.samples, GL_RGBA, w, h, GL_TRUE)
+        glBindTexture(GL_TEXTURE_2D_MULTISAMPLE, 0)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.rbo)
+        glRenderbufferStorageMultisample(GL_RENDERBUFFER, self.samples, GL_DEPTH_COMPONENT, w, h)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+    def begin_frame(self):
+        self._frame_start = time.perf_counter()
+        if self.gpu_timer is not None:
+            self.gpu_timer.begin()
+
+    def end_frame(self):
+        """ passes the frame times to the controller and applies its quality level for the next frame """
+        if self._frame_start is None:
+            return
+        cpu_time = time.perf_counter() - self._frame_start
+        self._frame_start = None
+        if self.gpu_timer is not None:
+            self.gpu_timer.end()
+        if self.resolution_controller is None:
+            return
+        if self.resolution_controller.add_frame_time(cpu_time, self.gpu_timer.get_time()):
+            self.set_quality(*self.resolution_controller.get_quality())
+
+    def get_render_coordinates(self, x, y):
+        """ maps window coordinates to the rendered region """
+        return int(x * self.scale), int(y * self.scale)
+
     def resize(self, w, h):
         self.width = w
         self.height = h
@@ -105,6 +280,7 @@ class MultiResolutionScreenFramebuffer(object):
 
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
         glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        self.set_quality(self.scale, self.samples)
 
     def __del__(self):
         try:
@@ -123,9 +299,11 @@ class MultiResolutionScreenFramebuffer(object):
 
     def unbind(self):
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glViewport(0, 0, self.width, self.height)
 
     def bind(self):
         glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.render_width, self.render_height)
 
     def bind_intermediate(self):
         glBindFramebuffer(GL_FRAMEBUFFER, self.intermediate_fbo)
@@ -134,13 +312,15 @@ class MultiResolutionScreenFramebuffer(object):
         # 2. now blit multisampled buffer(s) to normal colorbuffer of intermediate FBO. Image is stored in screenTexture
         glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
         glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.intermediate_fbo)
-        glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height, GL_COLOR_BUFFER_BIT, GL_NEAREST)
-        glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height, GL_DEPTH_BUFFER_BIT, GL_NEAREST)
+        w, h = self.render_width, self.render_height
+        glBlitFramebuffer(0, 0, w, h, 0, 0, w, h, GL_COLOR_BUFFER_BIT, GL_NEAREST)
+        glBlitFramebuffer(0, 0, w, h, 0, 0, w, h, GL_DEPTH_BUFFER_BIT, GL_NEAREST)
 
 
     def draw_buffer_to_screen(self):
         self.blip()
         glBindFramebuffer(GL_FRAMEBUFFER, 0) #back to default
+        glViewport(0, 0, self.width, self.height)
         glDisable(GL_DEPTH_TEST)
         glClearColor(0.0, 0.0, 1.0, 1.0)
         glClear(GL_COLOR_BUFFER_BIT)
@@ -173,6 +353,8 @@ class MultiResolutionScreenFramebuffer(object):
         glBindTexture(GL_TEXTURE_2D, 0)
         image = Image.new("RGBA", (self.width, self.height))
         image.frombytes(img_data)
+        if self.scale < 1.0:
+            image = image.crop((0, 0, self.render_width, self.render_height)).resize((self.width, self.height), Image.BILINEAR)
         return image
 
     def save_to_file(self, filename):
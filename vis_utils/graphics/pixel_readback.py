@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+DEFAULT_READBACK_RING_SIZE = 3
+
+
+def read_pixel(fbo, x, y, format, type):
+    """ reads one pixel of the framebuffer synchronously """
+    glBindFramebuffer(GL_READ_FRAMEBUFFER, fbo)
+    value = glReadPixels(x, y, 1, 1, format, type)
+    glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+    return np.asarray(value, dtype=np.float32).ravel()
+
+
+class PixelReadback(object):
+    """ reads single pixels into a ring of pixel pack buffers without waiting for the GPU.
+        request queues a read of the framebuffer and poll returns the result of the newest read the GPU has finished,
+        usually one frame later. When all buffers are pending the oldest request is dropped.
+        If the driver does not support fence objects, request reads synchronously.
+    """
+    def __init__(self, format, n_components, ring_size=DEFAULT_READBACK_RING_SIZE):
+        self.format = format
+        self.n_components = n_components
+        self.ring_size = ring_size
+        self.asynchronous = bool(glFenceSync) and bool(glClientWaitSync)
+        self.pbos = []
+        self.fences = [None] * ring_size
+        self.keys = [None] * ring_size
+        self._order = np.zeros(ring_size, dtype=int)
+        self._n_requests = 0
+        self._write_idx = 0
+        self._result = None
+        if self.asynchronous:
+            self.pbos = list(np.ravel(glGenBuffers(ring_size)))
+            for pbo in self.pbos:
+                glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+                glBufferData(GL_PIXEL_PACK_BUFFER, 4 * n_components, None, GL_STREAM_READ)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+    def request(self, fbo, x, y, key=None):
+        """ key is returned with the value, e.g. to store the matrices needed to interpret a depth value """
+        if not self.asynchronous:
+            self._result = (key, read_pixel(fbo, x, y, self.format, GL_FLOAT))
+            return
+        idx = self._write_idx
+        if self.fences[idx] is not None:
+            glDeleteSync(self.fences[idx])
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, fbo)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[idx])
+        glReadPixels(x, y, 1, 1, self.format, GL_FLOAT, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+        self.fences[idx] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.keys[idx] = key
+        self._order[idx] = self._n_requests
+        self._n_requests += 1
+        self._write_idx = (idx + 1) % self.ring_size
+
+    def poll(self):
+        """ returns (key, value) of the newest finished read or None. A result is returned only once. """
+        newest = -1
+        for idx in range(self.ring_size):
+            fence = self.fences[idx]
+            if fence is None:
+                continue
+            status = glClientWaitSync(fence, 0, 0)
+            if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                continue
+            if newest < 0 or self._order[idx] > self._order[newest]:
+                newest = idx
+        if newest >= 0:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[newest])
+            data = glGetBufferSubData(GL_PIXEL_PACK_BUFFER, 0, 4 * self.n_components)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+            self._result = (self.keys[newest], np.frombuffer(np.asarray(data, dtype=np.uint8).tobytes(),
+                                                             dtype=np.float32))
+            # older reads are superseded by the newest one
+            for idx in range(self.ring_size):
+                if self.fences[idx] is not None and self._order[idx] <= self._order[newest]:
+                    glDeleteSync(self.fences[idx])
+                    self.fences[idx] = None
+                    self.keys[idx] = None
+        result = self._result
+        self._result = None
+        return result
+
+    def has_pending_requests(self):
+        return any(f is not None for f in self.fences)
+
+    def cleanup(self):
+        for idx, fence in enumerate(self.fences):
+            if fence is not None:
+                glDeleteSync(fence)
+                self.fences[idx] = None
+        if len(self.pbos) > 0:
+            glDeleteBuffers(len(self.pbos), self.pbos)
+            self.pbos = []
@@ -20,41 +20,189 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
+import collections
 import numpy as np
 from OpenGL.GL import *
 from OpenGL.arrays import vbo
-from .techniques import ColorSkinningTechnique
+from .techniques import SkeletonLinesTechnique
+from ..shaders import ShaderManager
+from ..bone_palette import BonePalette
 
+SKELETON_LINE_VERTEX_SIZE = 9  # position, color, bone id, model id
 
-def create_line_data_from_skeleton(skeleton, joint_names, data, joint_name):
-    idx = joint_names.index(joint_name)
-    for c in skeleton.nodes[joint_name].children:
-        line_start = [0.0, 0.0, 0.0, idx, -1, -1, -1, 1.0, 0.0, 0.0, 0.0]
-        data.append(line_start)
-        line_end = list(c.offset) + [idx, -1, -1, -1, 1.0, 0.0, 0.0, 0.0]
-        data.append(line_end)
-        if c.node_name in joint_names:
-            create_line_data_from_skeleton(skeleton, joint_names, data, c.node_name)
 
+def get_skeleton_lines(skeleton, joint_names):
+    """ returns the vertices of the bones relative to their joint with shape (n_vertices, 3)
+        and the index of the joint in joint_names of each vertex
+    """
+    joint_indices = dict((name, idx) for idx, name in enumerate(joint_names))
+    points = []
+    bone_ids = []
+    stack = [skeleton.root]
+    while len(stack) > 0:
+        joint_name = stack.pop()
+        idx = joint_indices[joint_name]
+        for c in skeleton.nodes[joint_name].children:
+            points += [[0.0, 0.0, 0.0], list(c.offset)]
+            bone_ids += [idx, idx]
+            if c.node_name in joint_indices:
+                stack.append(c.node_name)
+    return np.array(points, 'f').reshape((-1, 3)), np.array(bone_ids, 'f')
 
-class DebugSkeletonRenderer(object):
-    def __init__(self, skeleton, joint_names, color):
-        self.technique = ColorSkinningTechnique(color)
-        self.vertex_array_type = GL_LINES
+
+def to_rgba(color):
+    if len(color) == 3:
+        color = list(color) + [1.0]
+    return np.array(color, 'f')
+
+
+class SharedDebugSkeletonRenderer(object):
+    """ packs the lines of all registered skeletons into one vertex buffer and their bone and model matrices into one
+        bone palette. The skeletons that were queued since the last flush are drawn with a single call.
+        The model matrix of the other skeletons is set to zero, so their lines are clipped.
+        The instance is shared by the whole process, so its GL objects belong to one context.
+        They are recreated on the next flush after ShaderManager.clear() was called for a new context.
+    """
+    instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    @classmethod
+    def reset(cls):
+        """ forgets the GL objects of a destroyed context. The registered skeletons are kept. """
+        if cls.instance is not None:
+            cls.instance.technique = None
+            cls.instance.bone_palette = None
+            cls.instance.vbo = None
+            cls.instance._layout_is_dirty = True
+
+    def __init__(self):
+        self.technique = None
+        self.bone_palette = None
+        self.vbo = None
+        self.skeletons = collections.OrderedDict()  # id -> dict with the lines, color and matrices
+        self.n_vertices = 0
+        self._next_id = 0
+        self._layout_is_dirty = True
+        self._matrices = np.zeros((0, 4, 4), 'f')
+        self._n_queued = 0
+
+    def add_skeleton(self, skeleton, joint_names, color):
+        """ returns the id that identifies the skeleton in the other methods """
+        points, bone_ids = get_skeleton_lines(skeleton, joint_names)
+        skeleton_id = self._next_id
+        self._next_id += 1
+        self.skeletons[skeleton_id] = {"points": points, "bone_ids": bone_ids, "color": to_rgba(color),
+                                       "matrices": np.tile(np.eye(4, dtype='f'), (len(joint_names), 1, 1)),
+                                       "model_matrix": None, "bone_offset": 0, "model_offset": 0}
+        self._layout_is_dirty = True
+        return skeleton_id
+
+    def remove_skeleton(self, skeleton_id):
+        entry = self.skeletons.pop(skeleton_id, None)
+        if entry is not None:
+            if entry["model_matrix"] is not None:
+                self._n_queued -= 1
+            self._layout_is_dirty = True
+
+    def set_color(self, skeleton_id, color):
+        self.skeletons[skeleton_id]["color"] = to_rgba(color)
+        self._layout_is_dirty = True
+
+    def set_matrices(self, skeleton_id, matrices):
+        entry = self.skeletons[skeleton_id]
+        n_bones = min(len(matrices), len(entry["matrices"]))
+        entry["matrices"][:n_bones] = np.asarray(matrices)[:n_bones]
+
+    def queue(self, skeleton_id, model_matrix):
+        """ draws the skeleton with the next flush """
+        entry = self.skeletons[skeleton_id]
+        if entry["model_matrix"] is None:
+            self._n_queued += 1
+        entry["model_matrix"] = model_matrix
+
+    def _update_layout(self):
+        """ the model matrices are stored before the bone matrices of all skeletons """
+        n_skeletons = len(self.skeletons)
+        n_bones = n_skeletons
         data = []
-        create_line_data_from_skeleton(skeleton, joint_names, data, skeleton.root)
-        data = np.array(data, 'f')
-        self.vbo = vbo.VBO(data)
+        for model_offset, entry in enumerate(self.skeletons.values()):
+            entry["model_offset"] = model_offset
+            entry["bone_offset"] = n_bones
+            vertices = np.zeros((len(entry["points"]), SKELETON_LINE_VERTEX_SIZE), 'f')
+            vertices[:, :3] = entry["points"]
+            vertices[:, 3:7] = entry["color"]
+            vertices[:, 7] = entry["bone_ids"] + n_bones
+            vertices[:, 8] = model_offset
+            data.append(vertices)
+            n_bones += len(entry["matrices"])
+        if len(data) > 0:
+            data = np.concatenate(data)
+        else:
+            data = np.zeros((0, SKELETON_LINE_VERTEX_SIZE), 'f')
+        if self.vbo is None:
+            self.vbo = vbo.VBO(data)
+        else:
+            self.vbo.set_array(data)
         self.n_vertices = len(data)
+        self._matrices = np.zeros((n_bones, 4, 4), 'f')
+        self._layout_is_dirty = False
+
+    def flush(self, viewMatrix, projectionMatrix):
+        if self._n_queued == 0:
+            return
+        if self.technique is None:
+            self.technique = SkeletonLinesTechnique()
+            self.bone_palette = BonePalette()
+        if self._layout_is_dirty:
+            self._update_layout()
+        for entry in self.skeletons.values():
+            n_bones = len(entry["matrices"])
+            self._matrices[entry["bone_offset"]:entry["bone_offset"] + n_bones] = entry["matrices"]
+            if entry["model_matrix"] is not None:
+                # the palette stores matrices that transform column vectors
+                self._matrices[entry["model_offset"]] = np.transpose(entry["model_matrix"])
+                entry["model_matrix"] = None
+            else:
+                self._matrices[entry["model_offset"]] = 0
+        self._n_queued = 0
+        self.bone_palette.upload(self._matrices)
+        self.technique.prepare(viewMatrix, projectionMatrix, self.bone_palette)
+        self.technique.use(self.vbo, self.n_vertices)
+        self.technique.stop()
+
+
+ShaderManager.add_context_reset_callback(SharedDebugSkeletonRenderer.reset)
+
+
+class SharedDebugSkeleton(object):
+    """ debug line visualization of one skeleton. draw only queues the skeleton in the
+        SharedDebugSkeletonRenderer, which is flushed at the end of Scene.draw
+    """
+    def __init__(self, skeleton, joint_names, color):
+        self.renderer = SharedDebugSkeletonRenderer.get_instance()
+        self.skeleton_id = self.renderer.add_skeleton(skeleton, joint_names, color)
 
     def set_color(self, color):
-        self.technique.set_color(color)
+        self.renderer.set_color(self.skeleton_id, color)
 
     def set_matrices(self, matrices):
-        self.technique.set_matrices(matrices)
+        self.renderer.set_matrices(self.skeleton_id, matrices)
 
     def draw(self, modelMatrix, viewMatrix, projectionMatrix, lightSources):
-        self.technique.prepare(modelMatrix, viewMatrix, projectionMatrix)
-        self.technique.use(self.vbo, self.vertex_array_type, self.n_vertices)
-        self.technique.stop()
+        self.renderer.queue(self.skeleton_id, modelMatrix)
+
+    def cleanup(self):
+        if self.skeleton_id is not None:
+            self.renderer.remove_skeleton(self.skeleton_id)
+            self.skeleton_id = None
 
+    def __del__(self):
+        try:
+            self.cleanup()
+        except:
+            pass
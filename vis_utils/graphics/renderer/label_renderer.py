@@ -1,32 +1,74 @@
 import numpy as np
 from .text_renderer import TextRenderer
-from OpenGL.GLU.projection import gluProject
-from OpenGL.GL import glGetIntegerv, GL_VIEWPORT
+from OpenGL.GL import glGetIntegerv, glReadPixels, GL_VIEWPORT, GL_DEPTH_COMPONENT, GL_FLOAT
+
+OCCLUSION_DEPTH_BIAS = 1e-4
+
+
+def project_points(points, view_matrix, projection_matrix, viewport):
+    """ projects an array of points into window coordinates with one matrix multiplication
+        returns the window coordinates and a mask of the points that are inside of the view frustum
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    clip = np.dot(np.column_stack([points, np.ones(len(points))]), np.dot(view_matrix, projection_matrix))
+    w = clip[:, 3]
+    visible = w > 0
+    ndc = np.zeros((len(points), 3))
+    ndc[visible] = clip[visible, :3] / w[visible, None]
+    visible &= np.all(np.abs(ndc) <= 1.0, axis=1)
+    window = np.empty((len(points), 3))
+    window[:, 0] = viewport[0] + (ndc[:, 0] + 1.0) * 0.5 * viewport[2]
+    window[:, 1] = viewport[1] + (ndc[:, 1] + 1.0) * 0.5 * viewport[3]
+    window[:, 2] = (ndc[:, 2] + 1.0) * 0.5
+    return window, visible
 
 
 class LabelRenderer:
-    def __init__(self, scale=0.6, z=-10,max_label_length=5):
+    def __init__(self, scale=0.6, z=-10,max_label_length=5, cull_occluded=False):
         self.text_renderer = TextRenderer()
         self.scale = scale
         self.z = z
         self.max_label_length = max_label_length
+        self.cull_occluded = cull_occluded
 
     def render_scene(self, object_list, view_matrix, projection_matrix,  orthographic_matrix, graphics_context):
         projection_matrix = np.array(projection_matrix, np.double)
         viewport = glGetIntegerv(GL_VIEWPORT)
         orthographic_matrix = np.array(orthographic_matrix, np.double)
         view_matrix = np.array(view_matrix, np.double)
-        
+
+        labels = []
+        points = []
         for o in object_list:
             if "animation_controller" in o._components:
                 c = o._components["animation_controller"]
                 if hasattr(c, "get_labeled_points"):
-                    labels, points = c.get_labeled_points()
-                    for i, l in enumerate(labels):
-                        pos = points[i]
-                        wx, wy, _ = gluProject(pos[0], pos[1], pos[2], view_matrix, projection_matrix, viewport)
-                        wy = graphics_context.height - wy
-                        self.draw(orthographic_matrix, (wx, wy), l[:self.max_label_length])
+                    _labels, _points = c.get_labeled_points()
+                    labels += [l[:self.max_label_length] for l in _labels]
+                    points += list(_points)
+        if len(labels) == 0:
+            return
+        window, visible = project_points(points, view_matrix, projection_matrix, viewport)
+        if self.cull_occluded:
+            visible &= self.get_unoccluded_mask(window, visible, viewport)
+        indices = np.where(visible)[0]
+        if len(indices) == 0:
+            return
+        # the viewport can be a scaled region of the window when dynamic resolution is active
+        scale_x = graphics_context.width / float(viewport[2])
+        scale_y = graphics_context.height / float(viewport[3])
+        positions = np.column_stack([(window[indices, 0] - viewport[0]) * scale_x,
+                                     graphics_context.height - (window[indices, 1] - viewport[1]) * scale_y])
+        self.text_renderer.draw_lines(orthographic_matrix, positions, self.z, [labels[i] for i in indices], self.scale)
+
+    def get_unoccluded_mask(self, window, visible, viewport):
+        """ compares the depth of the label anchors with the depth buffer that is read back once per frame
+        """
+        x, y, width, height = viewport
+        depth = np.array(glReadPixels(x, y, width, height, GL_DEPTH_COMPONENT, GL_FLOAT), np.float32).reshape(height, width)
+        px = np.clip((window[:, 0] - x).astype(int), 0, width - 1)
+        py = np.clip((window[:, 1] - y).astype(int), 0, height - 1)
+        return ~visible | (window[:, 2] <= depth[py, px] + OCCLUSION_DEPTH_BIAS)
 
     def draw(self, orthographic_matrix, pos_2d, line):
         self.text_renderer.draw(orthographic_matrix, pos_2d, self.z, line, self.scale)
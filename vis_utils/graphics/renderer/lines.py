@@ -26,6 +26,34 @@ from OpenGL.arrays import vbo
 from .base_types import ColoredGeometryRenderer
 
 
+class ColoredVertexBuffer(object):
+    """ persistent buffer of interleaved position and color vertices that grows by doubling its capacity.
+        Only the rows written since the last bind are uploaded using glBufferSubData.
+    """
+    def __init__(self, capacity=64):
+        self.data = np.zeros((capacity, 6), 'f')
+        self.numVertices = 0
+        self.vbo = vbo.VBO(self.data)
+
+    def resize(self, numVertices):
+        if numVertices > len(self.data):
+            data = np.zeros((max(numVertices, 2 * len(self.data)), 6), 'f')
+            data[:self.numVertices] = self.data[:self.numVertices]
+            self.data = data
+            self.vbo.set_array(self.data)
+        self.numVertices = numVertices
+
+    def set_vertices(self, start, points, color):
+        stop = start + len(points)
+        vertices = np.zeros((len(points), 6), 'f')
+        vertices[:, :3] = points
+        vertices[:, 3:] = color
+        self.vbo[start:stop] = vertices
+
+    def clear(self):
+        self.numVertices = 0
+
+
 class DebugLineRenderer(ColoredGeometryRenderer):
     def __init__(self, start=None, end=None, color=None):
         super(DebugLineRenderer, self).__init__()
@@ -24,6 +24,10 @@
 import numpy as np
 from OpenGL.GL import *
 from ..shaders import ShaderManager
+from ...profiling import Profiler
+from ..bone_palette import BonePalette, BONE_PALETTE_TEXTURE_UNIT
+from ..instance_buffer import INSTANCE_ATTRIBUTE_NAMES
+from ..geometry.lod import get_projected_size
 MAIN_MAX_LIGHTS = 8
 FOG_DISTANCE_FACTOR = 0.0003# 0.0007
 
@@ -42,21 +46,61 @@ class Renderer(object):
                 print('Warning, no attribute: %s' % (attribute))
             setattr(self, attribute + '_loc', location)
 
+    def bind_bone_palette(self, bone_palette):
+        glUniform1i(self.boneCount_loc, bone_palette.n_bones)
+        glUniform1i(self.animationFrameCount_loc, 0)
+        bone_palette.bind(BONE_PALETTE_TEXTURE_UNIT)
+        glUniform1i(self.bonePalette_loc, BONE_PALETTE_TEXTURE_UNIT)
+
+    def bind_animation_texture(self, animation_texture, frame, root_matrix):
+        """ the skinning matrices are interpolated in the shader from the baked frames """
+        glUniform1i(self.boneCount_loc, animation_texture.n_bones)
+        glUniform1i(self.animationFrameCount_loc, animation_texture.n_frames)
+        glUniform1f(self.animationFrame_loc, frame)
+        glUniformMatrix4fv(self.animationRootMatrix_loc, 1, GL_TRUE, root_matrix)
+        animation_texture.bind(BONE_PALETTE_TEXTURE_UNIT)
+        glUniform1i(self.bonePalette_loc, BONE_PALETTE_TEXTURE_UNIT)
+
+    def bind_instance_buffer(self, instance_buffer, first_instance=0):
+        """ the shared mesh is offset, scaled and colored per instance by the attributes of the buffer """
+        glUniform1i(self.useInstanceAttributes_loc, True)
+        instance_buffer.bind_attributes(self._get_instance_attribute_locations(), first_instance)
+
+    def unbind_instance_buffer(self, instance_buffer):
+        instance_buffer.unbind_attributes(self._get_instance_attribute_locations())
+        glUniform1i(self.useInstanceAttributes_loc, False)
+
+    def _get_instance_attribute_locations(self):
+        return [getattr(self, name + "_loc", -1) for name in INSTANCE_ATTRIBUTE_NAMES]
+
+    def upload_bone_matrices(self, bone_matrices):
+        """ uploads the matrices into a palette owned by the renderer. Components should prefer
+            to share their own palette between passes using bind_bone_palette.
+        """
+        if self.bone_palette is None:
+            self.bone_palette = BonePalette()
+        self.bone_palette.upload(np.asarray(bone_matrices))
+        self.bind_bone_palette(self.bone_palette)
+
 
 class MainRenderer(Renderer):
     uniform_names = ['modelMatrix', 'viewMatrix', 'projectionMatrix', "tex", 'viewerPos', 'material.ambient_color',
                      'material.diffuse_color', 'material.specular_color', #              'light.intensities', 'light.position',
-                     'material.specular_shininess', 'useTexture', 'useSkinning', 'bones', 'boneCount', "lightCount", "lights", "useShadow", "skyColor", "fogDistanceFactor"]
-    attribute_names = ['position', "normal", 'uv', 'boneIDs', 'weights']
+                     'material.specular_shininess', 'useTexture', 'useSkinning', 'bonePalette', 'boneCount',
+                     'animationFrameCount', 'animationFrame', 'animationRootMatrix', 'useInstanceAttributes', "lightCount", "lights", "useShadow", "skyColor", "fogDistanceFactor"]
+    attribute_names = ['position', "normal", 'uv', 'boneIDs', 'weights', 'instanceOffset', 'instanceColor']
     def __init__(self, **kwargs):
         self.shader = ShaderManager().getShader("main")
         self._find_uniform_locations(self.uniform_names)
         self._find_attribute_locations(self.attribute_names)
         self.texture_unit_counter = 0
         self.diffuse_sampler = glGenSamplers(1)
+        self.bone_palette = None
         self.use_shadow = kwargs.get("use_shadow", True)
         self.sky_color = kwargs.get("sky_color", [0,0,0])
         self.fog_distance_factor = kwargs.get("fog_distance_factor", FOG_DISTANCE_FACTOR)
+        self.use_lod = kwargs.get("use_lod", True)
+        self.viewport_height = 1
 
     def upload_material(self, material):
         # upload material properties
@@ -102,14 +146,14 @@ class MainRenderer(Renderer):
 
 
 
-    def upload_bone_matrices(self, bone_matrices):
-        bone_count = len(bone_matrices)
-        glUniform1i(self.boneCount_loc, bone_count)
-        glUniformMatrix4fv(self.bones_loc, bone_count, GL_TRUE, bone_matrices)
-
     def prepare(self, view_matrix, projection_matrix, lights):
         self.texture_unit_counter = 0 # diffuse texture
         glUseProgram(self.shader)
+        if Profiler.active:
+            Profiler.count("program_changes")
+        glUniform1i(self.bonePalette_loc, BONE_PALETTE_TEXTURE_UNIT)
+        glUniform1i(self.animationFrameCount_loc, 0)
+        glUniform1i(self.useInstanceAttributes_loc, False)
         glUniformMatrix4fv(self.viewMatrix_loc, 1, GL_FALSE, view_matrix)
         glUniformMatrix4fv(self.projectionMatrix_loc, 1, GL_FALSE, projection_matrix)
         self.upload_lights(lights)
@@ -122,19 +166,35 @@ class MainRenderer(Renderer):
         #glUniformMatrix4fv(self.lightProjectionMatrix_loc, 1, GL_FALSE, self.light.proj_mat)
 
 
+    def get_screen_size(self, center, radius, v_m, p_m):
+        """ returns the projected diameter of a bounding sphere in world space in pixels """
+        if not self.use_lod:
+            return np.inf
+        return get_projected_size(center, radius, v_m, p_m, self.viewport_height)
+
+    def select_lod(self, geom, model_matrix, v_m, p_m):
+        if not self.use_lod or len(geom.lods) == 0:
+            return geom
+        center, radius = geom.get_bounding_sphere()
+        center = np.dot(np.append(center, 1.0), model_matrix)[:3]
+        radius *= np.max(np.linalg.norm(model_matrix[:3, :3], axis=1))
+        return geom.select_lod(self.get_screen_size(center, radius, v_m, p_m))
+
     def render_scene(self, object_list, p_m, v_m, lights):
         self.prepare(v_m, p_m, lights)
+        self.viewport_height = glGetIntegerv(GL_VIEWPORT)[3]
 
         for o in object_list:
             if not o.visible:
                 continue
             o.prepare_rendering(self)
             for geom in o.get_meshes():
-                self.render(o.transformation, geom)
+                self.render(o.transformation, self.select_lod(geom, o.transformation, v_m, p_m), geom.material)
             if "skeleton_vis" in o._components and o._components["skeleton_vis"].visible:
                 skeleton = o._components["skeleton_vis"]
                 if skeleton.draw_mode == 2:#only draw boxes
-                    for idx, key in enumerate(skeleton._joints):
+                    center, radius = skeleton.get_bounding_sphere()
+                    for idx, key in skeleton.get_lod_joints(self.get_screen_size(center, radius, v_m, p_m)):
                         m = skeleton.matrices[idx].T
                         for geom in skeleton.shapes[key]:
                             self.render(np.dot(geom.transform, m), geom)
@@ -163,13 +223,27 @@ class MainRenderer(Renderer):
             if "collision_boundary" in o._components:
                 c = o._components["collision_boundary"]
                 self.render(c.transformation, c.mesh)
+            if "crowd" in o._components and o._components["crowd"].visible:
+                crowd = o._components["crowd"]
+                if crowd.n_instances > 0:
+                    self.bind_bone_palette(crowd.get_bone_palette())
+                    for geom in crowd.meshes:
+                        self.render(o.transformation, geom, instance_count=crowd.n_instances)
+            if "constraint_set" in o._components and o._components["constraint_set"].visible:
+                constraint_set = o._components["constraint_set"]
+                if constraint_set.n_constraints > 0:
+                    instance_buffer = constraint_set.get_instance_buffer()
+                    self.bind_instance_buffer(instance_buffer)
+                    for geom in constraint_set.meshes:
+                        self.render(o.transformation, geom, instance_count=constraint_set.n_constraints)
+                    self.unbind_instance_buffer(instance_buffer)
             
 
         glUseProgram(0)
         #for i in range(self.texture_unit_counter):
         #    glBindSampler(i,i)
 
-    def render(self, model_matrix, geometry, material=None):
+    def render(self, model_matrix, geometry, material=None, instance_count=1):
         geometry.bind()
         glUniformMatrix4fv(self.modelMatrix_loc, 1, GL_FALSE, model_matrix)
         stride = geometry.stride
@@ -190,6 +264,8 @@ class MainRenderer(Renderer):
             if material.diffuse_texture is not None:
                 glActiveTexture(GL_TEXTURE0)
                 material.diffuse_texture.bind()
+                if Profiler.active:
+                    Profiler.count("texture_binds")
                 #glBindSampler(0, self.diffuse_sampler)
 
                 glUniform1i(self.tex_loc, 0)
@@ -208,7 +284,14 @@ class MainRenderer(Renderer):
         else:
             glUniform1i(self.useSkinning_loc, False)
 
-        if geometry.index_buffer is not None:
+        if Profiler.active:
+            Profiler.count("draw_calls")
+        if instance_count > 1:
+            if geometry.index_buffer is not None:
+                glDrawElementsInstanced(geometry.array_type, geometry.get_num_indices(), GL_UNSIGNED_INT, None, instance_count)
+            else:
+                glDrawArraysInstanced(geometry.array_type, 0, geometry.get_num_vertices(), instance_count)
+        elif geometry.index_buffer is not None:
             glDrawElements(geometry.array_type, geometry.get_num_indices(), GL_UNSIGNED_INT, None)
         else:
             glDrawArrays(geometry.array_type, 0, geometry.get_num_vertices())
@@ -40,134 +40,65 @@ def generate_quad(width, depth, uv_scale):
     return vertices
 
 
+def generate_grid_quad_indices(steps):
+    """ returns the corner indices of each quad of a (steps+1)x(steps+1) grid of vertices stored x major
+        the quads are ordered x major and the corners are (x,z), (x+1,z), (x+1,z+1), (x,z+1)
+    """
+    n = steps + 1
+    x, z = np.meshgrid(np.arange(steps), np.arange(steps), indexing="ij")
+    start = (x * n + z).reshape(-1)
+    return np.stack([start, start + n, start + n + 1, start + 1], axis=1)
+
+
+def generate_grid_triangle_indices(steps):
+    """ splits the quads of generate_grid_quad_indices into two triangles each with the winding of the quad"""
+    quads = generate_grid_quad_indices(steps)
+    triangles = np.stack([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]], axis=1)
+    return triangles.reshape(-1).astype(np.uint32)
+
+
+def _generate_grid_coordinates(steps, x_step_size, z_step_size, uv_step_size):
+    """ returns the x and z offsets and the uv coordinates of each grid vertex in x major order"""
+    x, z = np.meshgrid(np.arange(steps + 1), np.arange(steps + 1), indexing="ij")
+    x = x.reshape(-1)
+    z = z.reshape(-1)
+    uvs = np.stack([x * uv_step_size, z * uv_step_size], axis=1)
+    return x * x_step_size, z * z_step_size, uvs
+
 
 def generate_quads_with_normals(width, depth, steps, uv_scale):
-    # store xyz and uv coordinates per vertex
-    vertex_start = np.array([-width / 2, 0, -depth / 2])
-    uv_start = np.array([0, 0])
-    x_steps = range(steps)
-    z_steps = range(steps)
-    x_step_size = width / steps
-    z_step_size = depth / steps
-    uv_step_size = uv_scale / steps
-    vertices = []
-    for x in x_steps:
-        for z in z_steps:
-            vertex = vertex_start + [x * x_step_size, 0, 0] + [0, 0, z * z_step_size]
-            uv = uv_start + [x * uv_step_size, 0] + [0, z * uv_step_size]
-            v1 = vertex.tolist() +[0,1,0] + uv.tolist()
-            vertices.append(v1)
-
-            x += 1
-            vertex = vertex_start + [x * x_step_size, 0, 0] + [0, 0, z * z_step_size]
-            uv = uv_start + [x * uv_step_size, 0] + [0, z * uv_step_size]
-            v2 = vertex.tolist()+[0,1,0] + uv.tolist()
-            vertices.append(v2)
-
-            z += 1
-            vertex = vertex_start + [x * x_step_size, 0, 0] + [0, 0, z * z_step_size]
-            uv = uv_start + [x * uv_step_size, 0] + [0, z * uv_step_size]
-            v3 = vertex.tolist() +[0,1,0]+ uv.tolist()
-            vertices.append(v3)
-
-            x -= 1
-            vertex = vertex_start + [x * x_step_size, 0, 0] + [0, 0, z * z_step_size]
-            uv = uv_start + [x * uv_step_size, 0] + [0, z * uv_step_size]
-            v4 = vertex.tolist() +[0,1,0] + uv.tolist()
-            vertices.append(v4)
-    vertices = np.array(vertices, 'f')
-    return vertices
+    # store xyz, normal and uv coordinates per vertex
+    x, z, uvs = _generate_grid_coordinates(steps, width / steps, depth / steps, uv_scale / steps)
+    grid = np.zeros((len(x), 8), dtype=np.float32)
+    grid[:, 0] = x - width / 2
+    grid[:, 2] = z - depth / 2
+    grid[:, 4] = 1
+    grid[:, 6:] = uvs
+    return grid[generate_grid_quad_indices(steps).reshape(-1)]
 
 
 def generate_quads(width, depth, steps, uv_scale):
     # store xyz and uv coordinates per vertex
-    vertex_start = np.array([-width / 2, 0, -depth / 2])
-    uv_start = np.array([0, 0])
-    x_steps = range(steps)
-    z_steps = range(steps)
-    x_step_size = width / steps
-    z_step_size = depth / steps
-    uv_step_size = uv_scale / steps
-    vertices = []
-    for x in x_steps:
-        for z in z_steps:
-            vertex = vertex_start + [x * x_step_size, 0, 0] + [0, 0, z * z_step_size]
-            uv = uv_start + [x * uv_step_size, 0] + [0, z * uv_step_size]
-            v1 = vertex.tolist() + uv.tolist()
-            vertices.append(v1)
-
-            x += 1
-            vertex = vertex_start + [x * x_step_size, 0, 0] + [0, 0, z * z_step_size]
-            uv = uv_start + [x * uv_step_size, 0] + [0, z * uv_step_size]
-            v2 = vertex.tolist() + uv.tolist()
-            vertices.append(v2)
-
-            z += 1
-            vertex = vertex_start + [x * x_step_size, 0, 0] + [0, 0, z * z_step_size]
-            uv = uv_start + [x * uv_step_size, 0] + [0, z * uv_step_size]
-            v3 = vertex.tolist() + uv.tolist()
-            vertices.append(v3)
-
-            x -= 1
-            vertex = vertex_start + [x * x_step_size, 0, 0] + [0, 0, z * z_step_size]
-            uv = uv_start + [x * uv_step_size, 0] + [0, z * uv_step_size]
-            v4 = vertex.tolist() + uv.tolist()
-            vertices.append(v4)
-    vertices = np.array(vertices, 'f')
-    return vertices
-
-
-def generate_height_map_quad(x, z, vertex_start, uv_start, x_step_size,z_step_size, uv_step_size, height_uv_step_size):
-    """store xyz and 4 uv coordinates per vertex"""
-    vertices = []
-    vertex = vertex_start + [x * x_step_size, 0, -z * z_step_size]
-    uv = uv_start + [x * uv_step_size, 0, x * height_uv_step_size, 0] + [0, z * uv_step_size,
-                                                                         0, z * height_uv_step_size]
-    v1 = vertex.tolist() + uv.tolist()
-    vertices.append(v1)
-
-    x += 1
-    vertex = vertex_start + [x * x_step_size, 0, -z * z_step_size]
-    uv = uv_start + [x * uv_step_size, 0, x * height_uv_step_size, 0] + [0, z * uv_step_size,
-                                                                         0, z * height_uv_step_size]
-    v2 = vertex.tolist() + uv.tolist()
-    vertices.append(v2)
-
-    z += 1
-    vertex = vertex_start + [x * x_step_size, 0, -z * z_step_size]
-    uv = uv_start + [x * uv_step_size, 0, x * height_uv_step_size, 0] + [0, z * uv_step_size,
-                                                                         0, z * height_uv_step_size]
-    v3 = vertex.tolist() + uv.tolist()
-    vertices.append(v3)
-
-    x -= 1
-    vertex = vertex_start + [x * x_step_size, 0, -z * z_step_size]
-    uv = uv_start + [x * uv_step_size, 0,
-                     x * height_uv_step_size, 0] + [0, z * uv_step_size,
-                                                    0, z * height_uv_step_size]
-    v4 = vertex.tolist() + uv.tolist()
-    vertices.append(v4)
-    return vertices
+    x, z, uvs = _generate_grid_coordinates(steps, width / steps, depth / steps, uv_scale / steps)
+    grid = np.zeros((len(x), 5), dtype=np.float32)
+    grid[:, 0] = x - width / 2
+    grid[:, 2] = z - depth / 2
+    grid[:, 3:] = uvs
+    return grid[generate_grid_quad_indices(steps).reshape(-1)]
 
 
 def generate_quads_for_height_map(width, depth, steps, uv_scale):
-    """note x is added and z is substracted to make the pixel coordinates work"""
-
-    vertex_start = np.array([-width / 2, 0, depth / 2])
-    uv_start = np.array([0, 0, 0, 0])
-    x_steps = range(steps)
-    z_steps = range(steps)
-    x_step_size = width / steps
-    z_step_size = depth / steps
-    uv_step_size = uv_scale / steps
-    height_uv_step_size = 1.0/steps
-    vertices = []
-    for x in x_steps:
-        for z in z_steps:
-            quad = generate_height_map_quad(x,z,vertex_start, uv_start, x_step_size,z_step_size, uv_step_size, height_uv_step_size)
-            vertices += quad
-    vertices = np.array(vertices, 'f')
-    return vertices
+    """note x is added and z is substracted to make the pixel coordinates work
+       store xyz and 4 uv coordinates per vertex
+    """
+    x, z, uvs = _generate_grid_coordinates(steps, width / steps, depth / steps, uv_scale / steps)
+    _, _, height_uvs = _generate_grid_coordinates(steps, 0, 0, 1.0 / steps)
+    grid = np.zeros((len(x), 7), dtype=np.float32)
+    grid[:, 0] = x - width / 2
+    grid[:, 2] = depth / 2 - z
+    grid[:, 3:5] = uvs
+    grid[:, 5:] = height_uvs
+    return grid[generate_grid_quad_indices(steps).reshape(-1)]
 
 
 def calculate_normal(v1, v2, v3):
@@ -182,99 +113,87 @@ def calculate_normal(v1, v2, v3):
     return normal
 
 
+def height_map_to_array(image, scale=1.0):
+    """ converts the first channel of a height map image into a float32 array of heights indexed by [row, column]"""
+    heights = np.asarray(image)
+    if heights.ndim == 3:
+        heights = heights[:, :, 0]
+    return heights.astype(np.float32) * np.float32(scale / 255)
+
+
+def sample_height_map(heights, relative_x, relative_z):
+    """ bilinear lookup of heights at relative coordinates in the range [0,1]
+        accepts scalars or arrays of coordinates and returns 0 outside of the range
+    """
+    is_scalar = np.ndim(relative_x) == 0 and np.ndim(relative_z) == 0
+    relative_x, relative_z = np.broadcast_arrays(np.asarray(relative_x, dtype=np.float64),
+                                                 np.asarray(relative_z, dtype=np.float64))
+    inside = (relative_x >= 0) & (relative_x <= 1.0) & (relative_z >= 0) & (relative_z <= 1.0)
+    n_rows, n_cols = heights.shape
+    px = np.clip(relative_x, 0, 1) * (n_cols - 1)
+    pz = np.clip(relative_z, 0, 1) * (n_rows - 1)
+    x0 = np.minimum(px.astype(np.intp), max(n_cols - 2, 0))
+    z0 = np.minimum(pz.astype(np.intp), max(n_rows - 2, 0))
+    x1 = np.minimum(x0 + 1, n_cols - 1)
+    z1 = np.minimum(z0 + 1, n_rows - 1)
+    tx = px - x0
+    tz = pz - z0
+    top = heights[z0, x0] * (1 - tx) + heights[z0, x1] * tx
+    bottom = heights[z1, x0] * (1 - tx) + heights[z1, x1] * tx
+    result = np.where(inside, top * (1 - tz) + bottom * tz, 0.0)
+    if is_scalar:
+        return float(result)
+    return result
+
+
 def get_height(x, z, width, depth, image, scale):
-    lx = x
-    lz = z
-    lx += width / 2
-    lz += depth / 2
-    # scale by width and depth to range of 1
-    lx /= width
-    lz /= depth
-    ix = lx * image.size[0]
-    iy = lz * image.size[1]
-    ix = min(ix, image.size[0]-1)
-    iy = min(iy, image.size[1] - 1)
-    #print(x, z, lx, lz, ix, iy)
-    p = image.getpixel((ix, iy))[0]
-    return (p / 255) * scale
+    """ image can be a PIL image or an array returned by height_map_to_array with the scale already applied"""
+    if not isinstance(image, np.ndarray):
+        image = height_map_to_array(image, scale)
+    relative_x = (np.asarray(x) + width / 2) / width
+    relative_z = (np.asarray(z) + depth / 2) / depth
+    return sample_height_map(image, np.clip(relative_x, 0, 1), np.clip(relative_z, 0, 1))
 
 
 def generate_height_data(width, depth, width_samples, depth_samples, image, scale):
-    height_data = []
-    x_step_size = width/width_samples
-    z_step_size = depth/depth_samples
-    for j in range(depth_samples):
-        for i in range(width_samples):
-            x = i* x_step_size
-            z = j * z_step_size
-            p = image.getpixel((x, z))[0]
-            h = (p / 255) * scale
-            #print(x,z, h)
-            height_data.append(h)
-    return np.array(height_data, dtype=np.float32)
-
-
-def generate_height_map_quad_normals(x, z, width, depth, offset, x_step_size, z_step_size, uv_step_size, height_map_image, height_scale):
-    """store xyz, normals and 2 uv coordinates per vertex"""
-
-    cx = offset[0] + (x * x_step_size)
-    cz = offset[2] + (z * z_step_size)
-    u = x * uv_step_size
-    v = z * uv_step_size
-
-    cy = get_height(cx, cz, width, depth, height_map_image, height_scale)
-    v1 = np.array([cx, cy, cz])
-    uv1 = [u, v]
-
-    cx += x_step_size
-    u += uv_step_size
-    cy = get_height(cx, cz, width, depth, height_map_image, height_scale)
-    v2 = np.array([cx, cy, cz])
-    uv2 = [u, v]
-
-    cz += z_step_size
-    v += uv_step_size
-    cy = get_height(cx, cz, width, depth, height_map_image, height_scale)
-    v3 = np.array([cx, cy, cz])
-    uv3 = [u, v]
-
-    cx -= x_step_size
-    u -= uv_step_size
-    cy = get_height(cx, cz, width, depth, height_map_image, height_scale)
-    v4 = np.array([cx, cy, cz])
-    uv4 = [u, v]
-
-    n1 = calculate_normal(v1, v3, v2).tolist()
-    n2 = calculate_normal(v2, v1, v3).tolist()
-    n3 = calculate_normal(v3, v2, v4).tolist()
-    n4 = calculate_normal(v4, v3, v2).tolist()
-
-    vertices = []
-    vertices.append(v1.tolist() + n1 + uv1)
-    vertices.append(v2.tolist() + n2 + uv2)
-    vertices.append(v3.tolist() + n3 + uv3)
-    vertices.append(v4.tolist() + n4 + uv4)
-    return vertices
-
+    heights = height_map_to_array(image, scale)
+    ix = (np.arange(width_samples) * (width / width_samples)).astype(np.intp)
+    iz = (np.arange(depth_samples) * (depth / depth_samples)).astype(np.intp)
+    return heights[iz[:, None], ix[None, :]].reshape(-1)
 
-def generate_quads_for_height_map_with_normals(width, depth, steps, uv_scale, height_map_image, height_scale):
-    """note x is added and z is substracted to make the pixel coordinates work"""
 
-    vertex_start = np.array([-width / 2, 0, -depth / 2])
-    #vertex_start = np.array([0,0,0])
-    x_steps = range(steps)
-    z_steps = range(steps)
+def generate_height_map_grid(width, depth, steps, uv_scale, heights):
+    """ returns a (steps+1)**2 x 8 float32 array of xyz, normal and uv coordinates per vertex stored x major
+        and the uint32 triangle indices of the grid
+        heights: array returned by height_map_to_array
+    """
     x_step_size = width / steps
     z_step_size = depth / steps
-    uv_step_size = uv_scale / steps
-    vertices = []
-    for x in x_steps:
-        for z in z_steps:
-            quad = generate_height_map_quad_normals(x, z, width, depth, vertex_start, x_step_size, z_step_size, uv_step_size, height_map_image, height_scale)
-            #print(quad)
-            vertices += quad
-    vertices = np.array(vertices, 'f')
-    return vertices
+    x, z, uvs = _generate_grid_coordinates(steps, x_step_size, z_step_size, uv_scale / steps)
+    n = steps + 1
+    y = sample_height_map(heights, x / width, z / depth).reshape(n, n)
+    dy_dx, dy_dz = np.gradient(y, x_step_size, z_step_size)
+    normals = np.stack([-dy_dx, np.ones_like(y), -dy_dz], axis=-1).reshape(-1, 3)
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+
+    vertices = np.empty((n * n, 8), dtype=np.float32)
+    vertices[:, 0] = x - width / 2
+    vertices[:, 1] = y.reshape(-1)
+    vertices[:, 2] = z - depth / 2
+    vertices[:, 3:6] = normals
+    vertices[:, 6:] = uvs
+    return vertices, generate_grid_triangle_indices(steps)
+
+
+def generate_quads_for_height_map_with_normals(width, depth, steps, uv_scale, height_map_image, height_scale):
+    """store xyz, normals and 2 uv coordinates per vertex of each quad
+       height_map_image can be a PIL image or an array returned by height_map_to_array with the scale already applied
+    """
+    heights = height_map_image
+    if not isinstance(heights, np.ndarray):
+        heights = height_map_to_array(height_map_image, height_scale)
+    vertices, _ = generate_height_map_grid(width, depth, steps, uv_scale, heights)
+    return vertices[generate_grid_quad_indices(steps).reshape(-1)]
 
 
 class Plane(ShadedGeometryRenderer):
@@ -317,6 +236,7 @@ class TerrainRenderer(object):
         self.depth = depth
         self.vertex_array_type = GL_QUADS
         vertices = generate_quads_for_height_map(width, depth, steps, uv_scale)
+        self.heights = height_map_to_array(material.height_map_texture.image, material.height_map_scale)
 
         self.vbo = vbo.VBO(vertices)
         self.numVertices = len(vertices)
@@ -335,15 +255,7 @@ class TerrainRenderer(object):
         return relative_x, relative_z
 
     def get_height(self, relative_x, relative_z):
-        if relative_x < 0 or relative_x > 1.0 or relative_z < 0 or relative_z > 1.0:
-            print("Coordinates outside of the range")
-            return 0
-        # scale by image width and height to image range
-        height_map_image = self.technique.material.height_map_texture.image
-        ix = relative_x*height_map_image.size[0]
-        iy = relative_z*height_map_image.size[1]
-        p = self.technique.material.height_map_texture.get_pixel(ix, iy)
-        return (p[0]/255)*self.technique.material.height_map_scale
+        return sample_height_map(self.heights, relative_x, relative_z)
 
     def draw(self, modelMatrix, viewMatrix, projectionMatrix, lightSources):
         self.technique.prepare(modelMatrix, viewMatrix, projectionMatrix, lightSources)
@@ -363,7 +275,8 @@ class TerrainRenderer2(object):
         self.width = width
         self.depth = depth
         self.array_type = GL_QUADS
-        self.vertices = generate_quads_for_height_map_with_normals(width, depth, steps, uv_scale, material.height_map_texture.image, material.height_map_scale)
+        self.heights = height_map_to_array(material.height_map_texture.image, material.height_map_scale)
+        self.vertices = generate_quads_for_height_map_with_normals(width, depth, steps, uv_scale, self.heights, 1.0)
 
         self.vbo = vbo.VBO(self.vertices)
         self.numVertices = len(self.vertices)
@@ -382,15 +295,7 @@ class TerrainRenderer2(object):
         return relative_x, relative_z
 
     def get_height(self, relative_x, relative_z):
-        if relative_x < 0 or relative_x > 1.0 or relative_z < 0 or relative_z > 1.0:
-            print("Coordinates outside of the range")
-            return 0
-        # scale by image width and height to image range
-        height_map_image = self.technique.material.height_map_texture.image
-        ix = relative_x*height_map_image.size[0]
-        iy = relative_z*height_map_image.size[1]
-        p = self.technique.material.height_map_texture.get_pixel(ix, iy)
-        return (p[0]/255)*self.technique.material.height_map_scale
+        return sample_height_map(self.heights, relative_x, relative_z)
 
     def draw(self, modelMatrix, viewMatrix, projectionMatrix, lightSources):
         self.technique.prepare(modelMatrix, viewMatrix, projectionMatrix, lightSources)
@@ -21,6 +21,8 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
 from ..shaders.shader_manager import ShaderManager
+from ...profiling import Profiler
+from ..bone_palette import BonePalette, BONE_PALETTE_TEXTURE_UNIT
 from OpenGL.GL import *
 import numpy as np
 
@@ -32,23 +34,56 @@ class SelectionRenderer(object):
         self.projectionMatrix_loc = glGetUniformLocation(self.shader, "projectionMatrix")
         self.modelMatrix_loc = glGetUniformLocation(self.shader, "modelMatrix")
         self.useSkinning_loc = glGetUniformLocation(self.shader, "useSkinning")
-        self.bones_loc = glGetUniformLocation(self.shader, "bones")
+        self.bonePalette_loc = glGetUniformLocation(self.shader, "bonePalette")
         self.boneCount_loc = glGetUniformLocation(self.shader, "boneCount")
+        self.animationFrameCount_loc = glGetUniformLocation(self.shader, "animationFrameCount")
+        self.animationFrame_loc = glGetUniformLocation(self.shader, "animationFrame")
+        self.animationRootMatrix_loc = glGetUniformLocation(self.shader, "animationRootMatrix")
+        self.useInstanceAttributes_loc = glGetUniformLocation(self.shader, "useInstanceAttributes")
         self.color_loc = glGetUniformLocation(self.shader, "pickColor")
         self.position_loc = glGetAttribLocation(self.shader, "position")
         self.boneIDs_loc = glGetAttribLocation(self.shader, "boneIDs")
         self.weights_loc = glGetAttribLocation(self.shader, "weights")
+        self.instanceOffset_loc = glGetAttribLocation(self.shader, "instanceOffset")
+        self.bone_palette = None
 
     def prepare(self, view_matrix, projection_matrix):
         glUseProgram(self.shader)
+        if Profiler.active:
+            Profiler.count("program_changes")
+        glUniform1i(self.bonePalette_loc, BONE_PALETTE_TEXTURE_UNIT)
+        glUniform1i(self.animationFrameCount_loc, 0)
+        glUniform1i(self.useInstanceAttributes_loc, False)
         glUniformMatrix4fv(self.viewMatrix_loc, 1, GL_FALSE, view_matrix)
         glUniformMatrix4fv(self.projectionMatrix_loc, 1, GL_FALSE, projection_matrix)
 
+    def bind_bone_palette(self, bone_palette):
+        glUniform1i(self.boneCount_loc, bone_palette.n_bones)
+        glUniform1i(self.animationFrameCount_loc, 0)
+        bone_palette.bind(BONE_PALETTE_TEXTURE_UNIT)
+        glUniform1i(self.bonePalette_loc, BONE_PALETTE_TEXTURE_UNIT)
+
+    def bind_animation_texture(self, animation_texture, frame, root_matrix):
+        glUniform1i(self.boneCount_loc, animation_texture.n_bones)
+        glUniform1i(self.animationFrameCount_loc, animation_texture.n_frames)
+        glUniform1f(self.animationFrame_loc, frame)
+        glUniformMatrix4fv(self.animationRootMatrix_loc, 1, GL_TRUE, root_matrix)
+        animation_texture.bind(BONE_PALETTE_TEXTURE_UNIT)
+        glUniform1i(self.bonePalette_loc, BONE_PALETTE_TEXTURE_UNIT)
+
+    def bind_instance_buffer(self, instance_buffer, first_instance=0):
+        glUniform1i(self.useInstanceAttributes_loc, True)
+        instance_buffer.bind_attributes([self.instanceOffset_loc], first_instance)
+
+    def unbind_instance_buffer(self, instance_buffer):
+        instance_buffer.unbind_attributes([self.instanceOffset_loc])
+        glUniform1i(self.useInstanceAttributes_loc, False)
+
     def upload_bone_matrices(self, bone_matrices):
-        bone_count = len(bone_matrices)
-        #print("upload bones", bone_count)
-        glUniform1i(self.boneCount_loc, bone_count)
-        glUniformMatrix4fv(self.bones_loc, bone_count, GL_TRUE, bone_matrices)
+        if self.bone_palette is None:
+            self.bone_palette = BonePalette()
+        self.bone_palette.upload(np.asarray(bone_matrices))
+        self.bind_bone_palette(self.bone_palette)
 
     def render_scene(self, scene, camera):
         selected_objects = scene.get_selected_objects()
@@ -64,10 +99,17 @@ class SelectionRenderer(object):
                     for geom in o._components["static_mesh"].meshes:
                         self.render(m, geom, color)
                 elif "animated_mesh" in o._components:
-                    bone_matrices = o._components["animated_mesh"].get_bone_matrices()
-                    self.upload_bone_matrices(bone_matrices)#  bone matrices once
+                    o._components["animated_mesh"].prepare_rendering(self)
                     for geom in o._components["animated_mesh"].meshes:
                         self.render(m, geom, color)
+                elif "constraint_set" in o._components and o._components["constraint_set"].selected_index >= 0:
+                    # only highlight the selected marker
+                    constraint_set = o._components["constraint_set"]
+                    instance_buffer = constraint_set.get_instance_buffer()
+                    self.bind_instance_buffer(instance_buffer, constraint_set.selected_index)
+                    for geom in constraint_set.meshes:
+                        self.render(m, geom, color)
+                    self.unbind_instance_buffer(instance_buffer)
         glUseProgram(0)
             
 
@@ -90,6 +132,8 @@ class SelectionRenderer(object):
         else:
             glUniform1i(self.useSkinning_loc, False)
 
+        if Profiler.active:
+            Profiler.count("draw_calls")
         if geometry.index_buffer is not None:
             glDrawElements(geometry.array_type, geometry.get_num_indices(), GL_UNSIGNED_INT, None)
         else:
@@ -23,27 +23,30 @@
 from OpenGL.GL import *
 import numpy as np
 from .main_renderer import Renderer
+from ..bone_palette import BONE_PALETTE_TEXTURE_UNIT
 from ..shaders import ShaderManager
+from ...profiling import Profiler
 
 
 class ShadowMapRenderer(Renderer):
-    uniform_names = ['projMatrix', 'viewMatrix',"modelMatrix", "boneCount","useSkinning","bones" ]
-    attribute_names = ['position', 'boneIDs', 'weights']
+    uniform_names = ['projMatrix', 'viewMatrix',"modelMatrix", "boneCount","useSkinning","bonePalette",
+                     "animationFrameCount", "animationFrame", "animationRootMatrix", "useInstanceAttributes"]
+    attribute_names = ['position', 'boneIDs', 'weights', 'instanceOffset']
     def __init__(self):
         self.shader = ShaderManager().getShader("shadow_mapping")
         self._find_uniform_locations(self.uniform_names)
         self._find_attribute_locations(self.attribute_names)
         self.counter = 0
-
-    def upload_bone_matrices(self, bone_matrices):
-        bone_count = len(bone_matrices)
-        #print("upload bones", bone_count)
-        glUniform1i(self.boneCount_loc, bone_count)
-        glUniformMatrix4fv(self.bones_loc, bone_count, GL_TRUE, bone_matrices)
+        self.bone_palette = None
 
     def render_scene(self, object_list, camera, light_sources):
         glCullFace(GL_FRONT)
         glUseProgram(self.shader)
+        if Profiler.active:
+            Profiler.count("program_changes")
+        glUniform1i(self.bonePalette_loc, BONE_PALETTE_TEXTURE_UNIT)
+        glUniform1i(self.animationFrameCount_loc, 0)
+        glUniform1i(self.useInstanceAttributes_loc, False)
         self.counter = 0
         for l in light_sources:
             l.update(camera)
@@ -67,10 +70,23 @@ class ShadowMapRenderer(Renderer):
                             for geom in skeleton.shapes[key]:
                                 self.render(np.dot(geom.transform, m), geom, l)
                 if "animated_mesh" in o._components and o._components["animated_mesh"].visible:
-                    bone_matrices = o._components["animated_mesh"].get_bone_matrices()
-                    self.upload_bone_matrices(bone_matrices)  # bone matrices once
+                    o._components["animated_mesh"].prepare_rendering(self)
                     for geom in o._components["animated_mesh"].meshes:
                         self.render(o.transformation, geom, l)
+                if "crowd" in o._components and o._components["crowd"].visible:
+                    crowd = o._components["crowd"]
+                    if crowd.n_instances > 0:
+                        self.bind_bone_palette(crowd.get_bone_palette())
+                        for geom in crowd.meshes:
+                            self.render(o.transformation, geom, l, crowd.n_instances)
+                if "constraint_set" in o._components and o._components["constraint_set"].visible:
+                    constraint_set = o._components["constraint_set"]
+                    if constraint_set.n_constraints > 0:
+                        instance_buffer = constraint_set.get_instance_buffer()
+                        self.bind_instance_buffer(instance_buffer)
+                        for geom in constraint_set.meshes:
+                            self.render(o.transformation, geom, l, constraint_set.n_constraints)
+                        self.unbind_instance_buffer(instance_buffer)
                 if "articulated_figure" in o._components and o._components["articulated_figure"].visible:
                     char = o._components["articulated_figure"]
                     for key, geom in char.body_shapes.items():
@@ -87,7 +103,7 @@ class ShadowMapRenderer(Renderer):
         #print("drew", self.counter, "objects")
 
 
-    def render(self, model_matrix, geometry, light):
+    def render(self, model_matrix, geometry, light, instance_count=1):
 
         #print("draw")
         self.counter += 1
@@ -110,7 +126,14 @@ class ShadowMapRenderer(Renderer):
         else:
             glUniform1i(self.useSkinning_loc, False)
 
-        if geometry.index_buffer is not None:
+        if Profiler.active:
+            Profiler.count("draw_calls")
+        if instance_count > 1:
+            if geometry.index_buffer is not None:
+                glDrawElementsInstanced(geometry.array_type, geometry.get_num_indices(), GL_UNSIGNED_INT, None, instance_count)
+            else:
+                glDrawArraysInstanced(geometry.array_type, 0, geometry.get_num_vertices(), instance_count)
+        elif geometry.index_buffer is not None:
             glDrawElements(geometry.array_type, geometry.get_num_indices(), GL_UNSIGNED_INT, None)
         else:
             glDrawArrays(geometry.array_type, 0, geometry.get_num_vertices())
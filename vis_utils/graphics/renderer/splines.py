@@ -20,22 +20,31 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
+import math
 import numpy as np
 from OpenGL.GL import *
 from OpenGL.arrays import vbo
 from .base_types import ColoredGeometryRenderer
+from .lines import ColoredVertexBuffer
 from ..geometry.splines import CatmullRomSpline, BSplineWrapper
 
+DEFAULT_SEGMENT_SAMPLES = 16
+MIN_SEGMENT_SAMPLES = 4
+CONTROL_POINT_SIZE = 5
+
 
 class BSplineRenderer(ColoredGeometryRenderer):
+    """ B-spline that is tessellated once into a vertex buffer and drawn as a single line strip
+    """
     def __init__(self, controlPoints, r, g, b, granularity=100):
         ColoredGeometryRenderer.__init__(self)
         self.r = r
         self.g = g
         self.b = b
         self.vertex_array_type = GL_POINTS
-        self.vertexList = []
-        self.vbo = vbo.VBO(np.array([self.vertexList], 'f'))
+        self.control_points = ColoredVertexBuffer(len(controlPoints))
+        self.curve = ColoredVertexBuffer(granularity+1)
+        self.vbo = self.control_points.vbo
         self.spline = BSplineWrapper(controlPoints)
         self.initiated = True
         self.granularity = granularity
@@ -45,68 +54,36 @@ class BSplineRenderer(ColoredGeometryRenderer):
         self.numberOfSegments = len(controlPoints)-1
         # as a workaround add multiple points at the end instead of one
         self.controlPoints = [controlPoints[0]]+controlPoints+[controlPoints[-1], controlPoints[-1]]
-        print("length of control point list ",len(self.controlPoints))
-        print("number of segments ",self.numberOfSegments)
-
-        for point in controlPoints:
-                self.vertexList.append([point[0], point[1], point[2], self.r,self.g,self.b])
-        self.numVertices= len(self.vertexList)
-        self.vertexArray = np.array(self.vertexList,'f')
-        self.vbo.set_array(np.array([self.vertexList],'f'))
+        color = (self.r, self.g, self.b)
+        self.numVertices = len(controlPoints)
+        self.control_points.resize(self.numVertices)
+        self.control_points.set_vertices(0, np.array(controlPoints, dtype=float)[:, :3], color)
+        u = np.arange(self.granularity+1) / float(self.granularity)
+        self.curve.resize(len(u))
+        self.curve.set_vertices(0, self.spline.queryPoints(u), color)
 
     def draw(self, modelMatrix, viewMatrix, projectionMatrix, lightSources=None):
-       if self.initiated:
-           glUseProgram(self.shader)
-           try:
-               self.vbo.bind()
-               try:
-                   #set MVP matrix
-                   glUniformMatrix4fv(self.modelMatrix_loc, 1, GL_FALSE, modelMatrix)
-                   glUniformMatrix4fv(self.viewMatrix_loc, 1, GL_FALSE, viewMatrix)
-                   glUniformMatrix4fv(self.projectionMatrix_loc, 1, GL_FALSE, projectionMatrix)
-                   #evaluate the spline
-                   glBegin(GL_LINE_STRIP)
-                    #the higher the granularity the smoother the curve
-                   glColor3f(self.r,self.g,self.b)
-                   u = np.arange(self.granularity+1) / float(self.granularity)
-                   for i in u:
-                      point = self.spline.queryPoint(i)
-                      glVertex3f(point[0],point[1],point[2])
-                   glEnd()
-
-                   #We only have the two standard per-vertex attributes
-                   glPointSize(5)
-                   glEnableClientState(GL_VERTEX_ARRAY)
-                   glEnableClientState(GL_COLOR_ARRAY)
-                   glVertexPointer(3, GL_FLOAT, 24, self.vbo)
-                   glColorPointer(3, GL_FLOAT, 24, self.vbo+12)
-                   glDrawArrays(self.vertex_array_type, 0, self.numVertices)
-                   glPointSize(1)
-               except  GLerror as e:
-                    #note: type errors at this point can also hint on missing uniform locations in the shader or simply on a shader that is inaccessible for the current thread and therefore has no uniform locations
-                    print("error in ColoredGeometry",e)
-               finally:
-                   self.vbo.unbind()
-                   glDisableClientState(GL_VERTEX_ARRAY)
-                   glDisableClientState(GL_COLOR_ARRAY)
-           finally:
-               glUseProgram(0)
-           glUseProgram(self.shader)
+        if not self.initiated:
+            return
+        draw_spline(self.technique, self.curve, self.control_points, modelMatrix, viewMatrix, projectionMatrix)
 
 
 class CatmullRomSplineRenderer(ColoredGeometryRenderer, CatmullRomSpline):
-    """  Spline that goes through control points, drawn using immediate mode instead of a shader
+    """  Spline that goes through control points, tessellated into a persistent vertex buffer
     has arc length mapping used by motion planning
+    Each segment is sampled samples_per_segment times. Edits only re-tessellate the segments that are influenced by the changed control point.
     """
-    def __init__(self, controlPoints, r, g, b, granularity=100):
+    def __init__(self, controlPoints, r, g, b, granularity=100, samples_per_segment=None):
         ColoredGeometryRenderer.__init__(self)
         self.r = r
         self.g = g
         self.b = b
         self.vertex_array_type = GL_POINTS
-        self.vertexList = []
-        self.vbo = vbo.VBO(np.array([self.vertexList], 'f'))
-
+        self.samples_per_segment = samples_per_segment
+        self.control_points = ColoredVertexBuffer()
+        self.curve = ColoredVertexBuffer()
+        self.vbo = self.control_points.vbo
+        self.numVertices = 0
         CatmullRomSpline.__init__(self, controlPoints, dimensions=3, granularity=granularity)
 
     def initiateControlPoints(self,controlPoints):
@@ -116,35 +93,68 @@ class CatmullRomSplineRenderer(ColoredGeometryRenderer, CatmullRomSpline):
         self.numberOfSegments = len(controlPoints)-1
         # as a workaround add multiple points at the end instead of one
         self.controlPoints = [controlPoints[0]]+controlPoints+[controlPoints[-1], controlPoints[-1]]
-        #print("length of control point list ", len(self.controlPoints))
-        #print("number of segments ", self.numberOfSegments)
-
-        for point in controlPoints:
-                self.vertexList.append([point[0], point[1], point[2], self.r, self.g, self.b])
-        self.numVertices= len(self.vertexList)
-        self.vertexArray = np.array(self.vertexList,'f')
-        self.vbo.set_array(np.array( [self.vertexList],'f'))
+        if self.samples_per_segment is None:
+            if self.numberOfSegments > 0:
+                self.samples_per_segment = max(MIN_SEGMENT_SAMPLES, int(math.ceil(self.granularity / self.numberOfSegments)))
+            else:
+                self.samples_per_segment = DEFAULT_SEGMENT_SAMPLES
+        self.numVertices = len(controlPoints)
+        self.control_points.resize(self.numVertices)
+        self.control_points.set_vertices(0, np.array(controlPoints, dtype=float)[:, :3], (self.r, self.g, self.b))
+        self.curve.resize(self.numberOfSegments * self.samples_per_segment + 1)
+        self._tessellate(0, self.numberOfSegments)
         self.updateArcLengthMappingTable()
 
+    def _tessellate(self, first, last):
+        """ writes the vertices of the segments in the range [first, last) and the end point of the curve into the curve buffer
+        """
+        k = self.samples_per_segment
+        color = (self.r, self.g, self.b)
+        if first < last:
+            # segment i is influenced by the control points i to i+3 including the auxiliary points
+            controlPoints = np.array([p[:3] for p in self.controlPoints[first:last+3]], dtype=float)
+            localT = np.arange(k) / float(k)
+            weights = 0.5 * np.dot(np.column_stack([localT**3, localT**2, localT, np.ones(k)]), self.catmullRomBaseMatrix)
+            indices = np.arange(last-first)
+            controlPointVectors = np.stack([controlPoints[indices], controlPoints[indices+1],
+                                            controlPoints[indices+2], controlPoints[indices+3]], axis=1)
+            points = np.einsum("ka,mad->mkd", weights, controlPointVectors).reshape(-1, 3)
+            self.curve.set_vertices(first * k, points, color)
+        self.curve.set_vertices(self.numberOfSegments * k, [self.controlPoints[-1][:3]], color)
+
     def addPoint(self, point):
-        #print("add point to spline", point)
         #add point replace auxiliary control points
         if self.initiated:
             del self.controlPoints[-2:]
             self.numberOfSegments = len(self.controlPoints)-1
             self.controlPoints += [point,point,point]
-            #print(self.controlPoints)
-            self.vertexList.append([point[0],point[1],point[2], self.r,self.g,self.b])
             self.numVertices += 1
-            self.vbo.set_array(np.array([self.vertexList], 'f'))
+            self.control_points.resize(self.numVertices)
+            self.control_points.set_vertices(self.numVertices-1, [point[:3]], (self.r, self.g, self.b))
+            # the previous last segment used the auxiliary points
+            self.curve.resize(self.numberOfSegments * self.samples_per_segment + 1)
+            self._tessellate(max(0, self.numberOfSegments-2), self.numberOfSegments)
             self.updateArcLengthMappingTable()
         else:
             self.initiateControlPoints([point,])
             self.initiated = True
 
+    def set_control_point(self, index, point):
+        """ moves a control point and re-tessellates the up to four segments that it influences
+        """
+        self.controlPoints[index+1] = point
+        if index == 0:
+            self.controlPoints[0] = point
+        if index == self.numVertices-1:
+            self.controlPoints[-2:] = [point, point]
+        self.control_points.set_vertices(index, [point[:3]], (self.r, self.g, self.b))
+        self._tessellate(max(0, index-2), min(self.numberOfSegments, index+2))
+        self.updateArcLengthMappingTable()
+
     def clear(self):
         self.controlPoints = []
-        self.vertexList = []
+        self.control_points.clear()
+        self.curve.clear()
         self.initiated = False
         self.fullArcLength = 0
         self.numVertices = 0
@@ -152,33 +162,22 @@ class CatmullRomSplineRenderer(ColoredGeometryRenderer, CatmullRomSpline):
         self.arcLengthMap = []
 
     def draw(self,modelMatrix, viewMatrix, projectionMatrix, lightSources=None):
-        if len(self.controlPoints) < 2:
+        if not self.initiated:
             return
-        self.technique.prepare(modelMatrix,viewMatrix,projectionMatrix)
-        try:
-            self.vbo.bind()
-            glBegin(GL_LINE_STRIP)
-            #the higher the granularity the smoother the curve
-            glColor3f(self.r, self.g, self.b)
-            for i in np.arange(self.granularity+1) / float(self.granularity):
-               point = self.queryPoint(i)
-               glVertex3f(point[0],point[1],point[2])
-            glEnd()
-            glPointSize(5)
-            glEnableClientState(GL_VERTEX_ARRAY)
-            glEnableClientState(GL_COLOR_ARRAY)
-            glVertexPointer(3, GL_FLOAT, 24, self.vbo)
-            glColorPointer(3, GL_FLOAT, 24, self.vbo+12)
-            glDrawArrays(self.vertex_array_type, 0, self.numVertices)
-            glPointSize(1)
-        except GLerror as e:#http://pyopengl.sourceforge.net/documentation/opengl_diffs.html
-            #note: type errors at this point can also hint on missing uniform locations in the shader or simply on a shader that is inaccessible for the current thread and therefore has no uniform locations
-            print("error in ColoredGeometry",e)#, self.modelMatrix
-        finally:
-           self.vbo.unbind()
-           glDisableClientState(GL_VERTEX_ARRAY)
-           glDisableClientState(GL_COLOR_ARRAY)
-        self.technique.stop()
+        draw_spline(self.technique, self.curve, self.control_points, modelMatrix, viewMatrix, projectionMatrix)
+
+
+def draw_spline(technique, curve, control_points, modelMatrix, viewMatrix, projectionMatrix):
+    """ draws the tessellated curve with one call and marks the control points
+    """
+    if curve.numVertices < 2:
+        return
+    technique.prepare(modelMatrix, viewMatrix, projectionMatrix)
+    technique.use(curve.vbo, GL_LINE_STRIP, curve.numVertices)
+    glPointSize(CONTROL_POINT_SIZE)
+    technique.use(control_points.vbo, GL_POINTS, control_points.numVertices)
+    glPointSize(1)
+    technique.stop()
 
 
 class BezierSplineRenderer(ColoredGeometryRenderer):
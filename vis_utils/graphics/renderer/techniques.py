@@ -24,6 +24,7 @@
 from OpenGL.GL import *
 import numpy as np
 from ..shaders import ShaderManager
+from ..bone_palette import BONE_PALETTE_TEXTURE_UNIT
 
 
 class Technique(object):
@@ -128,6 +129,44 @@ class ColorSkinningTechnique(Technique):
             glDisableVertexAttribArray(self.Weights_loc)
 
 
+class SkeletonLinesTechnique(Technique):
+    """ draws the lines of many skeletons with one call. Each vertex refers to its bone matrix and to the model
+        matrix of its skeleton in a bone palette.
+    """
+    def __init__(self):
+        self.shader = ShaderManager().getShader("skeleton_lines")
+        self._find_uniform_locations(['viewMatrix', 'projectionMatrix', 'bonePalette'])
+        self._find_attribute_locations(('position', 'color', 'boneID', 'modelID'))
+
+    def prepare(self, viewMatrix, projectionMatrix, bone_palette):
+        glUseProgram(self.shader)
+        glUniformMatrix4fv(self.viewMatrix_loc, 1, GL_FALSE, viewMatrix)
+        glUniformMatrix4fv(self.projectionMatrix_loc, 1, GL_FALSE, projectionMatrix)
+        bone_palette.bind(BONE_PALETTE_TEXTURE_UNIT)
+        glUniform1i(self.bonePalette_loc, BONE_PALETTE_TEXTURE_UNIT)
+
+    def use(self, vbo, n_vertices):
+        try:
+            vbo.bind()
+            glEnableVertexAttribArray(self.position_loc)
+            glEnableVertexAttribArray(self.color_loc)
+            glEnableVertexAttribArray(self.boneID_loc)
+            glEnableVertexAttribArray(self.modelID_loc)
+            glVertexAttribPointer(self.position_loc, 3, GL_FLOAT, False, 36, vbo)
+            glVertexAttribPointer(self.color_loc, 4, GL_FLOAT, False, 36, vbo+12)
+            glVertexAttribPointer(self.boneID_loc, 1, GL_FLOAT, False, 36, vbo+28)
+            glVertexAttribPointer(self.modelID_loc, 1, GL_FLOAT, False, 36, vbo+32)
+            glDrawArrays(GL_LINES, 0, n_vertices)
+        except GLerror as e:
+            print("error", e)
+        finally:
+            vbo.unbind()
+            glDisableVertexAttribArray(self.position_loc)
+            glDisableVertexAttribArray(self.color_loc)
+            glDisableVertexAttribArray(self.boneID_loc)
+            glDisableVertexAttribArray(self.modelID_loc)
+
+
 class ShadingTechnique(Technique):
     def __init__(self):
         self.shader = ShaderManager().getShader("ambient")
@@ -519,6 +558,37 @@ class DirectionalShadingIndexTechnique(DirectionalShadingTechnique):
             glDisableVertexAttribArray(self.vertex_normal_loc)
 
 
+class InstancedDirectionalShadingIndexTechnique(DirectionalShadingIndexTechnique):
+    """ draws all instances of an InstanceBuffer with one call. The material color is replaced by the instance color """
+    def __init__(self, material):
+        DirectionalShadingIndexTechnique.__init__(self, material)
+        self.shader = ShaderManager().getShader("direction", ["USE_INSTANCING"])
+        uniform_names = ('modelMatrix', 'viewMatrix', 'projectionMatrix', 'viewerPos')
+        self._find_uniform_locations(uniform_names)
+        attributes = ('vertex', 'vertex_normal', 'instanceOffset', 'instanceColor')
+        self._find_attribute_locations(attributes)
+
+    def use(self, vertices, indices, instance_buffer, numIndices):
+        instance_locations = [self.instanceOffset_loc, self.instanceColor_loc]
+        try:
+            vertices.bind()
+            indices.bind()
+            glEnableVertexAttribArray(self.vertex_loc)
+            glEnableVertexAttribArray(self.vertex_normal_loc)
+            glVertexAttribPointer(self.vertex_loc, 3, GL_FLOAT, False, 24, vertices)
+            glVertexAttribPointer(self.vertex_normal_loc, 3, GL_FLOAT, False, 24, vertices + 12)
+            instance_buffer.bind_attributes(instance_locations)
+            glDrawElementsInstanced(GL_TRIANGLES, numIndices, GL_UNSIGNED_INT, None, instance_buffer.n_instances)
+        except GLerror as e:
+            print("error in InstancedGeometry", e)
+        finally:
+            instance_buffer.unbind_attributes(instance_locations)
+            vertices.unbind()
+            indices.unbind()
+            glDisableVertexAttribArray(self.vertex_loc)
+            glDisableVertexAttribArray(self.vertex_normal_loc)
+
+
 class ShadedSkinningTextureTechnique(DirectionalShadingTechnique, TextureTechnique):
     uniform_names = ['modelMatrix', 'viewMatrix', 'projectionMatrix', "tex", 'light.intensities',
                      'light.position', 'viewerPos', 'material.ambient_color',
@@ -20,6 +20,7 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
+import string
 import pygame
 import numpy as np
 from OpenGL.GL import *
@@ -91,6 +92,81 @@ class TextTechnique(Technique):
             glDisableVertexAttribArray(self.vertexUV_loc)
 
 
+GLYPH_ATLAS_CHARACTERS = string.digits + string.ascii_letters + string.punctuation + " "
+GLYPH_ATLAS_WIDTH = 1024
+
+
+class GlyphAtlas(object):
+    """ texture that contains all glyphs of a character set so that many strings can be drawn from one vertex buffer.
+        Characters that are not part of the set are drawn as "?".
+    """
+    def __init__(self, font, alpha=0, characters=GLYPH_ATLAS_CHARACTERS, width=GLYPH_ATLAS_WIDTH):
+        images = []
+        for c in characters:
+            surface = font.render(c, True, (255, 255, 255, alpha), (0, 0, 0, alpha))
+            surface.set_alpha(0)
+            ix, iy = surface.get_width(), surface.get_height()
+            image = np.frombuffer(pygame.image.tostring(surface, "RGBA", False), np.uint8).reshape(iy, ix, 4)
+            images.append(image)
+        self.glyph_height = max(image.shape[0] for image in images)
+        width = max(width, max(image.shape[1] for image in images))
+        # pack the glyphs into rows of equal height
+        offsets = []
+        x, y = 0, 0
+        for image in images:
+            if x + image.shape[1] > width:
+                x = 0
+                y += self.glyph_height
+            offsets.append((x, y))
+            x += image.shape[1]
+        height = y + self.glyph_height
+        atlas = np.zeros((height, width, 4), np.uint8)
+        self.glyph_widths = np.zeros(256)
+        self.glyph_uvs = np.zeros((256, 4))
+        for c, image, (x, y) in zip(characters, images, offsets):
+            ih, iw = image.shape[:2]
+            atlas[y:y+ih, x:x+iw] = image
+            self.glyph_widths[ord(c)] = iw
+            self.glyph_uvs[ord(c)] = [x / width, y / height, (x + iw) / width, (y + self.glyph_height) / height]
+        unknown = [i for i in range(256) if chr(i) not in characters]
+        self.glyph_widths[unknown] = self.glyph_widths[ord("?")]
+        self.glyph_uvs[unknown] = self.glyph_uvs[ord("?")]
+
+        self.texture_id = glGenTextures(1)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.texture_id)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, atlas)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+
+    def get_vertices(self, top_left_positions, z, lines, scale=1.0):
+        """ returns the quads of all glyphs as vertex array with position and uv coordinates
+        """
+        lengths = np.array([len(line) for line in lines], dtype=int)
+        codes = np.frombuffer("".join(lines).encode("latin-1", "replace"), np.uint8)
+        if len(codes) == 0:
+            return np.zeros((0, 5), 'f')
+        label_indices = np.repeat(np.arange(len(lines)), lengths)
+        advances = self.glyph_widths[codes] * scale
+        ends = np.cumsum(advances)
+        label_starts = np.concatenate([[0.0], ends])[np.cumsum(lengths) - lengths]
+        top_left_positions = np.asarray(top_left_positions, dtype=float)
+        x0 = top_left_positions[label_indices, 0] + ends - advances - label_starts[label_indices]
+        x1 = x0 + advances
+        y0 = top_left_positions[label_indices, 1]
+        y1 = y0 + self.glyph_height * scale
+        uvs = self.glyph_uvs[codes]
+        vertices = np.zeros((len(codes), 4, 5), 'f')
+        vertices[:, :, 2] = z
+        vertices[:, 0, 0], vertices[:, 0, 1], vertices[:, 0, 3], vertices[:, 0, 4] = x0, y1, uvs[:, 0], uvs[:, 3]
+        vertices[:, 1, 0], vertices[:, 1, 1], vertices[:, 1, 3], vertices[:, 1, 4] = x1, y1, uvs[:, 2], uvs[:, 3]
+        vertices[:, 2, 0], vertices[:, 2, 1], vertices[:, 2, 3], vertices[:, 2, 4] = x1, y0, uvs[:, 2], uvs[:, 1]
+        vertices[:, 3, 0], vertices[:, 3, 1], vertices[:, 3, 3], vertices[:, 3, 4] = x0, y0, uvs[:, 0], uvs[:, 1]
+        return vertices.reshape(-1, 5)
+
+
 class TextRenderer(object):
     def __init__(self, font_size=64, alpha=0):
         self.technique = TextTechnique(font_size, alpha)
@@ -98,6 +174,8 @@ class TextRenderer(object):
         vertices = []
         self._vbo = vbo.VBO(np.array(vertices,'f'))
         self.n_vertices = len(vertices)
+        self._atlas = None
+        self._batch_vbo = vbo.VBO(np.array(vertices, 'f'))
 
     def draw(self, orthographic_matrix, top_left, z, text, scale=1.0):
         # https://stackoverflow.com/questions/10630823/how-to-get-texture-coordinate-to-glsl-in-version-150
@@ -117,3 +195,18 @@ class TextRenderer(object):
         self.technique.stop()
         return max_pos
 
+    def draw_lines(self, orthographic_matrix, top_left_positions, z, lines, scale=1.0):
+        """ draws many strings with one draw call using a glyph atlas that is created on the first call
+        """
+        if self._atlas is None:
+            self._atlas = GlyphAtlas(self.technique.font, self.technique.alpha)
+        vertices = self._atlas.get_vertices(top_left_positions, z, lines, scale)
+        if len(vertices) == 0:
+            return
+        self.technique.prepare(orthographic_matrix)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self._atlas.texture_id)
+        glUniform1i(self.technique.tex_loc, 0)
+        self._batch_vbo.set_array(vertices)
+        self.technique.use(self._batch_vbo, self.vertex_array_type, len(vertices))
+        self.technique.stop()
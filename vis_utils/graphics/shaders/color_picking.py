@@ -26,6 +26,7 @@ COLOR_PICKING_VS = """
  in vec3 position;
  in vec4 boneIDs;
  in vec4 weights;
+ in vec4 instanceOffset;
 
  uniform mat4 modelMatrix;
  uniform mat4 viewMatrix;
@@ -33,15 +34,46 @@ COLOR_PICKING_VS = """
  uniform vec4 pickColor;
  uniform int useSkinning;
  uniform int boneCount;
- const int MAX_BONES = 150;
- uniform mat4 bones[MAX_BONES];
+ uniform samplerBuffer bonePalette;
+ uniform int animationFrameCount;
+ uniform float animationFrame;
+ uniform mat4 animationRootMatrix;
+ uniform int useInstanceAttributes;
 
  out vec4 fragColor;
 
+ mat4 getBoneMatrix(int id)
+ {
+     return mat4(texelFetch(bonePalette, id*4), texelFetch(bonePalette, id*4+1),
+                 texelFetch(bonePalette, id*4+2), texelFetch(bonePalette, id*4+3));
+ }
+
+ mat4 getSkinningMatrix(int id)
+ {
+     if(animationFrameCount > 0){
+         // baked animation: interpolate between two frames of the animation texture
+         int frame0 = int(floor(animationFrame));
+         float t = animationFrame - float(frame0);
+         frame0 = frame0 % animationFrameCount;
+         int frame1 = (frame0 + 1) % animationFrameCount;
+         mat4 m = getBoneMatrix(frame0 * boneCount + id) * (1.0 - t) + getBoneMatrix(frame1 * boneCount + id) * t;
+         return animationRootMatrix * m;
+     }
+     return getBoneMatrix(gl_InstanceID * boneCount + id);
+ }
+
+ vec3 getInstancePosition()
+ {
+     if(bool(useInstanceAttributes)){
+         return position * instanceOffset.w + instanceOffset.xyz;
+     }
+     return position;
+ }
+
  void main() {
 
     if(!bool(useSkinning)){
-       gl_Position = projectionMatrix*viewMatrix* modelMatrix * vec4(position,1);
+       gl_Position = projectionMatrix*viewMatrix* modelMatrix * vec4(getInstancePosition(),1);
     }else{
         vec4 tempPosition = vec4(0.0);
         for(int i = 0; i < 4; i++)
@@ -49,7 +81,7 @@ COLOR_PICKING_VS = """
             int id = int(boneIDs[i]);
             if(id >=  0 && boneIDs[i] < boneCount && weights[i] > 0.0)
             {
-                mat4 boneMatrix = bones[id];
+                mat4 boneMatrix = getSkinningMatrix(id);
                 tempPosition += boneMatrix * vec4(position, 1.0) * weights[i];
             }
         }
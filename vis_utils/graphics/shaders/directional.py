@@ -38,13 +38,25 @@ out vec3 fragVert;
 out vec3 vertexNormal;
 out vec3 eyeDir;
 
+#ifdef USE_INSTANCING
+// shared mesh placed, uniformly scaled and colored per instance
+in vec4 instanceOffset;
+in vec4 instanceColor;
+out vec3 fragInstanceColor;
+#endif
+
 
 void main(void)
 {
     mat4 normalMatrix = transpose(inverse(modelMatrix));
     vertexNormal = (normalMatrix * vec4(vertex_normal, 0.0)).xyz;
+    vec3 position = vertex;
+#ifdef USE_INSTANCING
+    position = vertex * instanceOffset.w + instanceOffset.xyz;
+    fragInstanceColor = instanceColor.rgb;
+#endif
 
-    vec3 vertexWorldSpace = (viewMatrix * modelMatrix * vec4(vertex, 1.0)).xyz;
+    vec3 vertexWorldSpace = (viewMatrix * modelMatrix * vec4(position, 1.0)).xyz;
     eyeDir = -normalize(vertexWorldSpace.xyz - viewerPos);
     vec4 tempPosition = projectionMatrix * vec4(vertexWorldSpace, 1.0); // projectionMatrix*viewMatrix* modelMatrix * vec4( vertex, 1.0 );
     gl_Position = tempPosition;
@@ -77,6 +89,9 @@ uniform Material material;
 in vec3 fragVert;
 in vec3 vertexNormal;
 in vec3 eyeDir;
+#ifdef USE_INSTANCING
+in vec3 fragInstanceColor;
+#endif
 
 out vec4 color;
 
@@ -99,7 +114,11 @@ void main (void)
     float brightness = max(dot(L,N),0);
     brightness = clamp(brightness, 0, 1);
 
-    vec3 diffuse = light.intensities * brightness * material.diffuse_color;
+    vec3 diffuseColor = material.diffuse_color;
+#ifdef USE_INSTANCING
+    diffuseColor = fragInstanceColor;
+#endif
+    vec3 diffuse = light.intensities * brightness * diffuseColor;
     float specularCoefficient = 0;
     if (brightness > 0.0){
         vec3 H = normalize(E+L);
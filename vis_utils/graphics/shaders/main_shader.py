@@ -39,9 +39,10 @@ in vec3 normal;
 in vec2 uv;
 in vec4 boneIDs;
 in vec4 weights;
+in vec4 instanceOffset;
+in vec4 instanceColor;
 
 const int MAX_LIGHTS = 8;
-const int MAX_BONES = 150;
 
 struct LightSource{
     vec3 intensities;
@@ -57,7 +58,11 @@ uniform mat4 viewMatrix;
 uniform mat4 projectionMatrix;
 uniform int useSkinning;
 uniform int boneCount;
-uniform mat4 bones[MAX_BONES];
+uniform samplerBuffer bonePalette;
+uniform int animationFrameCount;
+uniform float animationFrame;
+uniform mat4 animationRootMatrix;
+uniform int useInstanceAttributes;
 uniform int lightCount;
 uniform LightSource lights[MAX_LIGHTS];
 uniform int useShadow;
@@ -67,16 +72,52 @@ uniform float fogDistanceFactor = 0.0007;
 out vec3 fragVert;
 out vec3 fragNormal;
 out vec2 fragUV;
+out vec3 fragInstanceColor;
 out vec4 shadowCoord[MAX_LIGHTS];
 out float fogFactor;
 
 const float gradient = 1.5;
 
+mat4 getBoneMatrix(int id)
+{
+    return mat4(texelFetch(bonePalette, id*4), texelFetch(bonePalette, id*4+1),
+                texelFetch(bonePalette, id*4+2), texelFetch(bonePalette, id*4+3));
+}
+
+mat4 getSkinningMatrix(int id)
+{
+    if(animationFrameCount > 0){
+        // baked animation: interpolate between two frames of the animation texture
+        int frame0 = int(floor(animationFrame));
+        float t = animationFrame - float(frame0);
+        frame0 = frame0 % animationFrameCount;
+        int frame1 = (frame0 + 1) % animationFrameCount;
+        mat4 m = getBoneMatrix(frame0 * boneCount + id) * (1.0 - t) + getBoneMatrix(frame1 * boneCount + id) * t;
+        return animationRootMatrix * m;
+    }
+    return getBoneMatrix(gl_InstanceID * boneCount + id);
+}
+
+vec3 getInstancePosition()
+{
+    // shared mesh placed and uniformly scaled per instance
+#ifdef USE_INSTANCING
+    if(bool(useInstanceAttributes)){
+        return position * instanceOffset.w + instanceOffset.xyz;
+    }
+#endif
+    return position;
+}
+
 void main()
 {
     float distance = 0;
-    if(!bool(useSkinning)){
-       vec3 surfacePos = (modelMatrix * vec4(position,1.0)).xyz;
+    vec3 localPosition = getInstancePosition();
+#ifdef USE_SKINNING
+    if(!bool(useSkinning))
+#endif
+    {
+       vec3 surfacePos = (modelMatrix * vec4(localPosition,1.0)).xyz;
         vec4 relCameraPos = viewMatrix *  vec4(surfacePos,1.0);
        gl_Position = projectionMatrix * relCameraPos;
         if(bool(useShadow)){
@@ -87,7 +128,9 @@ void main()
        mat4 normalMatrix = transpose(inverse(modelMatrix));
        fragNormal = (normalMatrix*vec4(normal,0.0)).xyz;
        distance = length(relCameraPos);
-    }else{
+    }
+#ifdef USE_SKINNING
+    else{
         vec4 tempPosition = vec4(0.0);
         vec4 tempNormal = vec4(0.0);
         for(int i = 0; i < 4; i++)
@@ -95,7 +138,7 @@ void main()
             int id = int(boneIDs[i]);
             if(id >=  0 && boneIDs[i] < boneCount && weights[i] > 0.0)
             {
-                mat4 boneMatrix = bones[id];
+                mat4 boneMatrix = getSkinningMatrix(id);
                 tempPosition += boneMatrix * vec4(position, 1.0) * weights[i];
                 tempNormal +=  boneMatrix * vec4(normal, 0.0) * weights[i];
             }
@@ -113,10 +156,12 @@ void main()
 
         distance = length(relCameraPos);
     }
+#endif
 
 
-   fragVert = position;
+   fragVert = localPosition;
    fragUV = uv;
+   fragInstanceColor = instanceColor.rgb;
    fogFactor = exp(-pow((distance*fogDistanceFactor), gradient));
 
 }"""
@@ -124,7 +169,7 @@ void main()
 CALCSHADOW_STUB =""" 
 float calculateShadow(sampler2D shadowMap, vec4 fragPosLightSpace, vec3 lightDir)
 {
-    return 0;
+    return 0.0;
 }
 """
 
@@ -167,6 +212,8 @@ float calculateShadow(sampler2D shadowMap, vec4 fragPosLightSpace, vec3 lightDir
 }
 """
 
+CALCSHADOW_VARIANTS = "#ifdef USE_SHADOWS\n" + CALCSHADOW_FUNC + "#else\n" + CALCSHADOW_STUB + "#endif\n"
+
 MAIN_FS =  """
 #version 330 core
 
@@ -201,11 +248,13 @@ uniform sampler2D tex;
 uniform vec3 viewerPos;
 uniform int useTexture;
 uniform int useShadow;
+uniform int useInstanceAttributes;
 uniform vec3 skyColor;
 
 in vec3 fragVert;
 in vec3 fragNormal;
 in vec2 fragUV;
+in vec3 fragInstanceColor;
 in vec4 shadowCoord[MAX_LIGHTS];
 in float fogFactor;
 
@@ -226,6 +275,12 @@ void main()
         surfaceColor = texture( tex, fragUV ).rgba;
         ambient = material.ambient_color*surfaceColor.xyz;
     }
+#ifdef USE_INSTANCING
+    else if(bool(useInstanceAttributes)){
+        surfaceColor = vec4(fragInstanceColor, 1);
+        ambient = material.ambient_color*surfaceColor.xyz;
+    }
+#endif
     vec3 diffuseSum = vec3(0);
     vec3 specularSum = vec3(0);
     float visibility = 1.0;
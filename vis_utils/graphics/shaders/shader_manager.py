@@ -20,7 +20,10 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
+import os
 import sys
+import hashlib
+import numpy as np
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from vis_utils import constants
@@ -41,33 +44,168 @@ SHADER_PROGRAMS["color"] = (COLOR_VS, COLOR_FS)
 SHADER_PROGRAMS["direction"] = (DIR_VS, DIR_FS)
 SHADER_PROGRAMS["texture"] = (TEXTURE_VS, TEXTURE_FS)
 SHADER_PROGRAMS["color_skinning"] = (SKINNING_COLOR_VS, SKINNING_COLOR_FS)
+SHADER_PROGRAMS["skeleton_lines"] = (SKELETON_LINES_VS, SKINNING_COLOR_FS)
 SHADER_PROGRAMS["screen"] = (SCREEN_VS, SCREEN_FS)
 SHADER_PROGRAMS["color_picking"] = (COLOR_PICKING_VS, COLOR_PICKING_FS)
-if constants.activate_shadows:
-    SHADER_PROGRAMS["main"] = (MAIN_VS, MAIN_FS % CALCSHADOW_FUNC)
-else:
-    SHADER_PROGRAMS["main"] = (MAIN_VS, MAIN_FS % CALCSHADOW_STUB)
+SHADER_PROGRAMS["main"] = (MAIN_VS, MAIN_FS % CALCSHADOW_VARIANTS)
 SHADER_PROGRAMS["shadow_mapping"] = (SHADOW_MAPPING_VS, SHADOW_MAPPING_FS)
 SHADER_PROGRAMS["shadow_screen"] = (SHADOW_SCREEN_VS, SHADOW_SCREEN_FS)
 SHADER_PROGRAMS["outline"] = (OUTLINE_VS, OUTLINE_FS)
 
+# features of the main shader that are compiled in when getShader is called without defines
+MAIN_SHADER_FEATURES = ["USE_SKINNING", "USE_INSTANCING"]
+
+
+def get_default_defines(key):
+    if key != "main":
+        return []
+    defines = list(MAIN_SHADER_FEATURES)
+    if constants.activate_shadows:
+        defines.append("USE_SHADOWS")
+    return defines
+
+
+def add_defines(source, defines):
+    """ inserts the defines after the version directive that has to be the first statement of a shader """
+    if len(defines) == 0:
+        return source
+    lines = source.lstrip().split("\n")
+    define_lines = ["#define " + d for d in defines]
+    if lines[0].startswith("#version"):
+        return "\n".join(lines[:1] + define_lines + lines[1:])
+    return "\n".join(define_lines + lines)
+
+
+def link_program(vertex_shader, fragment_shader, retrievable=False):
+    program = glCreateProgram()
+    glAttachShader(program, vertex_shader)
+    glAttachShader(program, fragment_shader)
+    if retrievable:
+        glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+    glLinkProgram(program)
+    glDetachShader(program, vertex_shader)
+    glDetachShader(program, fragment_shader)
+    glDeleteShader(vertex_shader)
+    glDeleteShader(fragment_shader)
+    if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+        info = glGetProgramInfoLog(program)
+        glDeleteProgram(program)
+        raise RuntimeError("Link failure (%s)" % info)
+    # samplers of different types share unit 0 until the renderers assign the units,
+    # so the program is not validated against the current GL state because it would fail for the bone palette
+    return shaders.ShaderProgram(program)
+
+
+def program_binary_supported():
+    try:
+        return bool(glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0)
+    except:
+        return False
+
+
 class ShaderManager(object):
+     """ Compiles the programs in SHADER_PROGRAMS on the first request of each variant.
+         A variant is identified by the program name and a set of preprocessor defines, e.g. USE_SHADOWS,
+         USE_SKINNING and USE_INSTANCING for the main shader.
+         If a cache directory is set and the driver supports program binaries, linked programs are stored there
+         and loaded without compilation on the next start.
+     """
      contextShaderMap = dict()
+     cache_dir = None
+     context_reset_callbacks = []
      def __init__(self):
          return
 
-     def initShaderMap(self):
-         for key, shader_program in SHADER_PROGRAMS.items():
-             try:
-                 v = shaders.compileShader(shader_program[0], GL_VERTEX_SHADER)
-                 f = shaders.compileShader(shader_program[1], GL_FRAGMENT_SHADER)
-                 shader_program = shaders.compileProgram(v, f)
-                 self.__class__.contextShaderMap[key] = shader_program
-             except:
-                 print("Compiling shader program "+key+" crashed with error: ", sys.exc_info()[0], sys.exc_info()[1])
-
-     def getShader(self, key):
-         if key in self.__class__.contextShaderMap:
-             return self.__class__.contextShaderMap[key]
-         else:
+     def initShaderMap(self, keys=None):
+         """ compiles the default variants of the given programs ahead of their first use.
+             all other programs are compiled on demand by getShader
+         """
+         if keys is None:
+             return
+         for key in keys:
+             self.getShader(key)
+
+     @classmethod
+     def set_cache_dir(cls, cache_dir):
+         if cache_dir is not None and not os.path.isdir(cache_dir):
+             os.makedirs(cache_dir)
+         cls.cache_dir = cache_dir
+
+     @classmethod
+     def clear(cls):
+         """ forgets the compiled programs, e.g. after the GL context was destroyed """
+         cls.contextShaderMap.clear()
+         for callback in cls.context_reset_callbacks:
+             callback()
+
+     @classmethod
+     def add_context_reset_callback(cls, callback):
+         """ the callback is called by clear to forget other objects of the destroyed context """
+         if callback not in cls.context_reset_callbacks:
+             cls.context_reset_callbacks.append(callback)
+
+     def getShader(self, key, defines=None):
+         if key not in SHADER_PROGRAMS:
+             return None
+         if defines is None:
+             defines = get_default_defines(key)
+         variant_key = (key, tuple(sorted(set(defines))))
+         if variant_key not in self.__class__.contextShaderMap:
+             self.__class__.contextShaderMap[variant_key] = self._create_program(key, variant_key[1])
+         return self.__class__.contextShaderMap[variant_key]
+
+     def _create_program(self, key, defines):
+         vs_source = add_defines(SHADER_PROGRAMS[key][0], defines)
+         fs_source = add_defines(SHADER_PROGRAMS[key][1], defines)
+         cache_path = self._get_cache_path(vs_source, fs_source)
+         program = self._load_program_binary(cache_path)
+         if program is not None:
+             return program
+         try:
+             v = shaders.compileShader(vs_source, GL_VERTEX_SHADER)
+             f = shaders.compileShader(fs_source, GL_FRAGMENT_SHADER)
+             program = link_program(v, f, cache_path is not None)
+         except:
+             print("Compiling shader program "+key+" crashed with error: ", sys.exc_info()[0], sys.exc_info()[1])
+             return None
+         self._save_program_binary(cache_path, program)
+         return program
+
+     def _get_cache_path(self, vs_source, fs_source):
+         if self.cache_dir is None or not program_binary_supported():
              return None
+         # binaries are only valid for the driver that created them
+         source_hash = hashlib.sha1(glGetString(GL_VENDOR) + glGetString(GL_RENDERER) + glGetString(GL_VERSION))
+         source_hash.update(vs_source.encode())
+         source_hash.update(fs_source.encode())
+         return self.cache_dir + os.sep + source_hash.hexdigest() + ".bin"
+
+     def _load_program_binary(self, cache_path):
+         if cache_path is None or not os.path.isfile(cache_path):
+             return None
+         data = np.fromfile(cache_path, dtype=np.uint8)
+         if len(data) < 4:
+             return None
+         binary_format = int(data[:4].view(np.uint32)[0])
+         program = glCreateProgram()
+         glProgramBinary(program, binary_format, data[4:], len(data) - 4)
+         if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+             # the driver rejects binaries of other driver versions, so the program is compiled again
+             glDeleteProgram(program)
+             return None
+         return shaders.ShaderProgram(program)
+
+     def _save_program_binary(self, cache_path, program):
+         if cache_path is None:
+             return
+         try:
+             length = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+             binary = np.zeros(length, dtype=np.uint8)
+             binary_format = np.zeros(1, dtype=np.uint32)
+             written = np.zeros(1, dtype=np.int32)
+             glGetProgramBinary(program, length, written, binary_format, binary)
+             with open(cache_path, "wb") as out_file:
+                 out_file.write(binary_format.tobytes())
+                 out_file.write(binary[:written[0]].tobytes())
+         except:
+             print("Warning: could not write program binary", cache_path, sys.exc_info()[1])
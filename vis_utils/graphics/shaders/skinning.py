@@ -118,3 +118,32 @@ void main()
     outColor = theColor;
 }
  """
+
+SKELETON_LINES_VS = """
+#version 330
+
+in vec3 position;
+in vec4 color;
+in float boneID;
+in float modelID;
+
+uniform mat4 viewMatrix;
+uniform mat4 projectionMatrix;
+uniform samplerBuffer bonePalette;
+
+out vec4 theColor;
+
+mat4 getMatrix(int id)
+{
+    return mat4(texelFetch(bonePalette, id*4), texelFetch(bonePalette, id*4+1),
+                texelFetch(bonePalette, id*4+2), texelFetch(bonePalette, id*4+3));
+}
+
+void main()
+{
+    // the model matrix of a skeleton that is not drawn is zero, which moves its lines out of the clip volume
+    mat4 modelMatrix = getMatrix(int(modelID));
+    gl_Position = projectionMatrix * viewMatrix * modelMatrix * getMatrix(int(boneID)) * vec4(position, 1.0);
+    theColor = color;
+}
+"""
@@ -41,6 +41,10 @@ class Texture(object):
     def __init__(self):
         self.texture_id = -1
         self.image = None
+        self.width = 0
+        self.height = 0
+        self.cache = None
+        self.cache_key = None
 
     @classmethod
     def enable(cls):
@@ -54,10 +58,31 @@ class Texture(object):
     def from_image(cls, image):
         texture = Texture()
         texture.image = image
-        img_data = image.convert("RGBA").tobytes("raw", "RGBA", 0, -1)
-        texture._upload(img_data, image.size[0], image.size[1])
+        texture.upload_image()
         return texture
 
+    @classmethod
+    def from_pixels(cls, pixels, image=None):
+        """ pixels: RGBA uint8 array with shape (height, width, 4) starting with the bottom row """
+        texture = Texture()
+        texture.image = image
+        texture._upload(np.ascontiguousarray(pixels, dtype=np.uint8), pixels.shape[1], pixels.shape[0])
+        return texture
+
+    def upload_image(self):
+        img_data = self.image.convert("RGBA").tobytes("raw", "RGBA", 0, -1)
+        self._upload(img_data, self.image.size[0], self.image.size[1])
+
+    @property
+    def gpu_size(self):
+        """ size of the RGBA texture including the mipmap chain in bytes """
+        return self.width * self.height * 4 * 4 // 3
+
+    def delete(self):
+        if self.texture_id != -1:
+            glDeleteTextures([self.texture_id])
+            self.texture_id = -1
+
     def load_from_file(self, filepath):
         self.image = Image.open(filepath)
         ix = self.image.size[0]
@@ -97,6 +122,8 @@ class Texture(object):
         #http://www.siafoo.net/article/58
         # Create Texture
         self.texture_id = glGenTextures(1)
+        self.width = ix
+        self.height = iy
         glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
         glBindTexture(GL_TEXTURE_2D, self.texture_id)  # 2d texture (x and y size)
         glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, ix, iy, 0, GL_RGBA, GL_UNSIGNED_BYTE, image)
@@ -161,6 +188,8 @@ class Texture(object):
         return image
 
     def bind(self):
+        if self.cache is not None:
+            self.cache.touch_texture(self)
         glBindTexture(GL_TEXTURE_2D, self.texture_id)
 
     def unbind(self):
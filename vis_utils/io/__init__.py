@@ -24,8 +24,9 @@ import os
 import numpy as np
 from vis_utils.graphics import materials
 from vis_utils.scene.scene_object_builder import SceneObjectBuilder, SceneObject
-from vis_utils.scene.components import StaticMesh, GeometryDataComponent
+from vis_utils.scene.components import StaticMesh, GeometryDataComponent, ConstraintSetComponent
 from vis_utils.graphics.geometry.mesh import Mesh
+from vis_utils.graphics.geometry.primitive_manager import PrimitiveManager
 from .utils import load_json_file, save_json_file
 from .obj_format import load_obj_file
 from .fbx_format import load_model_from_fbx_file
@@ -76,17 +77,25 @@ def load_collada_file(builder, file_path):
     return scene_object
 
 
-def load_mesh_from_obj_file(builder, file_path):
+def create_mesh_from_obj_data(builder, mesh_list, file_path, batch=False, **kwargs):
+    """ batch: merge the meshes that share a material to draw them with one call per material """
     file_name = os.path.basename(file_path)
     scene_object = SceneObject()
     scene_object.name = file_name
-    mesh_list2 = load_obj_file(file_path)
-    static_mesh = StaticMesh(scene_object, [0, 0, 0], mesh_list2)
+    static_mesh = StaticMesh(scene_object, [0, 0, 0], mesh_list, batch)
     scene_object.add_component("static_mesh", static_mesh)
     builder._scene.addObject(scene_object)
     return scene_object
 
 
+def load_obj_data(file_path, **kwargs):
+    return load_obj_file(file_path)
+
+
+def load_mesh_from_obj_file(builder, file_path, batch=False):
+    return create_mesh_from_obj_data(builder, load_obj_data(file_path), file_path, batch)
+
+
 
 
 def create_static_mesh(builder, name, mesh_list):
@@ -99,47 +108,33 @@ def create_static_mesh(builder, name, mesh_list):
 
 
 def load_unity_constraints(builder, file_path, radius=1, material=materials.green):
+    """ all markers are stored in one constraint set and drawn as instances of a shared sphere"""
     data = load_json_file(file_path)
-    for idx, c in enumerate(data["frameConstraints"]):
-        p = c["position"]
-        p = np.array([p["x"], p["y"], p["z"]])
-        q = c["orientation"]
-        q = np.array([q["w"], q["x"], q["y"], q["z"]])
-        o = c["offset"]
-        o = np.array([o["x"], o["y"], o["z"]])
-
-        scene_object = SceneObject()
-        geometry = Mesh.build_sphere(20, 20, 2 * radius, materials.blue)
-        scene_object._components["geometry"] = GeometryDataComponent(scene_object, geometry)
-        scene_object.name = 'c'+str(idx)
-        builder._scene.addObject(scene_object)
-        scene_object.setPosition(p)
-        scene_object.setQuaternion(q)
-
-        scene_object = SceneObject()
-        geometry = Mesh.build_sphere(20, 20, 2 * radius, material)
-        scene_object._components["geometry"] = GeometryDataComponent(scene_object, geometry)
-        scene_object.name = 'co' + str(idx)
-        builder._scene.addObject(scene_object)
-        scene_object.setPosition(p+o)
-        scene_object.setQuaternion(q)
+    scene_object = SceneObject()
+    scene_object.name = os.path.basename(file_path)
+    constraint_set = ConstraintSetComponent(scene_object)
+    frame_constraints = data["frameConstraints"]
+    if len(frame_constraints) > 0:
+        positions = np.array([[c["position"][k] for k in "xyz"] for c in frame_constraints])
+        offsets = np.array([[c["offset"][k] for k in "xyz"] for c in frame_constraints])
+        n_constraints = len(frame_constraints)
+        constraint_set.add_constraints(positions, radius, materials.blue.diffuse_color,
+                                       ['c' + str(idx) for idx in range(n_constraints)])
+        constraint_set.add_constraints(positions + offsets, radius, material.diffuse_color,
+                                       ['co' + str(idx) for idx in range(n_constraints)])
     print("n points", len(data["controlPoints"]))
-    for idx, p in enumerate(data["controlPoints"]):
-        p = [p["x"], p["y"], p["z"]]
-        scene_object = SceneObject()
-        geometry = Mesh.build_sphere(20, 20, 2 * radius, materials.grey)
-        scene_object._components["geometry"] = GeometryDataComponent(scene_object, geometry)
-        scene_object.setPosition(p)
-        scene_object.name = 'p' + str(idx)
-        builder._scene.addObject(scene_object)
+    if len(data["controlPoints"]) > 0:
+        points = np.array([[p[k] for k in "xyz"] for p in data["controlPoints"]])
+        constraint_set.add_constraints(points, radius, materials.grey.diffuse_color,
+                                       ['p' + str(idx) for idx in range(len(points))])
+    scene_object.add_component("constraint_set", constraint_set)
+    builder._scene.addObject(scene_object)
+    return scene_object
 
 
-def load_fbx_model(builder, file_path, scale=1.0, visualize=True,  load_skeleton=True):
-    model_data = load_model_from_fbx_file(file_path)
-    if model_data is None:
-        return None
+def create_model_object(builder, model_data, file_path, scale=1.0, visualize=True, load_skeleton=True, **kwargs):
     name = file_path.split("/")[-1]
-    if load_skeleton and "skeleton" in model_data:
+    if load_skeleton and "skeleton" in model_data and model_data["skeleton"] is not None:
         scene_object = builder.create_object("animated_mesh", name, model_data, scale, visualize)
         builder._scene.register_animation_controller(scene_object, "animation_controller")
     else:
@@ -148,23 +143,45 @@ def load_fbx_model(builder, file_path, scale=1.0, visualize=True,  load_skeleton
     return scene_object
 
 
+def load_fbx_model(builder, file_path, scale=1.0, visualize=True,  load_skeleton=True):
+    model_data = load_model_from_fbx_file(file_path)
+    if model_data is None:
+        return None
+    return create_model_object(builder, model_data, file_path, scale, visualize, load_skeleton)
+
+
+def load_gltf_data(file_path, **kwargs):
+    return load_model_from_gltf_file(file_path)
+
 
 def load_gltf_file(builder, file_path, scale=1.0, visualize=True,  load_skeleton=True):
-    model_data = load_model_from_gltf_file(file_path)
+    model_data = load_gltf_data(file_path)
     if model_data is None:
         return None
-    name = file_path.split("/")[-1]
-    if load_skeleton and "skeleton" in model_data and model_data["skeleton"] is not None:
-        scene_object = builder.create_object("animated_mesh", name, model_data, scale, visualize)
-        builder._scene.register_animation_controller(scene_object, "animation_controller")
-    else:
-        scene_object = builder.create_object("static_mesh", name, model_data, scale)
+    return create_model_object(builder, model_data, file_path, scale, visualize, load_skeleton)
+
+def create_sphere_object(builder, name, position, orientation=None, radius=1.0, material=materials.blue, simulate=False, kinematic=True):
+    """ the geometry is shared with all spheres of the same radius
+        simulate and kinematic are accepted for the signature of EditorScene.addSphere but always ignored
+    """
+    scene_object = SceneObject()
+    geometry = PrimitiveManager().get_geometry("sphere", 20, 20, 2 * radius, material=material)
+    scene_object.add_component("geometry", GeometryDataComponent(scene_object, geometry))
+    scene_object.name = name
     builder._scene.addObject(scene_object)
+    scene_object.setPosition(position)
+    if orientation is not None:
+        scene_object.setQuaternion(orientation)
     return scene_object
 
+
 SceneObjectBuilder.register_object("mesh_list", create_static_mesh)
+SceneObjectBuilder.register_object("sphere", create_sphere_object)
 SceneObjectBuilder.register_file_handler("obj", load_mesh_from_obj_file)
 SceneObjectBuilder.register_file_handler("dae", load_collada_file)
 SceneObjectBuilder.register_file_handler("_constraints.json", load_unity_constraints)
 SceneObjectBuilder.register_file_handler("gltf", load_gltf_file)
 SceneObjectBuilder.register_file_handler("glb", load_gltf_file)
+SceneObjectBuilder.register_async_file_handler("obj", load_obj_data, create_mesh_from_obj_data)
+SceneObjectBuilder.register_async_file_handler("gltf", load_gltf_data, create_model_object)
+SceneObjectBuilder.register_async_file_handler("glb", load_gltf_data, create_model_object)
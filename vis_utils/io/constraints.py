@@ -26,7 +26,9 @@ from matplotlib import pyplot as plt
 import matplotlib.cm as cmx
 import matplotlib.colors as colors
 import numpy as np
-from ..scene.legacy import SplineObject, MarkerObject, CoordinateSystemObject, PositionConstraintObject
+from ..scene.legacy import SplineObject, MarkerObject, CoordinateSystemObject
+from ..scene.scene_object import SceneObject
+from ..scene.components import ConstraintSetComponent
 from .utils import load_json_file
 from ..graphics import utils
 
@@ -37,6 +39,7 @@ class ConstraintsFormatReader(object):
     def __init__(self, scene, scaleFactor=100):
         self._scene = scene
         self.scaleFactor = scaleFactor
+        self._constraint_set = None
 
     def loadCoordinateErrorFormat(self, filename):
         data = load_json_file(filename)
@@ -49,15 +52,12 @@ class ConstraintsFormatReader(object):
 
         jet = plt.get_cmap('jet')
         # a = max(0, 1)
-        vmax = max(max(np.log(data["errors"])), 1)
+        errors = np.log(data["errors"])  # *10
+        vmax = max(max(errors), 1)
         cNorm = colors.Normalize(vmin=0, vmax=vmax)
         scalarMap = cmx.ScalarMappable(norm=cNorm, cmap=jet)
-        for idx, c in enumerate(data["coordinates"]):
-            error = np.log(data["errors"][idx])  # *10
-            color = scalarMap.to_rgba(error)
-            color = np.array(list(color)[:3])
-            print(data["errors"][idx], color)
-            self._addConstraintMarkerObject(c, radius=2.0, color=color)
+        marker_colors = scalarMap.to_rgba(errors)[:, :3]
+        self._get_constraint_set().add_constraints(data["coordinates"], 2.0, marker_colors)
 
     def loadPath(self, filename):
         data = load_json_file(filename)
@@ -79,11 +79,20 @@ class ConstraintsFormatReader(object):
         elif "elementaryActions" in list(data.keys()):
             self._addElementaryActionConstraints(data["elementaryActions"], count, color[0], color[1], color[2])
 
+    def _get_constraint_set(self):
+        """ all markers loaded by the reader share one constraint set"""
+        if self._constraint_set is None:
+            scene_object = SceneObject()
+            scene_object.name = "constraints"
+            self._constraint_set = ConstraintSetComponent(scene_object)
+            scene_object.add_component("constraint_set", self._constraint_set)
+            self._scene.addObject(scene_object)
+        return self._constraint_set
+
     def _addConstraintMarkerObject(self, position, radius=2.5, color=None):
-        constraint = PositionConstraintObject(position, radius)
-        constraint.setPosition(position)
-        constraint.active = False
-        self._scene.addObject(constraint)
+        if color is None:
+            color = [1, 0, 0]
+        return self._get_constraint_set().add_constraint(position, radius, color)
 
     def _addElementaryActionConstraints(self, elementaryActionList, count, r, g, b):
         keyframe_constraint_count = 0
@@ -26,6 +26,7 @@ Created on Aug 6, 2014
 @author: erhe01
 '''
 import os
+import re
 import numpy as np
 from PIL import Image
 from copy import copy
@@ -54,12 +55,12 @@ def load_mesh_from_ob_file(filePath):
      '''
      try:
         fo = open(filePath)
-        obj_file_lines = fo.readlines()
+        obj_file_text = fo.read()
         fo.close()
      except:
         print("could not read file", filePath)
         return []
-     return load_meshes2(obj_file_lines)
+     return load_meshes2(obj_file_text)
 
 
 def load_meshes(obj_file_lines):
@@ -115,199 +116,185 @@ def load_meshes(obj_file_lines):
     return mesh_desc
 
 
-def load_meshes2(obj_file_lines, flip_normals=True, shift_index=True):
-
-    mesh_type = "triangles"
-    mesh_list = []
-    mesh_desc = {"name": "default", "faces": [],
-                 "vertices": [], "normals": [],
-                 "texture_coordinates": [],
-                 "face_groups": [], "shift_index": shift_index,
-                 "type": mesh_type, "material": "",
-                 "has_material": False}
-    mesh_list.append(mesh_desc)
-    faces = []
-    latest_material = None
-    m_idx = 0
-    face_group_idx = -1
-    for li in range(len(obj_file_lines)):
-        split_symbol = '//'
-        if split_symbol not in obj_file_lines[li]:
-            split_symbol = '/'
-        line = (obj_file_lines[li]).split()
-        if len(line) < 1:
+# the records are found by searching for the line break followed by the keyword
+V_PATTERN = re.compile(r"\nv +([^\n]*)")
+VN_PATTERN = re.compile(r"\nvn +([^\n]*)")
+VT_PATTERN = re.compile(r"\nvt +([^\n]*)")
+F_PATTERN = re.compile(r"\nf +([^\n]*)")
+EVENT_PATTERN = re.compile(r"\n(o|g|usemtl) +([^\n]*)")
+# marks face vertices without normal or texture coordinate. 1-based OBJ indices are never 0 or negative after resolving.
+MISSING_INDEX = -1
+
+
+def _parse_float_records(records, n_columns):
+    """ decodes the values of v, vn or vt records into an array with shape (n_records, n_columns)"""
+    if len(records) == 0:
+        return np.zeros((0, n_columns))
+    values = np.fromstring(" ".join(records), dtype=np.float64, sep=" ")
+    if len(values) == len(records) * n_columns:
+        return values.reshape((-1, n_columns))
+    # some records have optional components e.g. vertex colors or a w coordinate
+    return np.array([r.split()[:n_columns] for r in records], dtype=np.float64)
+
+
+def _parse_face_vertex(token):
+    parts = token.split("/")
+    vi = int(parts[0])
+    ti = int(parts[1]) if len(parts) > 1 and parts[1] != "" else 0
+    ni = int(parts[2]) if len(parts) > 2 and parts[2] != "" else 0
+    return vi, ni, ti
+
+
+def _parse_face_records(records):
+    """ decodes the f records into an array of face vertices with the columns vertex, normal
+        and texture coordinate index and the number of vertices of each face. Missing indices are 0.
+    """
+    records = [r.strip() for r in records]
+    sizes = np.array([r.count(" ") + 1 for r in records], dtype=np.int64)
+    n_components = records[0].split(" ", 1)[0].count("/") + 1
+    text = " ".join(records).replace("//", "/0/").replace("/", " ")
+    values = np.fromstring(text, dtype=np.int64, sep=" ")
+    n_face_vertices = np.sum(sizes)
+    face_vertices = np.zeros((n_face_vertices, 3), dtype=np.int64)
+    if len(values) == n_face_vertices * n_components:
+        values = values.reshape((-1, n_components))
+        face_vertices[:, 0] = values[:, 0]
+        if n_components > 1:
+            face_vertices[:, 2] = values[:, 1]
+        if n_components > 2:
+            face_vertices[:, 1] = values[:, 2]
+    else:
+        # the records contain repeated white space or the face vertex format changes within the file
+        tokens = [r.split() for r in records]
+        sizes = np.array([len(t) for t in tokens], dtype=np.int64)
+        face_vertices = np.array([_parse_face_vertex(v) for t in tokens for v in t], dtype=np.int64)
+    return face_vertices, sizes
+
+
+def _resolve_relative_indices(face_vertices, sizes, text):
+    """ replaces negative indices that refer to the records before the face by absolute indices"""
+    negative = face_vertices < 0
+    if not np.any(negative):
+        return face_vertices
+    counts = []
+    n_records = [0, 0, 0]
+    for line in text.splitlines():
+        tokens = line.split(None, 1)
+        if len(tokens) == 0:
             continue
+        if tokens[0] == "v":
+            n_records[0] += 1
+        elif tokens[0] == "vn":
+            n_records[1] += 1
+        elif tokens[0] == "vt":
+            n_records[2] += 1
+        elif tokens[0] == "f":
+            counts.append(list(n_records))
+    counts = np.repeat(np.array(counts, dtype=np.int64), sizes, axis=0)
+    face_vertices[negative] += counts[negative] + 1
+    return face_vertices
+
+
+def _triangulate_faces(face_vertices, sizes):
+    """ converts polygons into triangle fans and returns the triangles and the index of the first triangle of each face"""
+    n_triangles = sizes - 2
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    first_triangle = np.concatenate([[0], np.cumsum(n_triangles)])
+    face_idx = np.repeat(np.arange(len(sizes)), n_triangles)
+    k = np.arange(first_triangle[-1]) - first_triangle[face_idx] + 1
+    corners = np.stack([starts[face_idx], starts[face_idx] + k, starts[face_idx] + k + 1], axis=1)
+    return face_vertices[corners], first_triangle
 
-        if line[0] == 'o':
-            mesh_name = line[1]
-            mesh_desc = {"name": mesh_name, "faces": [], "vertices": [],
-                         "normals": [], "texture_coordinates": [],
-                         "face_groups": [], "shift_index": shift_index,
-                         "type": mesh_type, "material": "",
-                         "has_material": False}
-            mesh_list.append(mesh_desc)
-            m_idx += 1
-        elif line[0] == 'g':
-            if len(mesh_list[m_idx]["face_groups"]) > 0:
-                mesh_list[m_idx]["face_groups"][-1]["end"] = len(faces)
-            group = dict()
-            group["name"] = line[1]
-            group["material"] = latest_material
-            group["start"] = len(faces)
-            group["end"] = None
-            mesh_list[m_idx]["face_groups"].append(group)
-            face_group_idx += 1
-        elif line[0] == 'v':
-            if m_idx < 0:
-                continue
-            vertex = list(map(float, line[1:4]))
-            mesh_list[m_idx]["vertices"].append(vertex)
-        elif line[0] == 'vn':
-            if m_idx < 0:
-                continue
-            normal = list(map(float, line[1:4]))
-            if flip_normals:
-                normal = [-n for n in normal]
-            mesh_list[m_idx]["normals"].append(normal)
-        elif line[0] == 'vt':
-            if m_idx < 0:
-                continue
-            texture_coord = list(map(float, line[1:3]))
-            mesh_list[m_idx]["texture_coordinates"].append(texture_coord)
-        elif line[0] == 'f':
-            if m_idx < 0:
-                continue
-            face_vertex_list = []
-            i = 1
-            n_face_vertices = len(line)-1
-            while i < n_face_vertices+1:
-                face_vertex = line[i].split(split_symbol)
-                if len(face_vertex) == 2:
-                    vi = int(face_vertex[0])
-                    ti = -1
-                    ni = int(face_vertex[1])
-                else:
-                    vi = int(face_vertex[0])
-                    ti = int(face_vertex[1])
-                    ni = int(face_vertex[2])
-                face_vertex_list.append((vi, ni, ti))
-                i += 1
-            faces.append(face_vertex_list)
-        elif line[0] == "usemtl":
-            if m_idx < 0:
-                continue
-            mesh_list[m_idx]["material"] = line[1]
-            latest_material = line[1]
-        li += 1
-    print("loaded", len(mesh_list), "meshes")
 
-    if len(mesh_list) == 1:
-        # there is only one mesh defined so all
-        # faces belong to this mesh
-        mesh_list[0]["faces"] = faces
-        mesh_list[0]["type"] = "quads"
-        n_face_vertices = len(faces[0])
-        if n_face_vertices == 4:
-            mesh_list[0]["type"] = "quads"
-        else:
-            mesh_list[0]["type"] = "triangles"
+def load_meshes2(obj_file_lines, flip_normals=True, shift_index=True):
+    """ decodes the v, vn, vt and f records into shared NumPy arrays.
+        Each object, face group and material change becomes a mesh that refers to the shared vertex arrays
+        and to a slice of the shared face array with shape (n_faces, n_face_vertices, 3).
+    """
+    if isinstance(obj_file_lines, str):
+        text = obj_file_lines
+    elif len(obj_file_lines) > 0 and obj_file_lines[0].endswith("\n"):
+        text = "".join(obj_file_lines)
     else:
-        # there are multiple meshes so map faces
-        # to meshes based on vertex indices
-        mesh_list = map_faces_to_meshes(mesh_list, faces)
-
-    # if there are face groups defined for a mesh split it up
-    # into multiple meshes, one per face group
-    mesh_list = split_face_groups_to_meshes(mesh_list)
-
-    return mesh_list
-
-
+        text = "\n".join(obj_file_lines)
+    text = "\n" + text
+    if "\t" in text:
+        text = text.replace("\t", " ")
+    if "\n " in text:
+        text = re.sub(r"\n +", "\n", text)
+    v_records = V_PATTERN.findall(text)
+    vn_records = VN_PATTERN.findall(text)
+    vt_records = VT_PATTERN.findall(text)
+    # the faces are collected between the object, group and material statements to find the start of each segment
+    events = []
+    f_records = []
+    chunk_start = 0
+    for m in EVENT_PATTERN.finditer(text):
+        f_records += F_PATTERN.findall(text, chunk_start, m.start())
+        events.append((m.group(1), m.group(2).strip(), len(f_records)))
+        chunk_start = m.end()
+    f_records += F_PATTERN.findall(text, chunk_start)
+
+    vertices = _parse_float_records(v_records, 3)
+    normals = _parse_float_records(vn_records, 3)
+    if flip_normals:
+        normals = -normals
+    uvs = _parse_float_records(vt_records, 2)
+    if len(f_records) == 0:
+        print("loaded", 0, "meshes")
+        return []
 
+    face_vertices, sizes = _parse_face_records(f_records)
+    face_vertices = _resolve_relative_indices(face_vertices, sizes, text)
+    if shift_index:
+        # 0 is only a valid index for files with 0-based indices
+        face_vertices[:, 1:][face_vertices[:, 1:] == 0] = MISSING_INDEX
+    n_face_vertices = sizes[0]
+    if np.all(sizes == n_face_vertices) and n_face_vertices <= 4:
+        faces = face_vertices.reshape((-1, n_face_vertices, 3))
+        face_offsets = np.arange(len(sizes) + 1)
+    else:
+        faces, face_offsets = _triangulate_faces(face_vertices, sizes)
+        n_face_vertices = 3
+    mesh_type = "quads" if n_face_vertices == 4 else "triangles"
+
+    # split the faces into segments at each object, group and material change
+    segments = [{"name": "default", "material": "", "start": 0}]
+    name = "default"
+    material = ""
+    for keyword, value, face_idx in events:
+        if keyword == "usemtl":
+            material = value
+        else:
+            name = value
+        if segments[-1]["start"] == face_idx:
+            segments[-1]["name"] = name
+            segments[-1]["material"] = material
+        else:
+            segments.append({"name": name, "material": material, "start": face_idx})
 
-def map_faces_to_meshes(mesh_list, faces):
-    v_index_list = []
-    n_index_list = []
-    t_index_list = []
-    v_offset = 0
-    n_offset = 0
-    t_offset = 0
-    #calculate index offset for each mesh
-    for m in mesh_list:
-        n_vertices = len(m["vertices"])
-        n_normals = len(m["normals"])
-        n_texture_coords = len(m["texture_coordinates"])
-
-        v_index_list.append((v_offset, v_offset + n_vertices))
-        n_index_list.append((n_offset, n_offset + n_normals))
-        t_index_list.append((t_offset, t_offset + n_texture_coords))
-
-        v_offset += n_vertices
-        n_offset += n_normals
-        t_offset += n_texture_coords
-
-    #substract offset from indices
-    for face in faces:
-        #find mesh index
-        mesh_idx = -1
-        for idx, mesh_vertex_range in enumerate(v_index_list):
-            v1 = face[0]
-            if mesh_vertex_range[0] <= v1[0] < mesh_vertex_range[1]:
-                mesh_idx = idx
-        #assign to mesh
-        if mesh_idx > 0:
-            v_index_offset = v_index_list[mesh_idx][0]
-            n_index_offset = n_index_list[mesh_idx][0]
-            t_index_offset = t_index_list[mesh_idx][0]
-            n_face_vertices = len(face)
-            new_face = np.zeros((n_face_vertices, 3), dtype=int)
-            for v_idx, v in enumerate(face):
-                new_face[v_idx][0] = v[0] - v_index_offset
-                new_face[v_idx][1] = v[1] - n_index_offset
-                new_face[v_idx][2] = v[2] - t_index_offset
-
-            mesh_list[mesh_idx]["faces"].append(new_face.tolist())
-
-            if n_face_vertices == 4:
-                mesh_list[mesh_idx]["type"] = "quads"
-            else:
-                mesh_list[mesh_idx]["type"] = "triangles"
+    # normals and texture coordinates that are not referenced by the faces are dropped
+    if not np.any(faces[..., 1] >= 0):
+        normals = normals[:0]
+    if not np.any(faces[..., 2] >= 0):
+        uvs = uvs[:0]
+    mesh_list = []
+    for idx, segment in enumerate(segments):
+        start = face_offsets[segment["start"]]
+        end = len(faces)
+        if idx + 1 < len(segments):
+            end = face_offsets[segments[idx + 1]["start"]]
+        if start == end:
+            continue
+        mesh_list.append({"name": segment["name"], "faces": faces[start:end],
+                          "vertices": vertices, "normals": normals,
+                          "texture_coordinates": uvs,
+                          "face_groups": [], "shift_index": shift_index,
+                          "type": mesh_type, "material": segment["material"],
+                          "has_material": segment["material"] != ""})
+    print("loaded", len(mesh_list), "meshes")
     return mesh_list
 
-def split_face_groups_to_meshes(mesh_list):
-    print("split meshes", len(mesh_list))
-    new_meshes = []
-    for mesh in mesh_list:
-        mesh_list.remove(mesh)
-        if len(mesh["face_groups"]) > 0:
-            for face_group in mesh["face_groups"]:
-                new_mesh = {"name": face_group["name"],
-                            "faces": [],
-                            "vertices": [],
-                            "normals": [],
-                            "texture_coordinates": [],
-                            "face_groups": [],
-                            "shift_index": mesh["shift_index"],
-                            "type": mesh["type"],
-                            "material": face_group["material"],
-                            "has_material": True}
-                print("create new mesh ", face_group["start"], face_group["end"], len(mesh["faces"]))
-                if face_group["end"] is None:
-                    face_group["end"] = len(mesh["faces"])
-                for f_idx in range(face_group["start"], face_group["end"]):
-                    new_mesh["faces"].append(mesh["faces"][f_idx])
-                    #for vertex in mesh["faces"][f_idx]:
-                    #    new_mesh["vertices"].append(mesh["vertices"][vertex[0]])
-                    #    new_mesh["normals"].append(mesh["normals"][vertex[1]])
-                    #    new_mesh["texture_coordinates"].append(mesh["texture_coordinates"][vertex[2]])
-
-                new_mesh["vertices"] = copy(mesh["vertices"])
-                new_mesh["normals"] = copy(mesh["normals"])
-                new_mesh["texture_coordinates"] = copy(mesh["texture_coordinates"])
-                new_meshes.append(new_mesh)
-
-    return mesh_list + new_meshes
-
 
 def load_image(root_dir, line):
     texture_path = line[1][:-1]
@@ -36,6 +36,7 @@ from .graphics.console import IMGUIConsole
 from .graphics.renderer.main_renderer import MainRenderer
 from .graphics.plot_manager import PlotManager
 from .app_base import AppBase, DEFAULT_CLEAR_COLOR
+from .profiling import Profiler
 from .glut_app import CameraController
 
 
@@ -114,6 +115,7 @@ class LeanGLUTApp(AppBase):
         self.render(dt)
         self.next_time = self.last_time + self.interval
         self.scene.global_vars["fps"] = fps
+        Profiler.next_frame()
         #print(fps)
 
     def update_scene(self, dt):
@@ -157,7 +159,13 @@ class LeanGLUTApp(AppBase):
     def run(self):
         # Run the GLUT main loop until the user closes the window.
         print("run")
-        glutMainLoop()
+        self.is_running = True
+        glutSetOption(GLUT_ACTION_ON_WINDOW_CLOSE, GLUT_ACTION_GLUTMAINLOOP_RETURNS)
+        glutCloseFunc(self.stop)
+        try:
+            glutMainLoop()
+        finally:
+            self.stop()
 
     def keyboard(self, key, x, y):
         for t in self.keyboard_handler.values():
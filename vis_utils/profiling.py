@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import time
+import json
+import threading
+import numpy as np
+
+UPDATE_PHASES = ["before_update", "sim", "update", "after_update", "render"]
+DEFAULT_TIMING_BUFFER_SIZE = 120
+
+
+class PhaseTimings(object):
+    """ Ring buffer that stores the duration in seconds of each phase of the last n frames.
+    """
+    def __init__(self, phases=None, size=DEFAULT_TIMING_BUFFER_SIZE):
+        if phases is None:
+            phases = UPDATE_PHASES
+        self.phases = list(phases)
+        self.size = size
+        self._phase_indices = {p: idx for idx, p in enumerate(self.phases)}
+        self._buffer = np.zeros((len(self.phases), size))
+        self._write_idx = np.zeros(len(self.phases), dtype=int)
+        self._counts = np.zeros(len(self.phases), dtype=int)
+
+    def add(self, phase, duration):
+        p_idx = self._phase_indices[phase]
+        self._buffer[p_idx, self._write_idx[p_idx]] = duration
+        self._write_idx[p_idx] = (self._write_idx[p_idx] + 1) % self.size
+        self._counts[p_idx] = min(self._counts[p_idx] + 1, self.size)
+
+    def get_values(self, phase):
+        """ returns the stored durations of a phase from oldest to newest"""
+        p_idx = self._phase_indices[phase]
+        n = self._counts[p_idx]
+        if n < self.size:
+            return np.array(self._buffer[p_idx, :n])
+        return np.roll(self._buffer[p_idx], -self._write_idx[p_idx])
+
+    def get_mean(self, phase):
+        values = self.get_values(phase)
+        if len(values) == 0:
+            return 0.0
+        return float(np.mean(values))
+
+    def get_max(self, phase):
+        values = self.get_values(phase)
+        if len(values) == 0:
+            return 0.0
+        return float(np.max(values))
+
+    def get_summary(self):
+        """ returns a dict with mean and max duration in milliseconds for each phase"""
+        summary = dict()
+        for phase in self.phases:
+            summary[phase] = {"mean": self.get_mean(phase) * 1000, "max": self.get_max(phase) * 1000}
+        return summary
+
+    def reset(self):
+        self._buffer[:] = 0
+        self._write_idx[:] = 0
+        self._counts[:] = 0
+
+    def __str__(self):
+        return " ".join(["%s %.2fms" % (phase, self.get_mean(phase) * 1000) for phase in self.phases])
+
+
+class PhaseTimer(object):
+    """ context manager that adds the duration of a block to a PhaseTimings buffer """
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timings.add(self.phase, time.perf_counter() - self.start)
+
+
+class RingBuffer(object):
+    """ fixed size buffer of the last n values of a series """
+    def __init__(self, size=DEFAULT_TIMING_BUFFER_SIZE):
+        self.size = size
+        self._buffer = np.zeros(size)
+        self._write_idx = 0
+        self._count = 0
+
+    def append(self, value):
+        self._buffer[self._write_idx] = value
+        self._write_idx = (self._write_idx + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def get_values(self):
+        if self._count < self.size:
+            return np.array(self._buffer[:self._count])
+        return np.roll(self._buffer, -self._write_idx)
+
+    def get_percentiles(self, q):
+        if self._count == 0:
+            return np.zeros(len(q))
+        return np.percentile(self._buffer[:self._count], q)
+
+    def __len__(self):
+        return self._count
+
+
+class _NullScope(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class _ProfilerScope(object):
+    def __init__(self, category, name):
+        self.category = category
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        Profiler.add_timing(self.category, self.name, self.start)
+        return False
+
+
+NULL_SCOPE = _NullScope()
+DEFAULT_PERCENTILES = (50, 95, 99)
+DEFAULT_MAX_TRACE_EVENTS = 1000000
+
+
+class Profiler(object):
+    """ Opt-in instrumentation of component updates, renderers and GL calls.
+        The state is stored in class attributes so instrumented code only has to check Profiler.active.
+        Durations and counters are summed per frame and the frame sums are kept in ring buffers
+        to get rolling percentiles. Optionally every timing is recorded as Chrome trace event.
+        The render and update threads share the state, so it is only changed while holding _lock.
+    """
+    active = False
+    record_trace = False
+    window_size = DEFAULT_TIMING_BUFFER_SIZE
+    max_trace_events = DEFAULT_MAX_TRACE_EVENTS
+    _frame_timings = dict()
+    _frame_counters = dict()
+    _timing_history = dict()
+    _counter_history = dict()
+    _trace_events = []
+    _start_time = time.perf_counter()
+    _lock = threading.Lock()
+    frame_idx = 0
+
+    @classmethod
+    def enable(cls, record_trace=False, window_size=DEFAULT_TIMING_BUFFER_SIZE):
+        cls.reset()
+        cls.record_trace = record_trace
+        cls.window_size = window_size
+        cls.active = True
+
+    @classmethod
+    def disable(cls):
+        cls.active = False
+
+    @classmethod
+    def toggle(cls):
+        if cls.active:
+            cls.disable()
+        else:
+            cls.enable(cls.record_trace, cls.window_size)
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._frame_timings = dict()
+            cls._frame_counters = dict()
+            cls._timing_history = dict()
+            cls._counter_history = dict()
+            cls._trace_events = []
+            cls._start_time = time.perf_counter()
+            cls.frame_idx = 0
+
+    @classmethod
+    def scope(cls, name, category="render"):
+        """ returns a context manager that measures the duration of a block """
+        if not cls.active:
+            return NULL_SCOPE
+        return _ProfilerScope(category, name)
+
+    @classmethod
+    def add_timing(cls, category, name, start):
+        end = time.perf_counter()
+        key = category + ":" + name
+        with cls._lock:
+            cls._frame_timings[key] = cls._frame_timings.get(key, 0.0) + end - start
+            if cls.record_trace and len(cls._trace_events) < cls.max_trace_events:
+                cls._trace_events.append({"name": name, "cat": category, "ph": "X",
+                                          "ts": (start - cls._start_time) * 1e6,
+                                          "dur": (end - start) * 1e6,
+                                          "pid": 0, "tid": threading.get_ident()})
+
+    @classmethod
+    def add_component_timing(cls, phase, scene_object, component_name, start):
+        label = scene_object.name
+        if label == "":
+            label = str(scene_object.node_id)
+        cls.add_timing(phase, label + "." + component_name, start)
+
+    @classmethod
+    def count(cls, key, n=1):
+        with cls._lock:
+            cls._frame_counters[key] = cls._frame_counters.get(key, 0) + n
+
+    @classmethod
+    def next_frame(cls):
+        """ moves the sums of the current frame into the history """
+        if not cls.active:
+            return
+        with cls._lock:
+            frame_timings = cls._frame_timings
+            frame_counters = cls._frame_counters
+            cls._frame_timings = dict()
+            cls._frame_counters = dict()
+            for key, value in frame_timings.items():
+                if key not in cls._timing_history:
+                    cls._timing_history[key] = RingBuffer(cls.window_size)
+                cls._timing_history[key].append(value)
+            for key in set(cls._counter_history.keys()).union(frame_counters.keys()):
+                if key not in cls._counter_history:
+                    cls._counter_history[key] = RingBuffer(cls.window_size)
+                cls._counter_history[key].append(frame_counters.get(key, 0))
+            if cls.record_trace and len(cls._trace_events) < cls.max_trace_events:
+                ts = (time.perf_counter() - cls._start_time) * 1e6
+                for key, value in frame_counters.items():
+                    cls._trace_events.append({"name": key, "ph": "C", "ts": ts, "pid": 0,
+                                              "args": {"value": value}})
+            cls.frame_idx += 1
+
+    @classmethod
+    def get_timing_report(cls, q=DEFAULT_PERCENTILES):
+        """ returns a list of tuples with the key and the percentiles in milliseconds sorted by the highest percentile """
+        report = []
+        with cls._lock:
+            for key, buffer in cls._timing_history.items():
+                report.append((key, buffer.get_percentiles(q) * 1000))
+        report.sort(key=lambda x: -x[1][-1])
+        return report
+
+    @classmethod
+    def get_counter_report(cls, q=DEFAULT_PERCENTILES):
+        report = []
+        with cls._lock:
+            for key, buffer in cls._counter_history.items():
+                report.append((key, buffer.get_percentiles(q)))
+        report.sort(key=lambda x: x[0])
+        return report
+
+    @classmethod
+    def export_chrome_trace(cls, filename):
+        """ writes the recorded events in the Chrome trace event format that can be opened with chrome://tracing """
+        with cls._lock:
+            trace_events = list(cls._trace_events)
+        with open(filename, "wt") as out_file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, out_file)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+""" https://docs.python.org/3/library/concurrent.futures.html
+"""
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from PIL import Image
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIME_BUDGET = 0.004
+
+
+def decode_images(data):
+    """ forces the decoding of all lazily opened PIL images in nested dicts and lists """
+    if isinstance(data, Image.Image):
+        data.load()
+    elif isinstance(data, dict):
+        for value in data.values():
+            decode_images(value)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            decode_images(value)
+    return data
+
+
+class FileLoadJob(object):
+    def __init__(self, file_path, create_method, kwargs, data_future, result):
+        self.file_path = file_path
+        self.create_method = create_method
+        self.kwargs = kwargs
+        self.data_future = data_future
+        self.result = result
+        self.scene_object = None
+        self.visible = True
+        self.pending_meshes = deque()
+
+
+class AsyncFileLoader(object):
+    """ Parses files on a worker pool and creates the scene objects on the main thread.
+        The creation of scene objects and the upload of their meshes is split into slices that are executed by update
+        until the time budget of the frame is used up, so large files do not block the rendering.
+        A scene object is hidden until all of its meshes are uploaded.
+    """
+    def __init__(self, builder, max_workers=DEFAULT_MAX_WORKERS, time_budget=DEFAULT_TIME_BUDGET):
+        self.builder = builder
+        self.time_budget = time_budget
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.jobs = deque()
+
+    @property
+    def n_pending(self):
+        return len(self.jobs)
+
+    def load_file(self, file_path, load_method, create_method, **kwargs):
+        """ load_method(file_path, **kwargs) runs on a worker thread and must not use OpenGL or the scene
+            create_method(builder, data, file_path, **kwargs) runs on the main thread and returns the scene object
+            returns a future of the scene object that is resolved on the main thread
+        """
+        data_future = self.executor.submit(self._run_load_method, load_method, file_path, kwargs)
+        result = Future()
+        result.set_running_or_notify_cancel()
+        self.jobs.append(FileLoadJob(file_path, create_method, kwargs, data_future, result))
+        return result
+
+    def call_on_main_thread(self, file_path, create_method, **kwargs):
+        """ schedules a synchronous file handler create_method(builder, file_path, **kwargs) as one slice """
+        data_future = Future()
+        data_future.set_result(file_path)
+        result = Future()
+        result.set_running_or_notify_cancel()
+        job = FileLoadJob(file_path, lambda builder, data, path, **kw: create_method(builder, path, **kw),
+                          kwargs, data_future, result)
+        self.jobs.append(job)
+        return result
+
+    def _run_load_method(self, load_method, file_path, kwargs):
+        return decode_images(load_method(file_path, **kwargs))
+
+    def update(self, time_budget=None):
+        """ executes slices of the finished jobs in the order of submission until the time budget is used up.
+            should be called once per frame from the thread that owns the OpenGL context
+        """
+        if time_budget is None:
+            time_budget = self.time_budget
+        start = time.perf_counter()
+        while time.perf_counter() - start < time_budget:
+            job = self._get_next_ready_job()
+            if job is None:
+                break
+            self._execute_slice(job)
+
+    def _get_next_ready_job(self):
+        for job in self.jobs:
+            if job.data_future.done():
+                return job
+        return None
+
+    def _execute_slice(self, job):
+        try:
+            if job.scene_object is None:
+                self._create_scene_object(job)
+            elif len(job.pending_meshes) > 0:
+                job.pending_meshes.popleft().upload()
+            if job.scene_object is None or len(job.pending_meshes) == 0:
+                self._finish(job)
+        except Exception as e:
+            print("Error: failed to load", job.file_path)
+            traceback.print_exc()
+            self.jobs.remove(job)
+            job.result.set_exception(e)
+
+    def _create_scene_object(self, job):
+        data = job.data_future.result()
+        if data is None:
+            return
+        job.scene_object = job.create_method(self.builder, data, job.file_path, **job.kwargs)
+        if job.scene_object is not None:
+            job.visible = job.scene_object.visible
+            job.scene_object.visible = False
+            job.pending_meshes.extend(job.scene_object.get_meshes())
+
+    def _finish(self, job):
+        self.jobs.remove(job)
+        if job.scene_object is not None:
+            job.scene_object.visible = job.visible
+        job.result.set_result(job.scene_object)
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait)
@@ -3,4 +3,5 @@ from .component_base import ComponentBase
 from .geometry_data import GeometryDataComponent
 from .static_mesh import StaticMesh
 from .terrain_component import TerrainComponent
-from .light_component import LightComponent
\ No newline at end of file
+from .light_component import LightComponent
+from .constraint_set import ConstraintSetComponent
\ No newline at end of file
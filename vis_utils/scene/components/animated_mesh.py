@@ -27,12 +27,11 @@ from .component_base import ComponentBase
 from ...graphics import materials
 from ...graphics import renderer
 from ...graphics.material_manager import MaterialManager
-from ...graphics.materials import TextureMaterial
+from ...graphics.bone_palette import BonePalette, AnimationTexture
 
 SKELETON_NODE_TYPE_ROOT = 0
 SKELETON_NODE_TYPE_JOINT = 1
 SKELETON_NODE_TYPE_END_SITE = 2
-MAX_BONES = 150
 
 
 
@@ -40,6 +39,41 @@ RENDER_MODE_NONE = 0
 RENDER_MODE_STANDARD = 1
 RENDER_MODE_NORMAL_MAP = 2
 RENDER_MODES = [RENDER_MODE_NONE, RENDER_MODE_STANDARD, RENDER_MODE_NORMAL_MAP]
+DEFAULT_N_LODS = 3
+
+
+def create_meshes_from_desc(mesh_list, n_lods=DEFAULT_N_LODS):
+    """ creates skinned meshes from the mesh descriptions of a model and shares the texture materials"""
+    meshes = []
+    material_manager = MaterialManager()
+    for m_desc in mesh_list:
+        geom = None
+        if "material" in m_desc:
+            material = None
+            if "Kd" in m_desc["material"]:
+                texture_name = m_desc["texture"]
+                if texture_name is not None and texture_name.endswith(b'Hair_texture_big.png'):
+                    continue
+                material = material_manager.get_texture_material(m_desc["material"]["Kd"])
+            elif "albedo_texture" in m_desc["material"]:
+                material = material_manager.get_texture_material(m_desc["material"]["albedo_texture"])
+
+            #geom = Mesh.build_legacy_animated_mesh(m_desc, material)
+            geom = Mesh.build_from_desc(m_desc, material)
+        else:
+            geom = Mesh.build_from_desc(m_desc, materials.red)
+        if geom is not None:
+            geom.generate_lods(n_lods)
+            meshes.append(geom)
+    return meshes
+
+
+def get_inv_bind_poses(skeleton_def):
+    """ returns the inverse bind poses of the animated joints with shape (n_joints, 4, 4)"""
+    inv_bind_poses = []
+    for name in skeleton_def["animated_joints"]:
+        inv_bind_poses.append(skeleton_def["nodes"][name]["inv_bind_pose"])
+    return np.array(inv_bind_poses, dtype=np.float64).reshape((-1, 4, 4))
 
 
 class AnimatedMeshComponent(ComponentBase):
@@ -48,35 +82,15 @@ class AnimatedMeshComponent(ComponentBase):
         self._scene_object = scene_object
         self.anim_controller = scene_object._components[animation_source]
         self.render_mode = RENDER_MODE_STANDARD
-        self.meshes = []
-
-        material_manager = MaterialManager()
-
-        for m_desc in mesh_list:
-            geom = None
-            if "material" in m_desc:
-                material = None
-                if "Kd" in m_desc["material"]:
-                    texture_name = m_desc["texture"]
-                    if texture_name is not None and texture_name.endswith(b'Hair_texture_big.png'):
-                        continue
-                    material = material_manager.get(m_desc["texture"])
-                    if material is None:
-                        material = materials.TextureMaterial.from_image(m_desc["material"]["Kd"])
-                        material_manager.set(m_desc["texture"], material)
-                elif "albedo_texture" in m_desc["material"]:
-                    material = TextureMaterial.from_image(m_desc["material"]["albedo_texture"])
-                
-                #geom = Mesh.build_legacy_animated_mesh(m_desc, material)
-                geom = Mesh.build_from_desc(m_desc, material)
-            else:
-                geom = Mesh.build_from_desc(m_desc, materials.red)
-            if geom is not None:
-                self.meshes.append(geom)
-        self.inv_bind_poses = []
-        for idx, name in enumerate(skeleton_def["animated_joints"]):
-             inv_bind_pose = skeleton_def["nodes"][name]["inv_bind_pose"]
-             self.inv_bind_poses.append(inv_bind_pose)
+        self.meshes = create_meshes_from_desc(mesh_list)
+        self.inv_bind_poses = get_inv_bind_poses(skeleton_def)
+        self._bone_matrices = None
+        self.bone_palette = None
+        self._palette_is_dirty = True
+        self.animation_texture = None
+        self._baked_matrices = None
+        self._baked_frame_time = 1.0
+        self._animation_texture_is_dirty = True
         self.vertex_weight_info = [] # store for each vertex a list of tuples with bone id and weights
         for idx, m in enumerate(mesh_list):
             self.vertex_weight_info.append(mesh_list[idx]["weights"])
@@ -86,21 +100,93 @@ class AnimatedMeshComponent(ComponentBase):
     def update(self, dt):
         return
 
-    def get_bone_matrices(self):
+    def after_update(self, dt):
+        """ the skinning matrices are calculated once per frame after the animation controller was updated"""
+        if self.uses_baked_animation():
+            return
+        self._bone_matrices = self.calculate_bone_matrices()
+        self._palette_is_dirty = True
+
+    def calculate_bone_matrices(self):
         matrices = np.array(self.anim_controller.get_bone_matrices())
-        for idx, inv_m in enumerate(self.inv_bind_poses):
-            matrices[idx] = np.dot(matrices[idx],inv_m)
+        n_bones = min(len(matrices), len(self.inv_bind_poses))
+        matrices[:n_bones] = np.einsum("nij,njk->nik", matrices[:n_bones], self.inv_bind_poses[:n_bones])
         return matrices
 
+    def get_bone_matrices(self):
+        if self._bone_matrices is None:
+            self._bone_matrices = self.calculate_bone_matrices()
+        return self._bone_matrices
+
+    def get_bone_palette(self):
+        """ returns the bone palette shared by the main, shadow and picking passes.
+            The matrices are uploaded by the first pass of the frame that needs them.
+        """
+        if self.bone_palette is None:
+            self.bone_palette = BonePalette()
+        if self._palette_is_dirty:
+            self.bone_palette.upload(self.get_bone_matrices())
+            self._palette_is_dirty = False
+        return self.bone_palette
+
+    def bake_animation(self):
+        """ bakes the skinning matrices of all frames of the clip of the animation controller into an animation texture.
+            While the controller uses the baked animation, the shader interpolates the skinning matrices
+            and only the current frame is set per draw call.
+        """
+        matrices = self.anim_controller.bake_global_matrices()
+        n_bones = min(matrices.shape[1], len(self.inv_bind_poses))
+        matrices[:, :n_bones] = np.matmul(matrices[:, :n_bones], self.inv_bind_poses[None, :n_bones])
+        self.set_baked_animation(matrices, self.anim_controller.get_frame_time())
+        self.anim_controller.use_baked_animation = True
+
+    def set_baked_animation(self, matrices, frame_time):
+        """ matrices: skinning matrices with shape (n_frames, n_bones, 4, 4) e.g. loaded from a file created offline"""
+        self._baked_matrices = np.array(matrices, dtype=np.float64)
+        self._baked_frame_time = frame_time
+        self._animation_texture_is_dirty = True
+
+    def clear_baked_animation(self):
+        self._baked_matrices = None
+        self.anim_controller.use_baked_animation = False
+        self._palette_is_dirty = True
+
+    def uses_baked_animation(self):
+        return self._baked_matrices is not None and self.anim_controller.uses_baked_animation()
+
+    def get_animation_texture(self):
+        if self.animation_texture is None:
+            self.animation_texture = AnimationTexture()
+        if self._animation_texture_is_dirty:
+            self.animation_texture.upload_frames(self._baked_matrices, self._baked_frame_time)
+            self._animation_texture_is_dirty = False
+        return self.animation_texture
+
     def scale_mesh(self, scale_factor):
         for m in self.meshes:
             m.scale(scale_factor)
-        for idx, m in enumerate(self.inv_bind_poses):
-            self.inv_bind_poses[idx][:3, 3] *= scale_factor
+        self.inv_bind_poses[:, :3, 3] *= scale_factor
+        self._bone_matrices = None
+        self._palette_is_dirty = True
+        if self._baked_matrices is not None:
+            # the baked matrices may have been loaded from a file, so they are scaled instead of baked again
+            self._baked_matrices[:, :, :3, 3] *= scale_factor
+            self._animation_texture_is_dirty = True
 
     def prepare_rendering(self, renderer):
-        bone_matrices = self.get_bone_matrices()
-        renderer.upload_bone_matrices(bone_matrices)#  bone matrices once
+        if self.uses_baked_animation():
+            frame, root_matrix = self.anim_controller.get_baked_animation_state()
+            renderer.bind_animation_texture(self.get_animation_texture(), frame, root_matrix)
+        else:
+            renderer.bind_bone_palette(self.get_bone_palette())
+
+    def cleanup(self):
+        if self.bone_palette is not None:
+            self.bone_palette.cleanup()
+            self.bone_palette = None
+        if self.animation_texture is not None:
+            self.animation_texture.cleanup()
+            self.animation_texture = None
 
     def get_meshes(self):
         return self.meshes
@@ -23,10 +23,18 @@
 
 
 class ComponentBase(object):
+    # True if update only changes the own scene object and emits no signals, so it can run on a worker thread
+    parallel_update = False
+
     def __init__(self, scene_object):
         self.scene_object = scene_object
         self.visible = True
 
+    @classmethod
+    def implements_hook(cls, hook):
+        """ returns True if the class overrides the empty hook of the base class """
+        return getattr(cls, hook, None) is not getattr(ComponentBase, hook, None)
+
     def update(self, dt):
         pass
 
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
+from .component_base import ComponentBase
+from ...graphics.geometry.primitive_manager import PrimitiveManager
+from ...graphics.instance_buffer import InstanceBuffer
+from ...graphics.materials import Material
+
+
+class ConstraintSetComponent(ComponentBase):
+    """ Stores the positions, radii and colors of many constraint markers in arrays and draws them
+        as instances of one shared unit sphere. Single markers can be selected using a ray.
+    """
+    def __init__(self, scene_object, slices=20, stacks=20):
+        ComponentBase.__init__(self, scene_object)
+        self._scene_object = scene_object
+        self.material = Material()
+        self.material.ambient_color = np.array([0.3, 0.3, 0.3])
+        self.material.diffuse_color = np.array([1.0, 1.0, 1.0])
+        self.meshes = [PrimitiveManager().get_geometry("sphere", slices, stacks, 2.0, material=self.material)]
+        self.positions = np.zeros((0, 3))
+        self.radii = np.zeros(0)
+        self.colors = np.zeros((0, 3))
+        self.names = []
+        self.selected_index = -1
+        self.instance_buffer = None
+        self._is_dirty = True
+
+    @property
+    def n_constraints(self):
+        return len(self.positions)
+
+    def add_constraint(self, position, radius=1.0, color=(0, 0, 1), name=""):
+        self.add_constraints([position], [radius], [color], [name])
+        return self.n_constraints - 1
+
+    def add_constraints(self, positions, radii=1.0, colors=(0, 0, 1), names=None):
+        """ positions: array with shape (n, 3)
+            radii: scalar or array with shape (n,)
+            colors: rgb color or array with shape (n, 3)
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape((-1, 3))
+        n = len(positions)
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), (n,))
+        colors = np.broadcast_to(np.asarray(colors, dtype=np.float64)[..., :3], (n, 3))
+        if names is None:
+            names = [""] * n
+        self.positions = np.vstack([self.positions, positions])
+        self.radii = np.concatenate([self.radii, radii])
+        self.colors = np.vstack([self.colors, colors])
+        self.names += list(names)
+        self._is_dirty = True
+
+    def remove_constraint(self, index):
+        self.positions = np.delete(self.positions, index, axis=0)
+        self.radii = np.delete(self.radii, index)
+        self.colors = np.delete(self.colors, index, axis=0)
+        del self.names[index]
+        if self.selected_index == index:
+            self.selected_index = -1
+        elif self.selected_index > index:
+            self.selected_index -= 1
+        self._is_dirty = True
+
+    def set_position(self, index, position):
+        self.positions[index] = position
+        self._is_dirty = True
+
+    def set_radius(self, index, radius):
+        self.radii[index] = radius
+        self._is_dirty = True
+
+    def set_color(self, index, color):
+        self.colors[index] = color[:3]
+        self._is_dirty = True
+
+    def get_instance_buffer(self):
+        """ uploads the arrays if they were changed since the last call """
+        if self.instance_buffer is None:
+            self.instance_buffer = InstanceBuffer()
+        if self._is_dirty:
+            offsets = np.column_stack([self.positions, self.radii])
+            colors = np.column_stack([self.colors, np.ones(self.n_constraints)])
+            self.instance_buffer.upload(offsets, colors)
+            self._is_dirty = False
+        return self.instance_buffer
+
+    def get_global_positions(self):
+        m = self._scene_object.getGlobalTransformation()
+        return np.dot(self.positions, m[:3, :3]) + m[3, :3]
+
+    def intersect_ray(self, ray_start, ray_dir):
+        """ returns the index of the closest marker hit by the ray or -1 """
+        if self.n_constraints == 0:
+            return -1
+        ray_start = np.asarray(ray_start, dtype=np.float64)[:3]
+        ray_dir = np.asarray(ray_dir, dtype=np.float64)[:3]
+        ray_dir = ray_dir / np.linalg.norm(ray_dir)
+        m = self._scene_object.getGlobalTransformation()
+        radii = self.radii * np.linalg.norm(m[0, :3])
+        delta = self.get_global_positions() - ray_start
+        t = np.dot(delta, ray_dir)
+        distance_sq = np.sum(delta * delta, axis=1) - t * t
+        hit = (distance_sq <= radii * radii) & (t >= 0)
+        if not np.any(hit):
+            return -1
+        t_hit = t - np.sqrt(np.maximum(radii * radii - distance_sq, 0))
+        return int(np.argmin(np.where(hit, t_hit, np.inf)))
+
+    def select(self, ray_start, ray_dir):
+        self.selected_index = self.intersect_ray(ray_start, ray_dir)
+        return self.selected_index
+
+    def get_selected_position(self):
+        if self.selected_index < 0:
+            return None
+        return self.get_global_positions()[self.selected_index]
+
+    def cleanup(self):
+        if self.instance_buffer is not None:
+            self.instance_buffer.cleanup()
+            self.instance_buffer = None
+        self._is_dirty = True
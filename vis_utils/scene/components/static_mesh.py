@@ -20,14 +20,128 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
 from ...graphics.geometry.mesh import Mesh
 from .component_base import ComponentBase
+from ..scene_object import SceneObject
 from ...graphics import materials
 from ...graphics.material_manager import MaterialManager
 
+DEFAULT_N_LODS = 3
+
+
+def get_batch_key(mesh):
+    """ meshes can be merged if they share the material and the vertex layout """
+    return (id(mesh.material), mesh.array_type, mesh.stride, mesh.normal_pos, mesh.color_pos, mesh.uv_pos)
+
+
+def transform_vertices(vertices, mesh, transformation):
+    """ applies a row major transformation to the positions and normals of an interleaved vertex array """
+    vertices = np.array(vertices, dtype=np.float32)
+    m = np.asarray(transformation, dtype=np.float64)
+    vertices[:, :3] = np.dot(vertices[:, :3], m[:3, :3]) + m[3, :3]
+    if mesh.has_normal():
+        n_start = mesh.normal_pos // 4
+        normals = np.dot(vertices[:, n_start:n_start+3], np.linalg.inv(m[:3, :3]).T)
+        lengths = np.linalg.norm(normals, axis=1)
+        lengths[lengths == 0] = 1.0
+        vertices[:, n_start:n_start+3] = normals / lengths[:, None]
+    return vertices
+
+
+def batch_meshes(meshes, transformations=None, sources=None):
+    """ merges meshes with the same material into one indexed mesh per material to reduce the draw calls.
+        transformations: optional matrices that are applied to the vertices of each mesh
+        sources: optional labels of the meshes that are stored with the index range of each submesh
+        Skinned meshes are returned unchanged. Each batched mesh has a list ranges of dicts with the
+        start and count of the indices of a submesh and its source label.
+    """
+    if sources is None:
+        sources = list(range(len(meshes)))
+    groups = dict()
+    result = []
+    for idx, mesh in enumerate(meshes):
+        if mesh.has_weights() or mesh.get_num_vertices() == 0:
+            result.append(mesh)
+            continue
+        key = get_batch_key(mesh)
+        if key not in groups:
+            groups[key] = []
+        groups[key].append(idx)
+    for key, mesh_indices in groups.items():
+        vertex_arrays = []
+        index_arrays = []
+        ranges = []
+        n_vertices = 0
+        n_indices = 0
+        for idx in mesh_indices:
+            mesh = meshes[idx]
+            vertices = np.asarray(mesh.vertex_list, dtype=np.float32)
+            if transformations is not None:
+                vertices = transform_vertices(vertices, mesh, transformations[idx])
+            if mesh.index_list is not None:
+                indices = np.asarray(mesh.index_list, dtype=np.uint32).ravel()
+            else:
+                indices = np.arange(len(vertices), dtype=np.uint32)
+            vertex_arrays.append(vertices)
+            index_arrays.append(indices + n_vertices)
+            ranges.append({"start": n_indices, "count": len(indices), "source": sources[idx]})
+            n_vertices += len(vertices)
+            n_indices += len(indices)
+        mesh = meshes[mesh_indices[0]]
+        batch = Mesh(np.vstack(vertex_arrays), mesh.array_type, normal_pos=mesh.normal_pos, color_pos=mesh.color_pos,
+                     uv_pos=mesh.uv_pos, weight_pos=-1, bone_id_pos=-1, stride=mesh.stride,
+                     index_list=np.concatenate(index_arrays), material=mesh.material)
+        batch.ranges = ranges
+        result.append(batch)
+    return result
+
+
+def find_submesh(batch, index):
+    """ returns the source label of the submesh that contains the given position in the index buffer """
+    if not hasattr(batch, "ranges"):
+        return None
+    starts = [r["start"] for r in batch.ranges]
+    r = batch.ranges[max(np.searchsorted(starts, index, side="right") - 1, 0)]
+    if r["start"] <= index < r["start"] + r["count"]:
+        return r["source"]
+    return None
+
+
+def batch_static_mesh_objects(scene, scene_objects, name="static_batch", remove_sources=False):
+    """ merges the static meshes of scene objects into one scene object with meshes in world space.
+        The source objects are hidden or removed and the index ranges of the batched meshes refer to
+        their node ids and the index of each mesh in their StaticMesh component.
+    """
+    meshes = []
+    transformations = []
+    sources = []
+    for o in scene_objects:
+        if "static_mesh" not in o._components:
+            continue
+        for idx, mesh in enumerate(o._components["static_mesh"].meshes):
+            meshes.append(mesh)
+            transformations.append(o.transformation)
+            sources.append((o.node_id, idx))
+    if len(meshes) == 0:
+        return None
+    batch_object = SceneObject()
+    batch_object.name = name
+    static_mesh = StaticMesh.from_meshes(batch_object, batch_meshes(meshes, transformations, sources))
+    batch_object.add_component("static_mesh", static_mesh)
+    for o in scene_objects:
+        if "static_mesh" not in o._components:
+            continue
+        if remove_sources:
+            scene.removeObject(o.node_id)
+        else:
+            o.visible = False
+    scene.addObject(batch_object)
+    return batch_object
+
 
 class StaticMesh(ComponentBase):
-    def __init__(self, scene_object, position, mesh_list):
+    def __init__(self, scene_object, position, mesh_list, batch=False, n_lods=DEFAULT_N_LODS):
         ComponentBase.__init__(self, scene_object)
         self._scene_object = scene_object
         self.meshes = []
@@ -43,23 +157,34 @@ class StaticMesh(ComponentBase):
 
             if "material" in m_desc:
                 if "Kd" in list(m_desc["material"].keys()):
-                    material = material_manager.get(m_desc["texture"])
-                    if material is None:
-                        material = materials.TextureMaterial.from_image(m_desc["material"])
-                        material_manager.set(m_desc["texture"], material)
+                    material = material_manager.get_texture_material(m_desc["material"]["Kd"])
                     texture_name = m_desc["texture"]
                     print("reuse material", texture_name)
                     if not texture_name.endswith(b'Hair_texture_big.png'):
                         geom = Mesh.build_from_desc(m_desc, material)
                         self.meshes.append(geom)
                 elif "albedo_texture" in m_desc["material"]: 
-                    material = materials.TextureMaterial.from_image(m_desc["material"]["albedo_texture"])
+                    material = material_manager.get_texture_material(m_desc["material"]["albedo_texture"])
                     geom = Mesh.build_from_desc(m_desc, material)
                     self.meshes.append(geom)
             else:
                 print("create untextured mesh")
                 geom = Mesh.build_from_desc(m_desc, material=materials.red)
                 self.meshes.append(geom)
+        if batch:
+            self.batch()
+        for m in self.meshes:
+            m.generate_lods(n_lods)
+
+    @classmethod
+    def from_meshes(cls, scene_object, meshes):
+        static_mesh = cls(scene_object, [0, 0, 0], [])
+        static_mesh.meshes = meshes
+        return static_mesh
+
+    def batch(self):
+        """ merges the meshes that share a material into one draw call per material """
+        self.meshes = batch_meshes(self.meshes)
 
     def draw(self, modelMatrix, viewMatrix, projectionMatrix, lightSources):
         return
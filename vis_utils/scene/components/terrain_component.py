@@ -20,7 +20,9 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
 from .component_base import ComponentBase
+from ...graphics.renderer.primitive_shapes import height_map_to_array, sample_height_map
 
 
 class TerrainComponent(ComponentBase):
@@ -33,30 +35,31 @@ class TerrainComponent(ComponentBase):
         self.meshes = [mesh]
         self.height_map_scale = height_map_scale
         self.height_image = height_image
+        self.heights = None
+        if height_image is not None:
+            self.heights = height_map_to_array(height_image, height_map_scale)
 
     def to_relative_coordinates(self, center_x, center_z, x, z):
         """ get position relative to upper left
+            accepts scalars or arrays of coordinates
         """
-        relative_x = x - center_x
-        relative_z = z - center_z
-        relative_x += self.width / 2
-        relative_z += self.depth / 2
+        relative_x = np.asarray(x) - center_x
+        relative_z = np.asarray(z) - center_z
+        relative_x = relative_x + self.width / 2
+        relative_z = relative_z + self.depth / 2
 
         # scale by width and depth to range of 1
-        relative_x /= self.width
-        relative_z /= self.depth
+        relative_x = relative_x / self.width
+        relative_z = relative_z / self.depth
         return relative_x, relative_z
 
     def get_height(self, relative_x, relative_z):
-        if relative_x < 0 or relative_x > 1.0 or relative_z < 0 or relative_z > 1.0:
-            #print("Coordinates outside of the range")
-            return 0
-        # scale by image width and height to image range
-        height_map_image = self.height_image
-        ix = relative_x*height_map_image.size[0]
-        iy = relative_z*height_map_image.size[1]
-        p = self.height_image.getpixel((ix, iy))
-        return (p[0]/255)*self.height_map_scale
+        """ bilinear lookup of the height map
+            accepts scalars or arrays of relative coordinates and returns 0 outside of the range [0,1]
+        """
+        if self.heights is None:
+            return 0 if np.ndim(relative_x) == 0 else np.zeros(np.shape(relative_x))
+        return sample_height_map(self.heights, relative_x, relative_z)
 
     def get_meshes(self):
         return self.meshes
@@ -105,7 +105,7 @@ class EditorScene(Scene):
         diffuse_texture.make_chessboard()
         material = TextureMaterial(diffuse_texture)
         geom = Mesh.build_plane(10000, 10000, 8, 100, material)
-        ground._components["geometry"] = GeometryDataComponent(ground, geom)
+        ground.add_component("geometry", GeometryDataComponent(ground, geom))
         ground.transformation = transform
         self.addObject(ground)
         return ground
@@ -117,7 +117,7 @@ class EditorScene(Scene):
         h = SHADOW_MAP_HEIGHT
         shadow_box_length = SHADOW_BOX_LENGTH
         l = DirectionalLight(pos, target, up_vector, intensities, w, h, scene_scale=scene_scale,shadow_box_length=shadow_box_length)
-        o._components["light"] = LightComponent(o, l)
+        o.add_component("light", LightComponent(o, l))
         self.addObject(o)
 
     def addObject(self, sceneObject, parentId=None):
@@ -215,6 +215,9 @@ class EditorScene(Scene):
         self.selected_scene_object = self.getObject(scene_id)
         if self.selected_scene_object is not None and not self.selected_scene_object.clickable:
             self.selected_scene_object = None
+        if self.selected_scene_object is not None and ray is not None \
+                and self.selected_scene_object.has_component("constraint_set"):
+            self.selected_scene_object._components["constraint_set"].select(ray[0], ray[1])
 
         if self.scene_edit_widget is not None:
             if self.selected_scene_object is not None and self.selected_scene_object != self.ground:
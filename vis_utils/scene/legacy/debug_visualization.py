@@ -20,10 +20,52 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
+import numpy as np
+from OpenGL.GL import GL_LINES
+from ...graphics import materials
+from ...graphics.instance_buffer import InstanceBuffer
 from ...graphics.renderer import lines
 from ...graphics.renderer import primitive_shapes
+from ...graphics.renderer.techniques import ColorTechnique, InstancedDirectionalShadingIndexTechnique
 from ..scene_object import SceneObject
-from ...graphics.utils import get_translation_matrix
+
+COORDINATE_SYSTEM_COLORS = np.array([[1, 0, 0], [1, 0, 0], [0, 1, 0], [0, 1, 0], [0, 0, 1], [0, 0, 1]], dtype=float)
+
+
+class DecimatedList(object):
+    """ stores every stride-th added item. When max_length is reached every second stored item is dropped and the
+        stride is doubled, so a long recording stays evenly covered by a bounded number of items.
+    """
+    def __init__(self, max_length=None, stride=1):
+        self.items = []
+        self.max_length = max_length
+        self.initial_stride = stride
+        self.stride = stride
+        self.n_added = 0
+
+    def add(self, item):
+        """ returns the index of the first stored item that changed or -1 if the item was skipped """
+        index = self.n_added
+        self.n_added += 1
+        if index % self.stride != 0:
+            return -1
+        first_changed = len(self.items)
+        if self.max_length is not None and len(self.items) >= self.max_length:
+            self.items = self.items[::2]
+            self.stride *= 2
+            first_changed = 0
+            if index % self.stride != 0 or len(self.items) >= self.max_length:
+                return first_changed
+        self.items.append(item)
+        return first_changed
+
+    def clear(self):
+        self.items = []
+        self.stride = self.initial_stride
+        self.n_added = 0
+
+    def __len__(self):
+        return len(self.items)
 
 
 class CoordinateSystemObject(SceneObject):
@@ -33,9 +75,6 @@ class CoordinateSystemObject(SceneObject):
         self.visualization = lines.CoordinateSystemRenderer(scale)
         self.active = True
 
-    def setPosition(self, position):
-        self.transformation = get_translation_matrix(position)
-
     def draw(self, viewMatrix, projectionMatrix, lightSources):
         if self.active:
             self.visualization.draw(self.transformation, viewMatrix, projectionMatrix)
@@ -69,26 +108,51 @@ class TravelledPathObject(SceneObject):
 
 
 class PointCloudObject(SceneObject):
-
-    def __init__(self):
+    """ draws a sphere at each added point as instances of one sphere mesh with a single draw call.
+        New points are appended to the instance buffer on the next draw.
+    """
+    def __init__(self, radius=1.0, color=(1.0, 0.0, 0.0), max_points=None, decimation=1):
         SceneObject.__init__(self)
-        self.sphere = primitive_shapes.SphereRenderer(20, 20, 1.0, material=CustomShaders.redMaterial)
-        self.transformations = []
-
-        return
+        self.sphere = primitive_shapes.SphereRenderer(20, 20, radius, material=materials.red)
+        self.technique = InstancedDirectionalShadingIndexTechnique(self.sphere.technique.material)
+        self.color = list(color[:3]) + [1.0]
+        self.points = DecimatedList(max_points, decimation)
+        self.instance_buffer = None
+        self._first_dirty_point = 0
 
     def addPoint(self,point):
-        print("got point", point)
-        transformation = get_translation_matrix(point)
-        self.transformations.append(transformation)
-
+        first_changed = self.points.add(list(point[:3]))
+        if first_changed >= 0:
+            self._first_dirty_point = min(self._first_dirty_point, first_changed)
 
     def clear(self):
-        self.transformations.clear()
+        self.points.clear()
+        self._first_dirty_point = 0
+        if self.instance_buffer is not None:
+            self.instance_buffer.n_instances = 0
+
+    def update_instance_buffer(self):
+        if self.instance_buffer is None:
+            self.instance_buffer = InstanceBuffer()
+        n_points = len(self.points)
+        first = self._first_dirty_point
+        if first >= n_points:
+            return
+        offsets = np.column_stack([np.array(self.points.items[first:], dtype=float), np.ones(n_points - first)])
+        colors = np.tile(self.color, (n_points - first, 1))
+        if first == self.instance_buffer.n_instances:
+            self.instance_buffer.append(offsets, colors)
+        else:
+            self.instance_buffer.upload(offsets, colors)
+        self._first_dirty_point = n_points
 
     def draw(self,viewMatrix,projectionMatrix,lightSources):
-        for transformation in self.transformations:
-            self.sphere.draw(transformation,viewMatrix, projectionMatrix,lightSources)
+        if len(self.points) == 0:
+            return
+        self.update_instance_buffer()
+        self.technique.prepare(self.transformation, viewMatrix, projectionMatrix, lightSources)
+        self.technique.use(self.sphere.vertices, self.sphere.indices, self.instance_buffer, self.sphere.numIndices)
+        self.technique.stop()
 
 
 class TravelledPathWithCorrespondencesObject(SceneObject):
@@ -135,21 +199,34 @@ class TravelledPathWithMarkersObject(SceneObject):
 
 
 class ListOfLocalCoordinateSystemsObject(SceneObject):
-    def __init__(self,scaleFactor = 0.5):
+    """ draws the axes of all added coordinate systems from one growing line buffer with a single draw call """
+    def __init__(self,scaleFactor = 0.5, max_frames=None, decimation=1):
         SceneObject.__init__(self)
         self.scaleFactor = scaleFactor
-        self.coordinateSystems =[]
+        self.coordinateSystems = DecimatedList(max_frames, decimation)
+        self.vertices = lines.ColoredVertexBuffer()
+        self.technique = ColorTechnique()
+        s = scaleFactor
+        self._axis_points = np.array([[0, 0, 0, 1], [s, 0, 0, 1], [0, 0, 0, 1], [0, s, 0, 1], [0, 0, 0, 1], [0, 0, s, 1]], dtype=float)
 
     def addCoordinateSystem(self,transformation):
-        cs = lines.CoordinateSystemRenderer(scale = self.scaleFactor)
-        print("transformation matrix",transformation.shape)
-        self.coordinateSystems.append((cs,transformation))
+        first_changed = self.coordinateSystems.add(np.array(transformation, dtype=float))
+        if first_changed >= 0:
+            self._update_vertices(first_changed)
+
+    def _update_vertices(self, first):
+        transformations = np.array(self.coordinateSystems.items[first:])
+        points = np.einsum("vi,nij->nvj", self._axis_points, transformations)[:, :, :3].reshape(-1, 3)
+        self.vertices.resize(len(self.coordinateSystems) * 6)
+        self.vertices.set_vertices(first * 6, points, np.tile(COORDINATE_SYSTEM_COLORS, (len(transformations), 1)))
 
     def clear(self):
-        self.coordinateSystems = []
+        self.coordinateSystems.clear()
+        self.vertices.clear()
 
     def draw(self, viewMatrix, projectionMatrix, lightSources):
-        for cs,transformation in self.coordinateSystems:
-            #print "draw cs"
-            cs.draw(transformation,viewMatrix, projectionMatrix)
-
+        if self.vertices.numVertices == 0:
+            return
+        self.technique.prepare(self.transformation, viewMatrix, projectionMatrix)
+        self.technique.use(self.vertices.vbo, GL_LINES, self.vertices.numVertices)
+        self.technique.stop()
@@ -28,8 +28,25 @@ from .scene_graph import SceneGraph
 from .scene_object_builder import SceneObjectBuilder
 import numpy as np
 from .components.terrain_component import TerrainComponent
-from .scene_object import SceneObject
+from .scene_object import SceneObject, COMPONENT_HOOKS
 from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from ..profiling import Profiler
+from ..graphics.renderer.debug_skeleton import SharedDebugSkeletonRenderer
+
+DEFAULT_UPDATE_WORKERS = 4
+
+
+def get_root_object(scene_object):
+    while scene_object.parentNode is not None and not getattr(scene_object.parentNode, "is_root", False):
+        scene_object = scene_object.parentNode
+    return scene_object
+
+
+def update_objects(objects, dt):
+    for scene_object in objects:
+        if scene_object.visible:
+            scene_object.update(dt)
 
 
 class Scene(SceneGraph):
@@ -52,9 +69,82 @@ class Scene(SceneGraph):
         self.has_height_map = False
         self.lightSources = []
         self.ground = None
+        self._objects = dict()  # node id -> scene object
+        self._hook_objects = dict((hook, []) for hook in COMPONENT_HOOKS)
+        self._light_objects = []
+        self._registries_dirty = False
+        self._update_executor = None
+        self._update_workers = 1
+        self._parallel_update_partitions = []
+        self._serial_update_objects = []
+        self._after_update_listeners = []
         self.object_builder = SceneObjectBuilder()
         self.object_builder.set_scene(self)
 
+    def invalidate_registries(self):
+        """ called when components of an object are added or removed """
+        self._registries_dirty = True
+
+    def _update_registries(self):
+        """ collects the objects that implement each phase in the order of the object list """
+        for hook in COMPONENT_HOOKS:
+            self._hook_objects[hook] = [o for o in self.object_list if o.implements_hook(hook)]
+        self._light_objects = [o for o in self.object_list if o.has_component("light")]
+        self._registries_dirty = False
+        if self._update_executor is not None:
+            self._partition_update_objects()
+
+    def _partition_update_objects(self):
+        """ distributes the trees of the scene graph over the workers. Objects of one tree are updated in order
+            by the same worker and trees with components that are not thread safe are updated after the join.
+        """
+        trees = collections.OrderedDict()
+        for o in self._hook_objects["update"]:
+            root_id = get_root_object(o).node_id
+            if root_id not in trees:
+                trees[root_id] = []
+            trees[root_id].append(o)
+        parallel_trees = []
+        self._serial_update_objects = []
+        for tree in trees.values():
+            if all(o.supports_parallel_update() for o in tree):
+                parallel_trees.append(tree)
+            else:
+                self._serial_update_objects += tree
+        n_partitions = min(self._update_workers, len(parallel_trees))
+        self._parallel_update_partitions = []
+        for idx in range(n_partitions):
+            self._parallel_update_partitions.append([o for tree in parallel_trees[idx::n_partitions] for o in tree])
+
+    def set_parallel_update(self, enabled, max_workers=DEFAULT_UPDATE_WORKERS):
+        """ updates the independent trees of the scene graph on a thread pool and joins before after_update.
+            NumPy releases the GIL in larger array operations, so the forward kinematics of different
+            objects can run concurrently.
+        """
+        if self._update_executor is not None:
+            self._update_executor.shutdown(wait=True)
+            self._update_executor = None
+        if enabled:
+            self._update_executor = ThreadPoolExecutor(max_workers=max_workers)
+            self._update_workers = max_workers
+        self._registries_dirty = True
+
+    def _update_objects(self, dt):
+        objects = self.get_hook_objects("update")
+        if self._update_executor is None or Profiler.active or len(self._parallel_update_partitions) < 2:
+            update_objects(objects, dt)
+            return
+        futures = [self._update_executor.submit(update_objects, partition, dt)
+                   for partition in self._parallel_update_partitions]
+        for future in futures:
+            future.result()
+        update_objects(self._serial_update_objects, dt)
+
+    def get_hook_objects(self, hook):
+        if self._registries_dirty:
+            self._update_registries()
+        return self._hook_objects[hook]
+
     def objectList(self):
         return self.rootNode.getChildren()
 
@@ -77,53 +167,94 @@ class Scene(SceneGraph):
                     objects.append(o)
         return objects
 
+    def store_transformations(self):
+        for o in self.object_list:
+            o.store_transformation()
+
+    def interpolate_transformations(self, alpha):
+        """ replaces the transformations by the blend of the last two stored update steps
+            and returns the replaced transformations for restore_transformations
+        """
+        replaced = []
+        for o in self.object_list:
+            m = o.get_interpolated_transformation(alpha)
+            if m is not None:
+                replaced.append((o, o.transformation))
+                o.transformation = m
+        return replaced
+
+    def restore_transformations(self, replaced):
+        for o, transformation in replaced:
+            o.transformation = transformation
+
     def addObject(self, sceneObject, parentId=None):
         super().addObject(sceneObject, parentId)
         self.object_list.append(sceneObject)
+        self._objects[sceneObject.node_id] = sceneObject
+        self._registries_dirty = True
         return sceneObject.node_id
 
+    def getObject(self, node_id):
+        if node_id in self._objects:
+            return self._objects[node_id]
+        return super().getObject(node_id)
+
+    def getSceneNode(self, node_id):
+        return self.getObject(node_id)
+
+    def has_object(self, node_id):
+        return node_id in self._objects
+
     def sim_update(self, dt):
         if self.sim is None:
             return
         self.mutex.acquire()
         self.sim_task_manager.update(dt)
         self.sim.update(dt)
-        for sceneObject in self.object_list:
+        for sceneObject in self.get_hook_objects("sim_update"):
             if sceneObject.visible:
                 sceneObject.sim_update(dt)
         self.mutex.release()
 
     def before_update(self, dt):
-        for sceneObject in self.object_list:
+        for sceneObject in self.get_hook_objects("before_update"):
             if sceneObject.visible:
                 sceneObject.before_update(dt)
 
     def get_light_sources(self):
-        light_sources = []
-        for o in self.object_list:
-            if o.has_component("light"):
-                light_sources.append(o._components["light"].light)
-        return light_sources
+        if self._registries_dirty:
+            self._update_registries()
+        return [o._components["light"].light for o in self._light_objects]
 
     def update(self, dt):
         self.lightSources = self.get_light_sources()
         self.task_manager.update(dt)
         if self.sim is not None:
             self.sim.update_contacts()
-        for sceneObject in self.object_list:
-            if sceneObject.visible:
-                sceneObject.update(dt)
+        self._update_objects(dt)
 
     def after_update(self, dt):
-        for sceneObject in self.object_list:
+        for sceneObject in self.get_hook_objects("after_update"):
             if sceneObject.visible:
                 sceneObject.after_update(dt)
+        for listener in self._after_update_listeners:
+            listener(self, dt)
+
+    def add_after_update_listener(self, listener):
+        """ listener(scene, dt) is called once per frame after all objects were updated """
+        if listener not in self._after_update_listeners:
+            self._after_update_listeners.append(listener)
+
+    def remove_after_update_listener(self, listener):
+        if listener in self._after_update_listeners:
+            self._after_update_listeners.remove(listener)
 
     def draw(self, viewMatrix, projectionMatrix):
         self.draw_task_manager.update(0.0)
-        for sceneObject in self.object_list:
+        for sceneObject in self.get_hook_objects("draw"):
             if sceneObject.visible:
                 sceneObject.draw(viewMatrix,projectionMatrix,self.lightSources)
+        SharedDebugSkeletonRenderer.get_instance().flush(viewMatrix, projectionMatrix)
             
     def update_and_draw(self, viewMatrix, projectionMatrix,dt):
         for sceneObject in self.object_list:
@@ -142,11 +273,25 @@ class Scene(SceneGraph):
         return self.selected_scene_object
     
     def removeObject(self, node_id):
-        print("before", len(self.object_list))
-        for sceneObject in self.object_list:
-            if sceneObject.node_id == node_id:
-                self.object_list.remove(sceneObject)
-        print("after", len(self.object_list))
+        """ removes the object and its children """
+        scene_object = self._objects.get(node_id)
+        if scene_object is not None:
+            removed_ids = set()
+            stack = [scene_object]
+            while len(stack) > 0:
+                o = stack.pop()
+                removed_ids.add(o.node_id)
+                stack += o.children
+            self.object_list[:] = [o for o in self.object_list if o.node_id not in removed_ids]
+            for removed_id in removed_ids:
+                self._objects.pop(removed_id, None)
+            if self.selected_scene_object is not None and self.selected_scene_object.node_id in removed_ids:
+                self.selected_scene_object = None
+            self._registries_dirty = True
+            if scene_object.parentNode is not None and scene_object in scene_object.parentNode.children:
+                scene_object.cleanup()
+                scene_object.parentNode.children.remove(scene_object)
+                return
         super().removeObject(node_id)
 
     def showSceneObject(self, node_id):
@@ -21,8 +21,20 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
 from abc import abstractmethod
+import time
 import numpy as np
 from .scene_graph_node import SceneGraphNode
+from .utils import interpolate_transformation
+from ..profiling import Profiler
+
+# phases of the scene that are only dispatched to the components implementing them
+COMPONENT_HOOKS = ["before_update", "update", "after_update", "sim_update", "draw"]
+
+
+def implements_hook(component, hook):
+    if hasattr(component, "implements_hook"):
+        return component.implements_hook(hook)
+    return hasattr(component, hook)
 
 
 class SceneObject(SceneGraphNode):
@@ -30,9 +42,59 @@ class SceneObject(SceneGraphNode):
         super(SceneObject, self).__init__()
         self.name = name
         self.visible = True
+        self._components = dict()
+        self._hooks = dict((hook, dict()) for hook in COMPONENT_HOOKS)
+        self._suspended_hooks = dict()
         self.visualization = None
         self.clickable = True
-        self._components = dict()
+        # transformations after the last two fixed update steps for the interpolation while rendering
+        self._previous_transformation = None
+        self._stored_transformation = None
+
+    @property
+    def visualization(self):
+        return self._visualization
+
+    @visualization.setter
+    def visualization(self, visualization):
+        self._visualization = visualization
+        self._invalidate_scene_registries()
+
+    def _invalidate_scene_registries(self):
+        scene = getattr(self, "scene", None)
+        if scene is not None and hasattr(scene, "invalidate_registries"):
+            scene.invalidate_registries()
+
+    def store_transformation(self):
+        """ keeps the transformation after a fixed update step and the one of the step before """
+        self._previous_transformation = self._stored_transformation
+        self._stored_transformation = np.array(self.transformation)
+
+    def get_interpolated_transformation(self, alpha):
+        """ returns the transformation between the last two stored steps or None if there is nothing to blend.
+            A transformation that was changed after the last step e.g. by the editor is not interpolated.
+        """
+        previous = self._previous_transformation
+        current = self._stored_transformation
+        if previous is None or current is None or not np.array_equal(current, self.transformation):
+            return None
+        if np.array_equal(previous, current):
+            return None
+        return interpolate_transformation(previous, current, alpha)
+
+    def supports_parallel_update(self):
+        """ returns False if a component has to be updated on the calling thread """
+        if type(self).update is not SceneObject.update:
+            return False
+        return all(getattr(c, "parallel_update", False) for c in self._hooks["update"].values())
+
+    def implements_hook(self, hook):
+        """ returns True if the scene has to call the phase on this object """
+        if getattr(type(self), hook) is not getattr(SceneObject, hook):
+            return True
+        if hook == "draw" and self.visualization is not None:
+            return True
+        return len(self._hooks[hook]) > 0
 
     def prepare_rendering(self, renderer):
         for k in self._components:
@@ -58,30 +120,54 @@ class SceneObject(SceneGraphNode):
             component.handle_keyboard_input(key)
 
     def before_update(self, dt):
-
-        for component in self._components.values():
+        if Profiler.active:
+            self._profile_components("before_update", dt)
+            return
+        for component in self._hooks["before_update"].values():
             component.before_update(dt)
 
     def update(self, dt):
         """needs to be implemented e.g. to set the model matrix of the visualization or update an animation"""
-        for component in self._components.values():
+        if Profiler.active:
+            self._profile_components("update", dt)
+            return
+        for component in self._hooks["update"].values():
             component.update(dt)
 
     def after_update(self, dt):
-        for component in self._components.values():
+        if Profiler.active:
+            self._profile_components("after_update", dt)
+            return
+        for component in self._hooks["after_update"].values():
             component.after_update(dt)
 
     def sim_update(self, dt):
-        for component in self._components.values():
+        if Profiler.active:
+            self._profile_components("sim_update", dt)
+            return
+        for component in self._hooks["sim_update"].values():
             component.sim_update(dt)
 
+    def _profile_components(self, phase, *args):
+        for name, component in list(self._hooks[phase].items()):
+            start = time.perf_counter()
+            getattr(component, phase)(*args)
+            Profiler.add_component_timing(phase, self, name, start)
+
     def draw(self, viewMatrix, projectionMatrix, lightSources):
         """needs to be implemented. note that scene objects don't have to use the light sources when they have a colored visualization e.g. a line"""
         m = np.dot(self.scale_matrix, self.transformation)
         if self.visualization is not None and self.visible:
             self.visualization.draw(m, viewMatrix, projectionMatrix, lightSources)
 
-        for component in self._components.values():
+        if Profiler.active:
+            for name, component in list(self._hooks["draw"].items()):
+                if component.visible:
+                    start = time.perf_counter()
+                    component.draw(m, viewMatrix, projectionMatrix, lightSources)
+                    Profiler.add_component_timing("draw", self, name, start)
+            return
+        for component in self._hooks["draw"].values():
             if component.visible:
                 component.draw(m, viewMatrix, projectionMatrix, lightSources)
 
@@ -95,11 +181,40 @@ class SceneObject(SceneGraphNode):
         self.draw(viewMatrix, projectionMatrix, lightSources)
 
     def add_component(self, name, component):
+        """ registers the component for the phases it implements """
         self._components[name] = component
+        for hook in COMPONENT_HOOKS:
+            if implements_hook(component, hook):
+                self._hook_registry(hook)[name] = component
+            else:
+                self._hook_registry(hook).pop(name, None)
+        self._invalidate_scene_registries()
 
     def _remove_component(self, name):
         if name in self._components.keys():
             del self._components[name]
+            for hook in COMPONENT_HOOKS:
+                self._hook_registry(hook).pop(name, None)
+            self._invalidate_scene_registries()
+
+    def _hook_registry(self, hook):
+        if hook in self._suspended_hooks:
+            return self._suspended_hooks[hook]
+        return self._hooks[hook]
+
+    def suspend_hook(self, hook):
+        """ stops dispatching the phase to the components until resume_hook is called """
+        if hook in self._suspended_hooks:
+            return
+        self._suspended_hooks[hook] = self._hooks[hook]
+        self._hooks[hook] = dict()
+        self._invalidate_scene_registries()
+
+    def resume_hook(self, hook):
+        if hook not in self._suspended_hooks:
+            return
+        self._hooks[hook] = self._suspended_hooks.pop(hook)
+        self._invalidate_scene_registries()
 
     def has_component(self, name):
         return name in self._components.keys()
@@ -24,6 +24,8 @@ import importlib
 from collections import OrderedDict
 from vis_utils.graphics.asset_manager import AssetManager
 from .scene_object import SceneObject
+from .task_manager import Task
+from .async_file_loader import AsyncFileLoader
 
 
 DEFAULT_COLOR = (0.5, 0.5, 0.0)
@@ -41,12 +43,14 @@ class SceneObjectBuilder(object):
     construction_methods = OrderedDict()
     component_methods = OrderedDict()
     file_handler = OrderedDict()
+    async_file_handler = OrderedDict()
     dynamic_modules = OrderedDict()
     instance = None
 
     def __init__(self):
         self._scene = None
         self.asset_manager = AssetManager.get_instance()
+        self.async_loader = None
 
     @classmethod
     def get_instance(cls):
@@ -56,6 +60,8 @@ class SceneObjectBuilder(object):
 
     def set_scene(self, s):
         self._scene = s
+        if self.async_loader is not None:
+            self._add_async_loader_task()
 
     @classmethod
     def register_object(cls, name, method):
@@ -65,6 +71,13 @@ class SceneObjectBuilder(object):
     def register_file_handler(cls, name, method):
         cls.file_handler[name] = method
 
+    @classmethod
+    def register_async_file_handler(cls, name, load_method, create_method):
+        """ load_method(file_path, **kwargs) parses the file on a worker thread without using OpenGL or the scene
+            create_method(builder, data, file_path, **kwargs) creates the scene object on the main thread
+        """
+        cls.async_file_handler[name] = (load_method, create_method)
+
     @classmethod
     def register_component(cls, name, method):
         cls.component_methods[name] = method
@@ -86,6 +99,36 @@ class SceneObjectBuilder(object):
                 break
         return o
 
+    def get_async_loader(self):
+        """ creates the loader on first use and updates it with the draw tasks of the scene """
+        if self.async_loader is None:
+            self.async_loader = AsyncFileLoader(self)
+            if self._scene is not None:
+                self._add_async_loader_task()
+        return self.async_loader
+
+    def _add_async_loader_task(self):
+        task = Task("async_file_loader", lambda dt, loader: loader.update(), self.async_loader)
+        self._scene.draw_task_manager.add("async_file_loader", task)
+
+    def load_file_async(self, filename, **kwargs):
+        """ returns a future of the scene object. Files without an async handler are loaded by their
+            synchronous handler on the main thread.
+        """
+        loader = self.get_async_loader()
+        for key in self.async_file_handler:
+            if filename.endswith(key):
+                load_method, create_method = self.async_file_handler[key]
+                return loader.load_file(filename, load_method, create_method, **kwargs)
+        for key in self.file_handler:
+            if filename.endswith(key):
+                return loader.call_on_main_thread(filename, self.file_handler[key], **kwargs)
+        return None
+
+    def load_files_async(self, filenames, **kwargs):
+        futures = [self.load_file_async(f, **kwargs) for f in filenames]
+        return [f for f in futures if f is not None]
+
     @classmethod
     def load_dynamic_module(cls, model_type, module_script):
         if model_type in cls.dynamic_modules:
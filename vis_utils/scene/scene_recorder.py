@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 DFKI GmbH.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit
+# persons to whom the Software is furnished to do so, subject to the
+# following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE
+# USE OR OTHER DEALINGS IN THE SOFTWARE.
+# -*- coding: utf-8 -*-
+""" Records the per frame state of a scene into a compact binary log and plays it back without the controllers.
+
+The file starts with MAGIC followed by chunks of CHUNK_SIZE frames. Each chunk has a CHUNK_HEADER, a JSON list of
+the objects seen for the first time and the zlib compressed frames. The first frame of a chunk stores the full state
+so every chunk can be decoded on its own. The index of the chunks is appended by SceneRecorder.close and is rebuilt by
+scanning the chunk headers when a recording was not closed.
+"""
+import json
+import struct
+import zlib
+from bisect import bisect_right
+import numpy as np
+from .task_manager import Task
+
+MAGIC = b"VISREC01"
+CHUNK_MAGIC = b"CHNK"
+INDEX_MAGIC = b"INDX"
+END_MAGIC = b"VEND"
+CHUNK_HEADER = struct.Struct("<4sIIII")  # magic, first frame, number of frames, table size, payload size
+FRAME_HEADER = struct.Struct("<dI")  # time, number of records
+RECORD_HEADER = struct.Struct("<IBH")  # object index, flags, number of joints
+FOOTER = struct.Struct("<Q4s")  # index offset, magic
+FLAG_VISIBLE = 1
+FLAG_TRANSFORMATION = 2
+FLAG_JOINTS = 4
+DEFAULT_CHUNK_SIZE = 120
+DEFAULT_COMPRESSION_LEVEL = 6
+REPLAY_TASK_NAME = "scene_replay"
+
+
+def get_joint_matrices(scene_object):
+    """ returns the global joint matrices of the skeleton visualization or None """
+    if not scene_object.has_component("skeleton_vis"):
+        return None
+    matrices = scene_object._components["skeleton_vis"].matrices
+    if len(matrices) == 0 or any(m is None for m in matrices):
+        return None
+    return np.array(matrices, dtype=np.float32)
+
+
+def set_joint_matrices(scene_object, matrices):
+    if not scene_object.has_component("skeleton_vis"):
+        return
+    skeleton_vis = scene_object._components["skeleton_vis"]
+    skeleton_vis.matrices = [np.array(m, dtype=np.float64) for m in matrices]
+    if skeleton_vis.visualize and skeleton_vis.debug_skeleton is not None:
+        skeleton_vis.debug_skeleton.set_matrices(np.array(skeleton_vis.matrices))
+
+
+class SceneRecorder(object):
+    """ writes the transformations, joint matrices and visibility of the scene objects after every update.
+        Only values that changed since the last frame of the chunk are stored.
+    """
+    def __init__(self, scene, filename, chunk_size=DEFAULT_CHUNK_SIZE, compression_level=DEFAULT_COMPRESSION_LEVEL,
+                 node_ids=None):
+        self.scene = scene
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.compression_level = compression_level
+        self.node_ids = node_ids
+        self.time = 0.0
+        self.n_frames = 0
+        self._file = None
+        self._objects = dict()  # node id -> object index
+        self._object_table = []
+        self._new_objects = []
+        self._chunks = []
+        self._frames = []
+        self._last_state = dict()
+
+    def start(self):
+        self._file = open(self.filename, "wb")
+        self._file.write(MAGIC)
+        self.scene.add_after_update_listener(self.on_after_update)
+
+    def stop(self):
+        self.scene.remove_after_update_listener(self.on_after_update)
+        self.close()
+
+    def on_after_update(self, scene, dt):
+        self.time += dt
+        self.record_frame()
+
+    def _get_objects(self):
+        if self.node_ids is None:
+            return self.scene.object_list
+        return [self.scene.getObject(node_id) for node_id in self.node_ids if self.scene.has_object(node_id)]
+
+    def _get_object_index(self, scene_object, n_joints):
+        if scene_object.node_id not in self._objects:
+            entry = {"index": len(self._object_table), "node_id": scene_object.node_id,
+                     "name": scene_object.name, "n_joints": n_joints}
+            self._objects[scene_object.node_id] = entry["index"]
+            self._object_table.append(entry)
+            self._new_objects.append(entry)
+        return self._objects[scene_object.node_id]
+
+    def record_frame(self):
+        data = bytearray()
+        n_records = 0
+        for scene_object in self._get_objects():
+            transformation = np.asarray(scene_object.transformation, dtype=np.float32)
+            joints = get_joint_matrices(scene_object)
+            n_joints = len(joints) if joints is not None else 0
+            idx = self._get_object_index(scene_object, n_joints)
+            flags = FLAG_VISIBLE if scene_object.visible else 0
+            last_state = self._last_state.get(idx)
+            if last_state is None or not np.array_equal(last_state[1], transformation):
+                flags |= FLAG_TRANSFORMATION
+            if joints is not None and (last_state is None or last_state[2] is None
+                                       or not np.array_equal(last_state[2], joints)):
+                flags |= FLAG_JOINTS
+            if last_state is not None and last_state[0] == scene_object.visible \
+                    and flags & (FLAG_TRANSFORMATION | FLAG_JOINTS) == 0:
+                continue
+            data += RECORD_HEADER.pack(idx, flags, n_joints if flags & FLAG_JOINTS else 0)
+            if flags & FLAG_TRANSFORMATION:
+                data += transformation.tobytes()
+            if flags & FLAG_JOINTS:
+                data += joints.tobytes()
+            self._last_state[idx] = (scene_object.visible, transformation, joints)
+            n_records += 1
+        self._frames.append(FRAME_HEADER.pack(self.time, n_records) + bytes(data))
+        self.n_frames += 1
+        if len(self._frames) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """ writes the buffered frames as a chunk. The next frame starts with the full state again. """
+        if len(self._frames) == 0 or self._file is None:
+            return
+        table = json.dumps(self._new_objects).encode("utf-8")
+        payload = zlib.compress(b"".join(self._frames), self.compression_level)
+        first_frame = self.n_frames - len(self._frames)
+        start_time = FRAME_HEADER.unpack_from(self._frames[0])[0]
+        self._chunks.append([self._file.tell(), first_frame, len(self._frames), start_time])
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, first_frame, len(self._frames), len(table), len(payload)))
+        self._file.write(table)
+        self._file.write(payload)
+        self._file.flush()
+        self._frames = []
+        self._new_objects = []
+        self._last_state = dict()
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        index_offset = self._file.tell()
+        index = {"objects": self._object_table, "chunks": self._chunks, "n_frames": self.n_frames}
+        self._file.write(INDEX_MAGIC)
+        self._file.write(json.dumps(index).encode("utf-8"))
+        self._file.write(FOOTER.pack(index_offset, END_MAGIC))
+        self._file.close()
+        self._file = None
+
+
+class SceneRecording(object):
+    """ random access to the frames of a file written by SceneRecorder. The last decoded chunk is cached. """
+    def __init__(self, filename):
+        self.filename = filename
+        self.objects = []
+        self.chunks = []
+        self.n_frames = 0
+        self._cached_chunk = None
+        self._cached_frames = None
+        self._cached_times = None
+        with open(filename, "rb") as in_file:
+            self._data = in_file.read()
+        if self._data[:len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not a scene recording" % filename)
+        if not self._read_index():
+            self._scan_chunks()
+        self._chunk_starts = [c[1] for c in self.chunks]
+        self._chunk_times = [c[3] for c in self.chunks]
+
+    def _read_index(self):
+        if len(self._data) < len(MAGIC) + FOOTER.size:
+            return False
+        index_offset, end_magic = FOOTER.unpack_from(self._data, len(self._data) - FOOTER.size)
+        if end_magic != END_MAGIC or self._data[index_offset:index_offset + len(INDEX_MAGIC)] != INDEX_MAGIC:
+            return False
+        index = json.loads(self._data[index_offset + len(INDEX_MAGIC):len(self._data) - FOOTER.size].decode("utf-8"))
+        self.objects = index["objects"]
+        self.chunks = index["chunks"]
+        self.n_frames = index["n_frames"]
+        return True
+
+    def _scan_chunks(self):
+        """ rebuilds the index of a recording that was not closed and skips an incomplete last chunk """
+        offset = len(MAGIC)
+        while offset + CHUNK_HEADER.size <= len(self._data):
+            magic, first_frame, n_frames, table_size, payload_size = CHUNK_HEADER.unpack_from(self._data, offset)
+            end = offset + CHUNK_HEADER.size + table_size + payload_size
+            if magic != CHUNK_MAGIC or end > len(self._data):
+                break
+            table_offset = offset + CHUNK_HEADER.size
+            self.objects += json.loads(self._data[table_offset:table_offset + table_size].decode("utf-8"))
+            self.chunks.append([offset, first_frame, n_frames, 0.0])
+            self.chunks[-1][3] = self._decode_chunk(len(self.chunks) - 1)[0][0]
+            self.n_frames = first_frame + n_frames
+            offset = end
+
+    def _decode_chunk(self, chunk_idx):
+        """ returns a list of (time, state) with the full state of every frame in the chunk """
+        offset = self.chunks[chunk_idx][0]
+        magic, first_frame, n_frames, table_size, payload_size = CHUNK_HEADER.unpack_from(self._data, offset)
+        payload_offset = offset + CHUNK_HEADER.size + table_size
+        data = zlib.decompress(self._data[payload_offset:payload_offset + payload_size])
+        frames = []
+        state = dict()  # object index -> (visible, transformation, joints)
+        offset = 0
+        for _ in range(n_frames):
+            time, n_records = FRAME_HEADER.unpack_from(data, offset)
+            offset += FRAME_HEADER.size
+            state = dict(state)
+            for _ in range(n_records):
+                idx, flags, n_joints = RECORD_HEADER.unpack_from(data, offset)
+                offset += RECORD_HEADER.size
+                _, transformation, joints = state.get(idx, (True, None, None))
+                if flags & FLAG_TRANSFORMATION:
+                    transformation = np.frombuffer(data, dtype=np.float32, count=16, offset=offset).reshape(4, 4)
+                    offset += 64
+                if flags & FLAG_JOINTS:
+                    joints = np.frombuffer(data, dtype=np.float32, count=n_joints * 16, offset=offset)
+                    joints = joints.reshape(n_joints, 4, 4)
+                    offset += n_joints * 64
+                state[idx] = (bool(flags & FLAG_VISIBLE), transformation, joints)
+            frames.append((time, state))
+        return frames
+
+    def _get_chunk_frames(self, chunk_idx):
+        if self._cached_chunk != chunk_idx:
+            self._cached_frames = self._decode_chunk(chunk_idx)
+            self._cached_times = [t for t, _ in self._cached_frames]
+            self._cached_chunk = chunk_idx
+        return self._cached_frames
+
+    def get_frame(self, frame_idx):
+        """ returns the time and a dict from object index to (visible, transformation, joint matrices) """
+        frame_idx = min(max(frame_idx, 0), self.n_frames - 1)
+        chunk_idx = bisect_right(self._chunk_starts, frame_idx) - 1
+        return self._get_chunk_frames(chunk_idx)[frame_idx - self.chunks[chunk_idx][1]]
+
+    def get_frame_idx(self, time):
+        """ returns the last frame recorded at or before the time """
+        chunk_idx = max(bisect_right(self._chunk_times, time) - 1, 0)
+        self._get_chunk_frames(chunk_idx)
+        frame_offset = max(bisect_right(self._cached_times, time) - 1, 0)
+        return self.chunks[chunk_idx][1] + frame_offset
+
+    def get_duration(self):
+        if self.n_frames == 0:
+            return 0.0
+        return self.get_frame(self.n_frames - 1)[0]
+
+
+class SceneReplay(object):
+    """ applies a recording to the objects of a scene. The objects are matched by name or by node id and their
+        update phase is suspended during the replay so the controllers do not overwrite the recorded state.
+    """
+    def __init__(self, scene, filename, loop=False):
+        self.scene = scene
+        self.recording = SceneRecording(filename)
+        self.loop = loop
+        self.time = 0.0
+        self.frame_idx = 0
+        self.playing = False
+        self._targets = dict()  # object index -> scene object
+        self.match_objects()
+
+    def match_objects(self):
+        names = dict()
+        for scene_object in self.scene.object_list:
+            names.setdefault(scene_object.name, []).append(scene_object)
+        self._targets = dict()
+        for entry in self.recording.objects:
+            candidates = names.get(entry["name"], [])
+            if entry["name"] != "" and len(candidates) == 1:
+                self._targets[entry["index"]] = candidates[0]
+            elif self.scene.has_object(entry["node_id"]):
+                self._targets[entry["index"]] = self.scene.getObject(entry["node_id"])
+
+    def start(self):
+        for scene_object in self._targets.values():
+            scene_object.suspend_hook("update")
+        self.playing = True
+        self.scene.task_manager.add(REPLAY_TASK_NAME, Task(REPLAY_TASK_NAME, self._update_task, None))
+        self.seek(self.frame_idx)
+
+    def stop(self):
+        self.playing = False
+        self.scene.task_manager.remove(REPLAY_TASK_NAME)
+        for scene_object in self._targets.values():
+            scene_object.resume_hook("update")
+
+    def _update_task(self, dt, data):
+        self.update(dt)
+
+    def update(self, dt):
+        if not self.playing or self.recording.n_frames == 0:
+            return
+        self.time += dt
+        duration = self.recording.get_duration()
+        if self.time > duration:
+            self.time = self.time % duration if self.loop and duration > 0 else duration
+        self.apply_frame(self.recording.get_frame_idx(self.time))
+
+    def seek(self, frame_idx):
+        if self.recording.n_frames == 0:
+            return
+        self.apply_frame(frame_idx)
+        self.time = self.recording.get_frame(self.frame_idx)[0]
+
+    def seek_time(self, time):
+        self.time = time
+        self.apply_frame(self.recording.get_frame_idx(time))
+
+    def apply_frame(self, frame_idx):
+        self.frame_idx = min(max(frame_idx, 0), self.recording.n_frames - 1)
+        _, state = self.recording.get_frame(self.frame_idx)
+        for idx, (visible, transformation, joints) in state.items():
+            scene_object = self._targets.get(idx)
+            if scene_object is None:
+                continue
+            scene_object.visible = visible
+            if transformation is not None:
+                scene_object.transformation = np.array(transformation, dtype=np.float64)
+            if joints is not None:
+                set_joint_matrices(scene_object, joints)
@@ -22,6 +22,7 @@
 # USE OR OTHER DEALINGS IN THE SOFTWARE.
 from copy import copy
 import numpy as np
+from transformations import quaternion_from_matrix, quaternion_matrix, quaternion_slerp
 id_counter = 0
 
 
@@ -37,3 +38,25 @@ def get_random_color():
     if np.sum(random_color) < 0.5:
         random_color += np.array([0, 0, 1])
     return random_color.tolist()
+
+
+def interpolate_transformation(a, b, alpha):
+    """ blends two row major transformations with a uniform or per axis scale.
+        The translation and scale are interpolated linearly and the rotation spherically.
+    """
+    result = np.array(b, dtype=np.float64)
+    result[3, :3] = (1 - alpha) * a[3, :3] + alpha * b[3, :3]
+    if np.array_equal(a[:3, :3], b[:3, :3]):
+        return result
+    scale_a = np.linalg.norm(a[:3, :3], axis=1)
+    scale_b = np.linalg.norm(b[:3, :3], axis=1)
+    if np.any(scale_a == 0) or np.any(scale_b == 0):
+        return result
+    r_a = np.eye(4)
+    r_a[:3, :3] = a[:3, :3] / scale_a[:, None]
+    r_b = np.eye(4)
+    r_b[:3, :3] = b[:3, :3] / scale_b[:, None]
+    q = quaternion_slerp(quaternion_from_matrix(r_a), quaternion_from_matrix(r_b), alpha)
+    scale = (1 - alpha) * scale_a + alpha * scale_b
+    result[:3, :3] = quaternion_matrix(q)[:3, :3] * scale[:, None]
+    return result